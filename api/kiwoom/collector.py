@@ -82,16 +82,20 @@ class ChartCollector:
         self.collect(queue)
 
     def collect(self, queue: Queue):
-        for count in range(queue.qsize()):
-            stock_code = queue.get().get('stock_code')
+        stock_codes = [queue.get().get('stock_code') for count in range(queue.qsize())]
+
+        """ 저장된 종목별 최초, 최종일자를 한번에 조회 """
+        min_max_dates = self.dao.min_max_dates_many(stock_codes)
+
+        for stock_code in stock_codes:
             ticker = ticker_store.find_by_stock_code(stock_code)
 
             try:
                 # DB에 종목 컬렉션이 없으면 오늘 일자를 기준으로 일봉 데이터 조회해서 저장
-                if not self.dao.exists_table(stock_code):
+                if stock_code not in min_max_dates:
                     chart_df = self.proceed_new_ticker(ticker)
                 else:
-                    chart_df = self.proceed_exist_ticker(ticker)
+                    chart_df = self.proceed_exist_ticker(ticker, *min_max_dates[stock_code])
 
                 if not chart_df.empty:
                     self.dao.insert(stock_code, chart_df)
@@ -120,14 +124,17 @@ class ChartCollector:
 
         return df
 
-    def proceed_exist_ticker(self, ticker: Ticker) -> DataFrame:
+    def proceed_exist_ticker(self, ticker: Ticker, min_date: str = None, max_date: str = None) -> DataFrame:
         """
         기존 일봉차트 데이터 업데이트 처리
         :param ticker: Ticker, 종목 Ticker
+        :param min_date: str, optional, 저장된 최초일자. 없으면 DB에서 조회
+        :param max_date: str, optional, 저장된 최종일자. 없으면 DB에서 조회
         :return: 일봉 데이터를 담고있는 DataFrame
         :raises: PriceRevisedWarning, 수정종가 발생시
         """
-        min_date, max_date = self.dao.min_max_dates(ticker.code)
+        if min_date is None or max_date is None:
+            min_date, max_date = self.dao.min_max_dates(ticker.code)
         logger.debug(
             f"Proceed with existing ticker {ticker}. max_date: {max_date}, min_date: {min_date}")
 
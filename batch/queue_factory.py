@@ -12,13 +12,25 @@ logger = LoggerFactory.get_logger(__name__)
 class QueueFactory(metaclass=Singleton):
 
     def __init__(self):
+        """ DAO는 처음 사용할 때 가져온다. 모듈 import 시 DB에 연결하지 않는다 """
+        self._queue_dao = None
+        self._monitor = None
 
-        from skogkatt.core.dao.idao import BatchQueueDAO
-        from skogkatt.batch.monitor import BatchMonitor
+    @property
+    def queue_dao(self):
         from skogkatt.core.dao import dao_factory
 
-        self.queue_dao: BatchQueueDAO = dao_factory.get('BatchQueueDAO')
-        self.monitor: BatchMonitor = BatchMonitor()
+        if self._queue_dao is None:
+            self._queue_dao = dao_factory.get('BatchQueueDAO')
+        return self._queue_dao
+
+    @property
+    def monitor(self):
+        from skogkatt.batch.monitor import BatchMonitor
+
+        if self._monitor is None:
+            self._monitor = BatchMonitor()
+        return self._monitor
 
     def create(self, batch_name: str, except_stock_codes: List[str] = None) -> Queue:
         from skogkatt.core.ticker.store import ticker_store
@@ -68,6 +80,19 @@ class QueueFactory(metaclass=Singleton):
         """
         return self.queue_dao.delete(batch_name, stock_code)
 
+    def remove_queue_items(self, batch_name: str, stock_codes: List[str]):
+        """
+        여러 종목코드를 큐 DB에서 한번에 삭제한다.
+        :param batch_name: str, 배치명
+        :param stock_codes: List[str], 종목코드 리스트
+        :return:
+            int, deleted record count
+        """
+        if len(stock_codes) == 0:
+            return 0
+
+        return self.queue_dao.delete(batch_name, list(stock_codes))
+
     def remove_batch_queue(self, batch_name: str):
         """
         해당 종목코드를 큐 DB에서 삭제한다.
@@ -1,47 +1,282 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 from queue import Queue
+from typing import List, Tuple
 
 from skogkatt.batch import batch_lookup
 from skogkatt.batch.queue_factory import queue_factory
+from skogkatt.commons.util.date import days_between
+from skogkatt.conf.app_conf import app_config
 from skogkatt.core import LoggerFactory
 from skogkatt.core.dao import dao_factory
 from skogkatt.core.decorators import batch_status
+from skogkatt.core.ticker import Ticker
 from skogkatt.core.ticker.store import ticker_store
 from skogkatt.errors import PricerError
-from skogkatt.screeners.rim.pricer import Pricer
+from skogkatt.screeners.rim import PriceEstimate
+from skogkatt.screeners.rim.helper import DBHelper
+from skogkatt.screeners.rim.pricer import Pricer, PriceBaseline, discount_to_current
 
 logger = LoggerFactory.get_logger(__name__)
 
+# 적정가격을 한번에 계산할 종목 수
+CHUNK_SIZE = 200
+
+# 병렬 처리 프로세스 시작 방식. 부모 프로세스의 스레드 lock, 캐시 상태를 복사하지 않도록 spawn 사용
+MP_START_METHOD = 'spawn'
+
+# 종목별 적정가격 계산 실패로 처리하는 오류
+ESTIMATE_ERRORS = (PricerError, ValueError, KeyError, TypeError, IndexError, ArithmeticError)
+
+# 작업 프로세스별 RIMPriceEstimator
+_worker_estimator = None
+
+
+def _init_worker(mode: int):
+    """
+    작업 프로세스 초기화. 부모 프로세스의 실행 모드를 적용하고 프로세스 전용 DAO(Mongo 연결)로 Estimator를 만든다.
+    :param mode: int, app_config 실행 모드
+    """
+    global _worker_estimator
+
+    if app_config.current_mode != mode:
+        app_config.set_mode(mode)
+        dao_factory.reset()
+
+    _worker_estimator = RIMPriceEstimator()
+
+
+def _estimate_chunk(stock_codes: List[str]) -> Tuple[List[PriceEstimate], List[dict]]:
+    """ 작업 프로세스에서 종목들의 적정가격을 계산한다. 저장은 부모 프로세스에서 처리 """
+    tickers = [ticker_store.find_by_stock_code(stock_code) for stock_code in stock_codes]
+    return _worker_estimator.resolve_estimates(tickers)
+
 
 class RIMPriceEstimator:
 
-    def __init__(self):
+    def __init__(self, chunk_size: int = CHUNK_SIZE, workers: int = 1):
+        """
+        :param chunk_size: int, 적정가격을 한번에 계산할 종목 수
+        :param workers: int, 병렬 처리 프로세스 수. 1 이면 현재 프로세스에서 순차 처리
+        """
         self.name = batch_lookup.RIM_PRICER['name']
         self.pricer = Pricer()
+        self.db_helper = DBHelper()
         self.dao = dao_factory.get("RIMPriceEstimateDAO")
+        self.digest_dao = dao_factory.get("StatementDigestDAO")
+        self.chunk_size = chunk_size
+        self.workers = workers
 
     @batch_status(batch_lookup.RIM_PRICER['name'])
     def start(self, queue: Queue = None):
         queue = queue if queue is not None else queue_factory.resolve_queue(self.name)
-        logger.info(f'S-RIM Price reporting started - queued: {queue.qsize()}')
+        self._estimate_queue(queue)
+
+    @batch_status(batch_lookup.RIM_PRICER['name'])
+    def start_incremental(self):
+        """
+        재무정보가 바뀐 종목만 적정가격을 다시 계산하고 나머지 종목은 경과일수 할인만 다시 적용한다.
+        다시 계산하는 종목:
+            - 재무정보 변환(convert_snapshot, convert_statement)에서 내용이 바뀐 종목(StatementDigestDAO.find_changed)
+            - 저장된 적정가격에 할인 기준 값(equity_std 등)이 없는 종목
+            - 이전 실행에서 처리하지 못하고 큐에 남아 있는 종목
+        """
+        records = self.dao.find()
+
+        queue = queue_factory.get_queue(self.name)
+        stock_codes = [queue.get().get('stock_code') for count in range(queue.qsize())]
+        stock_codes += self.digest_dao.find_changed()
+        stock_codes += [record['stock_code'] for record in records if record.get('equity_std') is None]
+        stock_codes = [stock_code for stock_code in dict.fromkeys(stock_codes)
+                       if ticker_store.find_by_stock_code(stock_code) is not None]
+
+        logger.info(f'S-RIM incremental - reprice: {len(stock_codes)}, stored: {len(records)}')
+        if len(stock_codes) > 0:
+            self._estimate_queue(queue_factory.assign_queue(self.name, stock_codes))
+
+        self.refresh_discount(records, except_stock_codes=stock_codes)
+
+    def refresh_discount(self, records: List[dict] = None, except_stock_codes: List[str] = None, as_of: str = None) -> int:
+        """
+        저장된 적정가격을 기준일자까지의 경과일수로 다시 할인한다. 재무정보를 읽지 않고
+        저장된 기준시점 주주가치(equity_std)와 주식수로 discount_to_current만 한번에 계산하므로
+        재무정보가 같으면 전체 계산 결과와 같다.
+        :param records: List[dict], optional, RIMPriceEstimateDAO.find 결과. None 이면 DB에서 조회
+        :param except_stock_codes: List[str], optional, 제외할 종목코드(다시 계산한 종목)
+        :param as_of: str, optional, 기준일자 YYYYMMDD. default: 오늘
+        :return:
+            int, 수정된 종목 수
+        """
+        as_of = as_of if as_of is not None else datetime.today().strftime('%Y%m%d')
+        records = records if records is not None else self.dao.find()
+        except_stock_codes = set(except_stock_codes) if except_stock_codes is not None else set()
+
+        targets = [record for record in records
+                   if record.get('equity_std') is not None and record.get('as_of') != as_of
+                   and record['stock_code'] not in except_stock_codes]
+        if len(targets) == 0:
+            return 0
+
+        current = discount_to_current(equity_std=[record['equity_std'] for record in targets],
+                                      stock_counts=[record['stock_cnt'] for record in targets],
+                                      req_profit_rates=[record['req_profit_rate'] for record in targets],
+                                      days_elapsed=[days_between(as_of, record['std_date']) for record in targets])
+
+        """ 초과이익 계수 순서: 매도가격, 적정가격, 매수가격(COEFFICIENTS) """
+        prices = current['price']
+        updated = self.dao.update_prices([{'stock_code': record['stock_code'],
+                                           'sell_price': int(prices[i, 0]),
+                                           'affordable_price': int(prices[i, 1]),
+                                           'buy_price': int(prices[i, 2]),
+                                           'as_of': as_of}
+                                          for i, record in enumerate(targets)])
+
+        logger.info(f'S-RIM discount refreshed: {len(targets)}, as of {as_of}')
+        return updated
+
+    def _estimate_queue(self, queue: Queue) -> List[dict]:
+        """
+        큐의 종목들을 chunk_size 종목씩 계산해서 저장한다.
+        :return:
+            List[dict], 적정가격을 계산하지 못한 종목
+        """
+        logger.info(f'S-RIM Price reporting started - queued: {queue.qsize()}, workers: {self.workers}')
+
+        stock_codes = [queue.get().get('stock_code') for count in range(queue.qsize())]
+        chunks = [stock_codes[i:i + self.chunk_size] for i in range(0, len(stock_codes), self.chunk_size)]
+
+        if self.workers > 1 and len(chunks) > 1:
+            unresolved_tickers = self._start_parallel(chunks)
+        else:
+            unresolved_tickers = []
+            for chunk in chunks:
+                try:
+                    estimates, unresolved = self.resolve_estimates(
+                        [ticker_store.find_by_stock_code(stock_code) for stock_code in chunk])
+                except Exception as err:
+                    estimates, unresolved = [], self._chunk_failed(chunk, err)
+
+                self.update_estimates(estimates)
+                unresolved_tickers.extend(unresolved)
 
+        if len(unresolved_tickers) > 0:
+            logger.info(f'RIM 적정가 추정 실패 종목 수: {len(unresolved_tickers)}, error.log 확인.')
+
+        return unresolved_tickers
+
+    def _start_parallel(self, chunks: List[List[str]]) -> List[dict]:
+        """
+        종목코드 묶음을 프로세스 풀에 나눠서 계산하고, 계산이 끝난 묶음부터 저장한다.
+        :param chunks: List[List[str]], 종목코드 묶음
+        :return:
+            List[dict], 기준 데이터를 만들지 못한 종목
+        """
         unresolved_tickers = []
-        for count in range(queue.qsize()):
-            ticker = ticker_store.find_by_stock_code(queue.get().get('stock_code'))
+        total = sum(len(chunk) for chunk in chunks)
+        done = 0
+
+        context = multiprocessing.get_context(MP_START_METHOD)
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=(app_config.current_mode,)) as executor:
+
+            futures = {executor.submit(_estimate_chunk, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                try:
+                    estimates, unresolved = future.result()
+                except Exception as err:
+                    estimates, unresolved = [], self._chunk_failed(futures[future], err)
 
+                self.update_estimates(estimates)
+                unresolved_tickers.extend(unresolved)
+
+                done += len(futures[future])
+                logger.info(f'S-RIM Price progress: {done}/{total}, unresolved: {len(unresolved_tickers)}')
+
+        return unresolved_tickers
+
+    def resolve_estimates(self, tickers: List[Ticker]) -> Tuple[List[PriceEstimate], List[dict]]:
+        """
+        종목들의 재무정보를 한번에 읽어 기준 데이터를 만들고 적정가격을 일괄 계산한다.
+        :param tickers: List[Ticker]
+        :return:
+            (List[PriceEstimate], 기준 데이터를 만들지 못한 종목 List[dict])
+        """
+        if len(tickers) == 0:
+            return [], []
+
+        dto_dict = self.db_helper.get_fn_statement_dtos([ticker.code for ticker in tickers])
+
+        unresolved_tickers = []
+        baselines = []
+        resolved_tickers = []
+        for ticker in tickers:
             try:
-                estimate = self.pricer.estimate(ticker)
-                self.dao.update(estimate)
-                queue_factory.remove_queue_item(self.name, ticker.code)
-            except (PricerError, ValueError, KeyError, TypeError, IndexError) as err:
-                error_data = ticker.to_dict()
-                error_data['proc'] = self.name
-                unresolved_tickers.append(error_data)
+                baseline = self.pricer.resolve_baseline(ticker, statement_dto=dto_dict.get(ticker.code))
+                if baseline is None:
+                    raise PricerError('RIM 기준 데이터 생성 실패', stock_code=ticker.code)
+
+                baselines.append(baseline)
+                resolved_tickers.append(ticker)
+            except ESTIMATE_ERRORS as err:
+                unresolved_tickers.append(self._unresolved(ticker))
                 logger.error(f'{ticker.code}-{str(err)}')
 
-        if len(unresolved_tickers) > 0:
-            logger.info(f'RIM 적정가 추정 실패 종목 수: {len(unresolved_tickers)}, error.log 확인.')
+        return self.estimate_baselines(baselines, resolved_tickers, unresolved_tickers), unresolved_tickers
+
+    def estimate_baselines(self,
+                           baselines: List[PriceBaseline],
+                           tickers: List[Ticker],
+                           unresolved_tickers: List[dict]) -> List[PriceEstimate]:
+        """
+        기준 데이터로 적정가격을 일괄 계산한다. 일괄 계산이 실패하면 종목별로 다시 계산해서
+        계산할 수 없는 종목(NaN, overflow 등)만 unresolved_tickers에 추가한다.
+        :param baselines: List[PriceBaseline], 종목별 기준 데이터
+        :param tickers: List[Ticker], baselines 순서의 종목
+        :param unresolved_tickers: List[dict], 계산하지 못한 종목을 추가할 목록
+        :return:
+            List[PriceEstimate]
+        """
+        try:
+            return self.pricer.estimate_many(baselines)
+        except ESTIMATE_ERRORS as err:
+            logger.warning(f'S-RIM estimate_many failed, retry by ticker: {str(err)}')
+
+        estimates = []
+        for baseline, ticker in zip(baselines, tickers):
+            try:
+                estimates.extend(self.pricer.estimate_many([baseline]))
+            except ESTIMATE_ERRORS as err:
+                unresolved_tickers.append(self._unresolved(ticker))
+                logger.error(f'{ticker.code}-{str(err)}')
+
+        return estimates
+
+    def _unresolved(self, ticker: Ticker) -> dict:
+        error_data = ticker.to_dict()
+        error_data['proc'] = self.name
+        return error_data
+
+    def _chunk_failed(self, stock_codes: List[str], err: Exception) -> List[dict]:
+        """ 묶음 전체가 실패하면(DB 조회 오류, 작업 프로세스 종료 등) 묶음의 종목을 모두 실패 종목으로 기록한다 """
+        logger.error(f'S-RIM chunk failed - {",".join(stock_codes)}: {str(err)}')
+        tickers = [ticker_store.find_by_stock_code(stock_code) for stock_code in stock_codes]
+        return [self._unresolved(ticker) for ticker in tickers if ticker is not None]
+
+    def update_estimates(self, estimates: List[PriceEstimate]):
+        """
+        계산한 적정가격을 DB에 한번에 저장한 후 재무정보 변경 표시와 큐에서 삭제한다.
+        :param estimates: List[PriceEstimate]
+        :return:
+        """
+        stock_codes = [estimate.stock_code for estimate in estimates]
+        self.dao.update_many(estimates)
+        self.digest_dao.clear_changed(stock_codes)
+        queue_factory.remove_queue_items(self.name, stock_codes)
 
 
 if __name__ == '__main__':
-    batch = RIMPriceEstimator()
-    batch.start()
+    batch = RIMPriceEstimator(workers=multiprocessing.cpu_count())
+    batch.start_incremental()
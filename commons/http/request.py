@@ -18,12 +18,15 @@ def get_user_agent():
 
 class Request(object):
 
-    def __init__(self):
+    def __init__(self, delay: float = 1):
+        """
+        :param delay: float, optional, 요청 후 대기 시간(초). None 이면 대기하지 않음
+        """
         self.session = requests.Session()
         self.session.headers.update({'user-agent': get_user_agent()})
-        self.delay = 1
+        self.delay = delay
 
-    def request(self, url: str, method: str = 'GET', payload: dict = None, referer: str = None, proxies: dict = None, timeout: int = 120):
+    def request(self, url: str, method: str = 'GET', payload: dict = None, referer: str = None, proxies: dict = None, timeout: int = 120, headers: dict = None):
         """
         Send http request
         :param url: URL
@@ -37,24 +40,29 @@ class Request(object):
             Proxy settings
         :param timeout: int, optional
             default 120s
+        :param headers: dict, optional
+            Headers for this request only
         :return:
             requests.Response
         """
         if proxies is not None:
             self.session.proxies = proxies
 
-        headers = self.session.headers
+        request_headers = self.session.headers
         if referer is not None:
-            headers['referer'] = referer
+            request_headers['referer'] = referer
+
+        if headers is not None:
+            request_headers = dict(request_headers, **headers)
 
-        req = requests.Request(method, url=url, params=payload, headers=headers)
+        req = requests.Request(method, url=url, params=payload, headers=request_headers)
         prepped = self.session.prepare_request(req)
         resp = self.session.send(prepped, timeout=timeout)
         if self.delay is not None:
             time.sleep(self.delay)
         return resp
 
-    def get(self, url: str, payload: dict = None, referer: str = None, proxies: dict = None, timeout: int = 120):
+    def get(self, url: str, payload: dict = None, referer: str = None, proxies: dict = None, timeout: int = 120, headers: dict = None):
         """
         Send GET request
         :param url: URL
@@ -66,11 +74,14 @@ class Request(object):
             proxy settings
         :param timeout: int, optional
             default 120s
+        :param headers: dict, optional
+            Headers for this request only
         :return:
             requests.Response
         """
 
-        return self.request(url=url, method='GET', payload=payload, referer=referer, proxies=proxies, timeout=timeout)
+        return self.request(url=url, method='GET', payload=payload, referer=referer, proxies=proxies, timeout=timeout,
+                            headers=headers)
 
     def post(self, url: str, payload: dict = None, referer: str = None, timeout: int = 120):
         """
@@ -0,0 +1,94 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """
+    초당 rate 개씩 채워지고 최대 capacity 개까지 쌓이는 토큰. 요청 1건에 토큰 1개를 사용한다.
+    여러 스레드가 동시에 요청하면 요청한 순서대로 대기 시간을 배정한다.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        """
+        :param rate: float, 초당 요청 수
+        :param capacity: float, optional, 순간 허용 요청 수(burst)
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        토큰 1개를 가져온다. 토큰이 없으면 채워질 때까지 기다린다.
+        :return:
+            float, 기다린 시간(초)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+
+class Throttle:
+    """
+    HTTP 요청 속도 제한. 전체 초당 요청 수와 호스트별 초당 요청 수, 동시 요청 수를 제한한다.
+    호스트별 설정: {호스트명: {'rate': 초당 요청 수, 'burst': 순간 허용 요청 수, 'concurrency': 동시 요청 수}}
+    """
+
+    def __init__(self, rate: float = None, burst: float = 1, host_policies: Dict[str, dict] = None):
+        """
+        :param rate: float, optional, 전체 초당 요청 수. None 이면 제한 없음
+        :param burst: float, optional, 전체 순간 허용 요청 수
+        :param host_policies: dict, optional, 호스트별 설정
+        """
+        self._bucket = TokenBucket(rate, burst) if rate is not None else None
+        self._host_policies = host_policies if host_policies is not None else {}
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url: str):
+        """
+        요청 한 건의 실행 구간. 호스트 동시 요청 수 안에 들어올 때까지, 호스트와 전체 토큰을 얻을 때까지 기다린다.
+        :param url: str, 요청 URL
+        """
+        bucket, semaphore = self._resolve_host(urlsplit(url).hostname)
+
+        if semaphore is not None:
+            semaphore.acquire()
+        try:
+            if bucket is not None:
+                bucket.acquire()
+            if self._bucket is not None:
+                self._bucket.acquire()
+
+            yield
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+    def _resolve_host(self, host: str):
+        with self._lock:
+            if host not in self._hosts:
+                policy = self._host_policies.get(host, {})
+                rate = policy.get('rate')
+                concurrency = policy.get('concurrency')
+                self._hosts[host] = (TokenBucket(rate, policy.get('burst', 1)) if rate is not None else None,
+                                     threading.BoundedSemaphore(concurrency) if concurrency is not None else None)
+
+            return self._hosts[host]
@@ -15,6 +15,18 @@ FN_STATEMENT_PARAMS = {
     'pGB': '1', 'gicode': '', 'cID': '', 'MenuYn': 'Y', 'ReportGB': 'D', 'NewMenuID': '11', 'stkGb': '701'
 }
 
+# FnGuide 수집 동시 요청 수
+CRAWL_WORKERS = 4
+
+# 전체 초당 요청 수, 순간 허용 요청 수
+CRAWL_RATE = 1.0
+CRAWL_BURST = 2
+
+# 호스트별 초당 요청 수(rate), 순간 허용 요청 수(burst), 동시 요청 수(concurrency)
+CRAWL_HOST_POLICIES = {
+    'comp.fnguide.com': {'rate': 1.0, 'burst': 2, 'concurrency': 4},
+}
+
 # 한국거래소 주식 종목코드
 KRX_CORP_LIST_URL = 'http://kind.krx.co.kr/corpgeneral/corpList.do?method=download'
 
@@ -23,5 +35,9 @@ FNGUIDE_FILE_STORAGE_PATH = r'\\ds920\share\skogkatt\fnguide'
 FNGUIDE_SNAPSHOT_FILE_STORAGE_PATH = rf'{FNGUIDE_FILE_STORAGE_PATH}\snapshot'
 FNGUIDE_STATEMENT_FILE_STORAGE_PATH = rf'{FNGUIDE_FILE_STORAGE_PATH}\statement'
 
+# 수집한 페이지 원본 압축 저장소(HtmlArchive), 분기별 색인
+FNGUIDE_SNAPSHOT_ARCHIVE_PATH = rf'{FNGUIDE_FILE_STORAGE_PATH}\archive\snapshot'
+FNGUIDE_STATEMENT_ARCHIVE_PATH = rf'{FNGUIDE_FILE_STORAGE_PATH}\archive\statement'
+
 FNGUIDE_STATEMENT_FILE_PREFIX = 'fn_statement_'
 FNGUIDE_SNAPSHOT_FILE_PREFIX = 'fn_snapshot_'
@@ -1,4 +1,5 @@
 import os
+import threading
 from logging.config import valid_ident
 from typing import Any
 
@@ -14,10 +15,16 @@ logger = LoggerFactory.get_logger(__name__)
 
 
 class DAOFactory(object, metaclass=Singleton):
+    """
+    설정 파일(dao_conf.yaml)의 DAO를 키로 제공한다.
+    설정은 읽어만 두고 DAO(DB 연결)는 처음 get 할 때 만든다. 모듈 import 시 DB에 연결하지 않는다.
+    """
 
     def __init__(self, conf_files=('conf/dao_conf.yaml',)):
         self._creators = {}
-        # self._config = None
+        self._specs = {}
+        self._ensure_indexes = False
+        self._lock = threading.RLock()
 
         root_path = get_project_path()
         for config_file in conf_files:
@@ -27,27 +34,103 @@ class DAOFactory(object, metaclass=Singleton):
                 logger.debug(f'Resolving DAO config file: {config_file}')
                 with open(conf_file_path, 'rt') as file:
                     config = yaml.safe_load(file.read())
-                    # self._config = yaml.safe_load(file.read())
-                    # config = deepcopy(self._config)
                     self.configure(config)
 
     def configure(self, config: dict):
+        """
+        DAO 설정을 등록한다. DAO는 get 할 때 만든다.
+        같은 키로 이미 만든 DAO가 있으면 삭제하고 새 설정으로 다시 만든다.
+        :param config: dict, dao_list: {키: {class: 클래스 경로, 생성자 인자...}}, ensure_indexes: bool
+        """
         dao_list = config.pop('dao_list')
-        for key, class_list in dao_list.items():
-            class_name = class_list.pop('class')
+        with self._lock:
+            for key, class_list in dao_list.items():
+                class_name = class_list.pop('class')
 
-            kwargs = {k: class_list[k] for k in class_list if valid_ident(k)}
-            instance = instantiate(class_name, kwargs)
-            self.register_dao(key, instance)
+                kwargs = {k: class_list[k] for k in class_list if valid_ident(k)}
+                self._specs[key] = (class_name, kwargs)
+                self._creators.pop(key, None)
 
-    def get(self, key: str):
+            self._ensure_indexes = config.get('ensure_indexes', self._ensure_indexes)
+
+    def ensure_indexes(self) -> dict:
+        """
+        등록된 DAO의 인덱스(AbstractDAO.INDEXES)를 만든다. 아직 만들지 않은 DAO도 모두 만든다.
+        실패한 DAO는 로그만 남기고 계속 진행한다.
+        :return:
+            dict, {DAO 키: List[인덱스명]}
+        """
+        result = {}
+        for key in list(dict.fromkeys(list(self._specs) + list(self._creators))):
+            try:
+                dao = self.get(key, ensure_indexes=False)
+            except Exception as err:
+                logger.error(f'DAO creation failed - {key}: {err}')
+                continue
+
+            names = self._ensure_dao_indexes(key, dao)
+            if names is not None:
+                result[key] = names
+
+        return result
+
+    def get(self, key: str, ensure_indexes: bool = None):
+        """
+        DAO를 반환한다. 처음 요청하면 설정으로 DAO를 만들고,
+        설정의 ensure_indexes가 True 이면 해당 DAO의 인덱스를 만든다.
+        :param key: str, DAO 키
+        :param ensure_indexes: bool, optional, DAO를 만들 때 인덱스 생성 여부. default: 설정 값
+        :return:
+            DAO
+        """
         dao = self._creators.get(key)
-        if not dao:
-            raise KeyError(key)
+        if dao:
+            return dao
+
+        with self._lock:
+            dao = self._creators.get(key)
+            if dao:
+                return dao
+
+            spec = self._specs.get(key)
+            if spec is None:
+                raise KeyError(key)
+
+            class_name, kwargs = spec
+            dao = instantiate(class_name, dict(kwargs))
+            logger.debug(f'DAO created - {key}: {class_name}')
+
+            ensure_indexes = ensure_indexes if ensure_indexes is not None else self._ensure_indexes
+            if ensure_indexes:
+                self._ensure_dao_indexes(key, dao)
+
+            self._creators[key] = dao
+
         return dao
 
+    def reset(self):
+        """
+        만든 DAO(register_dao 포함)를 모두 삭제한다. 설정은 그대로 두고 다음 get 할 때 다시 만든다.
+        실행 모드(app_config.set_mode)를 바꾸면 DB명이 달라지므로 호출한다.
+        """
+        with self._lock:
+            self._creators = {}
+
     def register_dao(self, key: str, dao: Any):
-        self._creators[key] = dao
+        with self._lock:
+            self._creators[key] = dao
+
+    @staticmethod
+    def _ensure_dao_indexes(key: str, dao: Any) -> list or None:
+        ensure_indexes = getattr(dao, 'ensure_indexes', None)
+        if ensure_indexes is None:
+            return None
+
+        try:
+            return ensure_indexes()
+        except Exception as err:
+            logger.error(f'Index creation failed - {key}: {err}')
+            return None
 
 
 # dao_factory = DAOFactory(['conf/maria_dao_conf.yaml'])
@@ -0,0 +1,9 @@
+"""
+DAO 인덱스 생성: python -m skogkatt.core.dao
+"""
+from skogkatt.core.dao import dao_factory
+
+if __name__ == '__main__':
+    for key, names in dao_factory.ensure_indexes().items():
+        if len(names) > 0:
+            print(f'{key}: {", ".join(names)}')
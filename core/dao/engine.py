@@ -1,8 +1,15 @@
+import os
+import threading
 from abc import ABCMeta, abstractmethod
+from pathlib import Path
+from typing import List
 
 import pymongo
+from pymongo import IndexModel
 import sqlalchemy
 
+from skogkatt.commons.util.file import create_folder, get_cache_folder
+from skogkatt.commons.util.singleton import Singleton
 from skogkatt.conf.app_conf import app_config, Config
 from skogkatt.core import LoggerFactory
 
@@ -35,6 +42,9 @@ class DBEngine(metaclass=ABCMeta):
     def exists_table(self, *args, **kwargs):
         raise NotImplementedError
 
+    def create_indexes(self, *args, **kwargs):
+        raise NotImplementedError
+
 
 class MariaEngine(DBEngine):
 
@@ -59,24 +69,144 @@ class MariaEngine(DBEngine):
         return self._db
 
 
+class MongoClientRegistry(metaclass=Singleton):
+    """
+    URL별 MongoClient 저장소. 프로세스당 URL 하나에 연결 풀을 가진 MongoClient 하나만 만들어 모든 DAO가 공유한다.
+    MongoClient는 fork-safe 하지 않으므로 fork된 자식 프로세스에서는 부모의 클라이언트를 버리고 새로 만든다.
+    연결 풀, 타임아웃 설정은 app_config(MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS) 사용
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def get_client(self, url: str) -> pymongo.MongoClient:
+        """
+        URL의 공유 MongoClient를 반환한다. 처음 요청할 때 만들고 서버 연결을 한번 확인한다.
+        :param url: str, MongoDB 접속 URL
+        :return:
+            pymongo.MongoClient
+        """
+        if self._pid != os.getpid():
+            self._reset()
+
+        client = self._clients.get(url)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(url)
+            if client is None:
+                client = pymongo.MongoClient(url, **self.client_options())
+                client.server_info()
+                self._clients[url] = client
+                logger.debug(f'MongoClient created - pid: {self._pid}, options: {self.client_options()}')
+
+        return client
+
+    @staticmethod
+    def client_options() -> dict:
+        """ app_config의 연결 풀, 타임아웃 설정. 설정이 없으면 pymongo 기본값 사용 """
+        options = {'serverSelectionTimeoutMS': _config_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000)}
+        for key, option in (('MONGO_MAX_POOL_SIZE', 'maxPoolSize'),
+                            ('MONGO_MIN_POOL_SIZE', 'minPoolSize'),
+                            ('MONGO_CONNECT_TIMEOUT_MS', 'connectTimeoutMS'),
+                            ('MONGO_SOCKET_TIMEOUT_MS', 'socketTimeoutMS')):
+            value = _config_int(key)
+            if value is not None:
+                options[option] = value
+
+        return options
+
+    def close(self):
+        """ 현재 프로세스의 클라이언트를 모두 닫는다 """
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients = {}
+
+    def _reset(self):
+        """ fork된 자식 프로세스: 부모의 클라이언트는 닫지 않고 버린다 """
+        self._clients = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+
+def _config_int(key: str, default: int = None) -> int or None:
+    value = app_config.get(key)
+    return int(value) if value not in (None, '') else default
+
+
+mongo_client_registry = MongoClientRegistry()
+
+
 class MongoEngine(DBEngine):
 
     def __init__(self, db_name=None):
-        self._connection = self.connect()
-        self._connection.server_info()
-        db_name = self._resolve_db_name(db_name)
-        self._db = self._connection[db_name]
-        logger.debug(f'MongoDAO created for database: {db_name}, current environment: {app_config.current_mode}')
+        self._db_name = self._resolve_db_name(db_name)
+        logger.debug(f'MongoDAO created for database: {self._db_name}, current environment: {app_config.current_mode}')
 
     def connect(self):
         url = app_config.get('MONGO_URL')
-        return pymongo.MongoClient(url, serverSelectionTimeoutMS=10000)
+        return mongo_client_registry.get_client(url)
 
     def exists_table(self, table_name):
-        return True if table_name in self._db.list_collection_names() else False
+        return True if table_name in self.get_db().list_collection_names() else False
+
+    def create_indexes(self, table_name: str, specs: List[dict]) -> List[str]:
+        """
+        인덱스 정의대로 컬렉션 인덱스를 만든다. 같은 정의의 인덱스가 이미 있으면 그대로 둔다.
+        :param table_name: str, 컬렉션명
+        :param specs: List[dict], 인덱스 정의. {'keys': [(필드, 방향), ..], 그 외 IndexModel 옵션(name, unique, ..)}
+        :return:
+            List[str], 인덱스명
+        """
+        models = [IndexModel(spec['keys'], **{key: value for key, value in spec.items() if key != 'keys'})
+                  for spec in specs]
+        names = self.get_db()[table_name].create_indexes(models)
+        logger.debug(f'Indexes ensured - {self._db_name}.{table_name}: {names}')
+        return names
 
     def get_connection(self):
-        return self._connection
+        """ 프로세스 공유 MongoClient(mongo_client_registry) """
+        return self.connect()
 
     def get_db(self):
-        return self._db
+        return self.get_connection()[self._db_name]
+
+
+class FileEngine(DBEngine):
+    """
+    로컬 파일 저장소. DB명 폴더 아래 테이블(종목코드 등)별 폴더에 파일로 저장한다.
+    """
+
+    def __init__(self, db_name=None, path=None):
+        """
+        :param db_name: str, optional, 저장소 폴더명
+        :param path: str, optional, 저장소 상위 폴더. default: get_cache_folder()
+        """
+        self._db_name = self._resolve_db_name(db_name)
+        self._root = Path(path if path not in (None, 'None') else get_cache_folder()).joinpath(self._db_name)
+        logger.debug(f'FileEngine created for: {self._root}, current environment: {app_config.current_mode}')
+
+    def connect(self) -> Path:
+        create_folder(str(self._root))
+        return self._root
+
+    def get_connection(self) -> Path:
+        return self.connect()
+
+    def get_db(self) -> Path:
+        return self.connect()
+
+    def exists_table(self, table_name: str) -> bool:
+        return self._root.joinpath(table_name).is_dir()
+
+    def create_indexes(self, table_name: str, specs: List[dict]) -> List[str]:
+        """ 파일 저장소는 DAO가 직접 색인을 관리한다 """
+        return []
@@ -1,7 +1,8 @@
 from abc import ABCMeta, abstractmethod
 from asyncio import Queue
-from typing import List
+from typing import Dict, List, Tuple
 
+import numpy as np
 from pandas import DataFrame
 
 from skogkatt.core.dao.engine import DBEngine
@@ -10,6 +11,9 @@ from skogkatt.core.financial import StockSummary
 
 class AbstractDAO(metaclass=ABCMeta):
 
+    # 인덱스 정의, DBEngine.create_indexes 참조
+    INDEXES: List[dict] = []
+
     def __init__(self):
         self._engine = None
         self._table_name = None
@@ -20,6 +24,17 @@ class AbstractDAO(metaclass=ABCMeta):
     def get_table_name(self):
         return self._table_name
 
+    def ensure_indexes(self) -> List[str]:
+        """
+        INDEXES에 정의한 인덱스를 만든다.
+        :return:
+            List[str], 인덱스명
+        """
+        if len(self.INDEXES) == 0:
+            return []
+
+        return self._engine.create_indexes(self._table_name, self.INDEXES)
+
     @abstractmethod
     def find(self, *args, **kwargs):
         raise NotImplementedError
@@ -84,6 +99,9 @@ class StockSummaryDAO(AbstractDAO):
     def update(self, stock_summary: StockSummary) -> int:
         pass
 
+    def update_many(self, stock_summaries: List[StockSummary]) -> int:
+        pass
+
 
 class TickerDAO(AbstractDAO):
     from skogkatt.core.ticker import Ticker
@@ -143,6 +161,12 @@ class FnStatementDAO(AbstractDAO):
     def find(self, *args, **kwargs):
         pass
 
+    def find_many(self, *args, **kwargs):
+        pass
+
+    def update_many(self, *args, **kwargs):
+        pass
+
 
 class FnStatementAbbrDAO(AbstractDAO):
     def update(self, *args, **kwargs):
@@ -160,11 +184,86 @@ class FnStatementAbbrDAO(AbstractDAO):
     def find(self, *args, **kwargs):
         pass
 
+    def find_many(self, *args, **kwargs):
+        pass
+
+    def update_many(self, *args, **kwargs):
+        pass
+
+
+class StatementDigestDAO(AbstractDAO):
+    def update(self, *args, **kwargs):
+        pass
+
+    def insert(self, *args, **kwargs):
+        pass
+
+    def delete(self, *args, **kwargs):
+        pass
+
+    def count(self, *args, **kwargs):
+        pass
+
+    def find(self, *args, **kwargs):
+        pass
+
+    def find_changed(self, *args, **kwargs):
+        pass
+
+    def clear_changed(self, *args, **kwargs):
+        pass
+
+
+class FetchMetaDAO(AbstractDAO):
+    def update(self, *args, **kwargs):
+        pass
+
+    def insert(self, *args, **kwargs):
+        pass
+
+    def delete(self, *args, **kwargs):
+        pass
+
+    def count(self, *args, **kwargs):
+        pass
+
+    def find(self, *args, **kwargs):
+        pass
+
+    def find_changed(self, *args, **kwargs):
+        pass
+
+    def clear_changed(self, *args, **kwargs):
+        pass
+
+
+class FnLayoutDAO(AbstractDAO):
+    def update(self, *args, **kwargs):
+        pass
+
+    def insert(self, *args, **kwargs):
+        pass
+
+    def delete(self, *args, **kwargs):
+        pass
+
+    def count(self, *args, **kwargs):
+        pass
+
+    def find(self, *args, **kwargs):
+        pass
+
 
 class RIMPriceEstimateDAO(AbstractDAO):
     def update(self, *args, **kwargs):
         pass
 
+    def update_many(self, *args, **kwargs):
+        pass
+
+    def update_prices(self, *args, **kwargs):
+        pass
+
     def insert(self, *args, **kwargs):
         pass
 
@@ -179,6 +278,10 @@ class RIMPriceEstimateDAO(AbstractDAO):
 
 
 class DailyChartDAO(AbstractDAO):
+
+    # find_many 기본 컬럼
+    CHART_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
     def update(self, *args, **kwargs):
         pass
 
@@ -200,12 +303,44 @@ class DailyChartDAO(AbstractDAO):
     def min_max_dates(self, stock_code: str) -> (str, str):
         pass
 
+    def min_max_dates_many(self, stock_codes: List[str]) -> Dict[str, Tuple[str, str]]:
+        pass
+
+    def find_many(self,
+                  stock_codes: List[str],
+                  from_date: str = None,
+                  to_date: str = None,
+                  columns: List[str] = None,
+                  as_dataframe: bool = False) -> Dict[str, np.ndarray] or DataFrame:
+        pass
+
     def exists_table(self, table_name: str) -> bool:
         pass
 
     def drop_table(self, table_name: str) -> None:
         pass
 
+    @staticmethod
+    def _concat_chart(charts: Dict[str, Dict[str, np.ndarray]],
+                      columns: List[str],
+                      as_dataframe: bool) -> Dict[str, np.ndarray] or DataFrame:
+        """
+        종목별 일봉 컬럼 배열을 종목코드(ticker), 일자(date) 컬럼이 있는 long format 하나로 합친다.
+        :param charts: dict, {종목코드: {컬럼명: np.ndarray}}, date 포함
+        :param columns: List[str], date 외 컬럼명
+        :param as_dataframe: bool, DataFrame으로 반환 여부
+        :return:
+            dict, {ticker, date, 컬럼명: np.ndarray} 또는 DataFrame
+        """
+        charts = {stock_code: chart for stock_code, chart in charts.items() if len(chart['date']) > 0}
+        result = {'ticker': np.repeat(np.array(list(charts), dtype=str),
+                                      [len(chart['date']) for chart in charts.values()])}
+        for column in ['date'] + columns:
+            result[column] = np.concatenate([chart[column] for chart in charts.values()]) if len(charts) > 0 \
+                else np.empty(0, dtype=str if column == 'date' else np.int64)
+
+        return DataFrame(result) if as_dataframe else result
+
 
 class FormulaScreenerDAO(AbstractDAO):
     def update(self, *args, **kwargs):
@@ -103,9 +103,14 @@ class MariaBatchQueueDAO(BatchQueueDAO):
         # df = DataFrame(queue_data)
         # df.to_sql(name=f'{self._table_name}', con=self.conn, if_exists='replace', index=False)
 
-    def delete(self, batch_name: str = None, stock_code: str = None):
+    def delete(self, batch_name: str = None, stock_code: str or List[str] = None):
         sql = f"delete from {self._table_name} where 1=1"
-        conditions, params = make_query('eq', batch_name=batch_name, stock_code=stock_code)
+        if isinstance(stock_code, list):
+            conditions, params = make_query('eq', batch_name=batch_name)
+            conditions.append(f" and stock_code in ({', '.join(['%s'] * len(stock_code))})")
+            params.extend(stock_code)
+        else:
+            conditions, params = make_query('eq', batch_name=batch_name, stock_code=stock_code)
         sql = sql + ' '.join(conditions)
         result = self.conn.execute(sql, params)
         logger.debug(f'Deleted: {result.rowcount}')
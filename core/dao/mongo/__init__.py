@@ -0,0 +1,74 @@
+from datetime import datetime
+from typing import List
+
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+
+class MongoDAO:
+    """
+    Mongo DAO 공통 속성. 컬렉션, DB, 클라이언트는 DAO를 만들 때 저장하지 않고 사용할 때 Engine에서 찾는다.
+    dao_factory가 DAO를 캐시하므로, fork된 자식 프로세스에서도 부모의 MongoClient 대신
+    자식 프로세스의 클라이언트(mongo_client_registry)를 사용한다.
+    """
+
+    @property
+    def conn(self):
+        return self._engine.get_connection()
+
+    @property
+    def db(self) -> Database:
+        return self._engine.get_db()
+
+    @property
+    def _table(self) -> Collection:
+        return self._engine.get_db()[self._table_name]
+
+
+class MongoChangedDAO(MongoDAO):
+    """
+    내용 해시를 저장하고 내용이 바뀐 종목에 변경 표시(changed)를 남기는 DAO 공통.
+    다음 단계 배치는 표시된 종목만 처리한 후 표시를 지운다(StatementDigestDAO, FetchMetaDAO).
+    조회, 삭제 조건은 값이 None이 아닌 항목만 사용한다.
+    """
+
+    @staticmethod
+    def _changed_update(data: dict, changed: bool, now: datetime) -> dict:
+        """
+        upsert에 사용할 update 문. changed 이면 변경 표시를 하고, 아니면 기존 표시를 그대로 둔다(새 자료는 표시 없음).
+        :param data: dict, 저장할 자료($set)
+        :param changed: bool, 내용 변경 여부
+        :param now: datetime, 변경 표시 일시
+        """
+        update = {"$set": data}
+        if changed:
+            data['changed'] = True
+            data['changed_at'] = now
+        else:
+            update["$setOnInsert"] = {'changed': False}
+
+        return update
+
+    def _find_changed(self, **query) -> List[str]:
+        """ 변경 표시가 있는 종목코드 """
+        return sorted(self._table.distinct('stock_code', dict(self._query(**query), changed=True)))
+
+    def _clear_changed(self, stock_codes: List[str], **query) -> int:
+        """ 종목의 변경 표시를 지우고 지운 자료 수를 반환한다. """
+        if len(stock_codes) == 0:
+            return 0
+
+        result = self._table.update_many(dict(self._query(**query), stock_code={'$in': list(stock_codes)}, changed=True),
+                                         {"$set": {'changed': False}})
+        return result.modified_count
+
+    def _delete(self, **query) -> int:
+        result = self._table.delete_many(self._query(**query))
+        return result.deleted_count
+
+    def _count(self, **query) -> int:
+        return self._table.count_documents(self._query(**query))
+
+    @staticmethod
+    def _query(**query) -> dict:
+        return {key: value for key, value in query.items() if value is not None}
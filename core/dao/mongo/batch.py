@@ -1,21 +1,23 @@
-from typing import List
+from datetime import datetime
+from typing import Dict, List
 
 import pymongo
 from pandas import DataFrame
 
 from skogkatt.batch import BatchStatus
 from skogkatt.core.dao.engine import MongoEngine
-from skogkatt.core.dao.idao import BatchStatusDAO, BatchQueueDAO, FailedTickerDAO
+from skogkatt.core.dao.mongo import MongoDAO, MongoChangedDAO
+from skogkatt.core.dao.idao import BatchStatusDAO, BatchQueueDAO, FailedTickerDAO, FetchMetaDAO
 
 
-class MongoBatchStatusDAO(BatchStatusDAO):
+class MongoBatchStatusDAO(MongoDAO, BatchStatusDAO):
+    INDEXES = [{'keys': [('name', pymongo.ASCENDING), ('start', pymongo.DESCENDING)]},
+               {'keys': [('start', pymongo.DESCENDING)]}]
 
     def __init__(self, db_name=None, table='batch_status'):
         super().__init__()
         self._engine = MongoEngine(db_name)
-        self._table = self._engine.get_db()[table]
-        self._table_name = self._table.name
-        self.conn = self._engine.get_connection()
+        self._table_name = table
 
     def find(self, batch_name: str = None, limit: int = None, as_dataframe=False):
         status_list = []
@@ -62,22 +64,23 @@ class MongoBatchStatusDAO(BatchStatusDAO):
         return self._table.count_documents(_filter)
 
 
-class MongoBatchQueueDAO(BatchQueueDAO):
+class MongoBatchQueueDAO(MongoDAO, BatchQueueDAO):
+    INDEXES = [{'keys': [('batch_name', pymongo.ASCENDING), ('stock_code', pymongo.ASCENDING)]}]
 
     def __init__(self, db_name=None, table='batch_queue'):
         super().__init__()
         self._engine = MongoEngine(db_name)
-        self._table = self._engine.get_db()[table]
-        self._table_name = self._table.name
-        self.conn = self._engine.get_connection()
+        self._table_name = table
 
     def insert(self, queue_data: List):
         result = self._table.insert_many(queue_data)
         return len(result.inserted_ids)
 
-    def delete(self, batch_name: str, stock_code: str = None):
+    def delete(self, batch_name: str, stock_code: str or List[str] = None):
         query = {'batch_name': batch_name}
-        if stock_code is not None:
+        if isinstance(stock_code, list):
+            query['stock_code'] = {'$in': stock_code}
+        elif stock_code is not None:
             query['stock_code'] = stock_code
 
         result = self._table.delete_many(query)
@@ -93,13 +96,13 @@ class MongoBatchQueueDAO(BatchQueueDAO):
         return self._table.count_documents({'batch_name': batch_name})
 
 
-class MongoFailedTickerDAO(FailedTickerDAO):
+class MongoFailedTickerDAO(MongoDAO, FailedTickerDAO):
+    INDEXES = [{'keys': [('job_name', pymongo.ASCENDING), ('stock_code', pymongo.ASCENDING)]}]
+
     def __init__(self, db_name=None, table='failed_ticker'):
         super().__init__()
         self._engine = MongoEngine(db_name)
-        self._table = self._engine.get_db()[table]
-        self._table_name = self._table.name
-        self.conn = self._engine.get_connection()
+        self._table_name = table
 
     def insert(self, failed_code):
         result = self._table.insert_one(failed_code)
@@ -132,6 +135,89 @@ class MongoFailedTickerDAO(FailedTickerDAO):
 
         with self.conn.start_session() as session:
             with session.start_transaction():
-                self._table.delete_many(query)
-                self._table.insert_many(failed_codes)
+                self._table.delete_many(query, session=session)
+                self._table.insert_many(failed_codes, session=session)
         return len(failed_codes)
+
+
+class MongoFetchMetaDAO(MongoChangedDAO, FetchMetaDAO):
+    """
+    수집(crawl)한 페이지의 (수집 배치명, 종목코드) 별 응답 정보(ETag, Last-Modified)와 내용 해시.
+    내용이 바뀌었거나 처음 수집한 종목은 changed로 표시하고,
+    변환(convert) 배치는 표시된 종목만 변환한 후 표시를 지운다.
+    """
+    INDEXES = [{'keys': [('source', pymongo.ASCENDING), ('stock_code', pymongo.ASCENDING)], 'unique': True},
+               {'keys': [('source', pymongo.ASCENDING), ('changed', pymongo.ASCENDING)]}]
+
+    def __init__(self, db_name=None, table='fetch_meta'):
+        super().__init__()
+        self._engine = MongoEngine(db_name)
+        self._table_name = table
+
+    def find(self, source: str, stock_codes: List[str] = None) -> Dict[str, dict]:
+        """
+        :param source: str, 수집 배치명
+        :param stock_codes: List[str], optional, 종목코드. None 이면 전체
+        :return:
+            dict, {종목코드: {'etag', 'last_modified', 'digest', 'changed', ..}}
+        """
+        query = {'source': source}
+        if stock_codes is not None:
+            query['stock_code'] = {'$in': list(stock_codes)}
+
+        return {each['stock_code']: each for each in self._table.find(query, {'_id': 0})}
+
+    def update(self,
+               source: str,
+               stock_code: str,
+               etag: str = None,
+               last_modified: str = None,
+               digest: str = None,
+               changed: bool = False) -> int:
+        """
+        종목의 수집 정보를 저장한다. changed 이면 변경 표시를 하고, 아니면 기존 표시를 그대로 둔다.
+        :param source: str, 수집 배치명
+        :param stock_code: str, 종목코드
+        :param etag: str, optional, 응답 ETag
+        :param last_modified: str, optional, 응답 Last-Modified
+        :param digest: str, optional, 내용 해시
+        :param changed: bool, optional, 내용 변경 여부
+        :return:
+            int, 1 if upserted else 0
+        """
+        now = datetime.now()
+        data = {'etag': etag, 'last_modified': last_modified, 'fetched': now}
+        if digest is not None:
+            data['digest'] = digest
+
+        result = self._table.update_one({'source': source, 'stock_code': stock_code},
+                                        self._changed_update(data, changed, now), upsert=True)
+        return 1 if result.upserted_id is not None else 0
+
+    def insert(self, source: str, stock_code: str, **kwargs) -> int:
+        return self.update(source, stock_code, **kwargs)
+
+    def find_changed(self, source: str) -> List[str]:
+        """
+        내용이 바뀐 후 변환하지 않은 종목코드
+        :param source: str, 수집 배치명
+        :return:
+            List[str], 종목코드
+        """
+        return self._find_changed(source=source)
+
+    def clear_changed(self, source: str, stock_codes: List[str]) -> int:
+        """
+        종목의 변경 표시를 지운다.
+        :param source: str, 수집 배치명
+        :param stock_codes: List[str], 종목코드
+        :return:
+            int, 변경 표시를 지운 종목 수
+        """
+        return self._clear_changed(stock_codes, source=source)
+
+    def delete(self, source: str = None, stock_code: str = None) -> int:
+        return self._delete(source=source, stock_code=stock_code)
+
+    def count(self, source: str = None) -> int:
+        return self._count(source=source)
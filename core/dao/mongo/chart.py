@@ -1,26 +1,37 @@
-from typing import List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 
+import numpy as np
 import pymongo
 from pandas import DataFrame
+from pymongo.errors import OperationFailure
 
 from skogkatt.core import LoggerFactory
 from skogkatt.core.dao.engine import MongoEngine
+from skogkatt.core.dao.mongo import MongoDAO
 from skogkatt.core.dao.idao import DailyChartDAO
 
 logger = LoggerFactory.get_logger(__name__)
 
+# 종목 컬렉션 목록 캐시 유지 시간(초). 다른 프로세스에서 만든 컬렉션은 이 시간 후 반영
+CATALOG_TTL = 300
 
-class MongoDailyChartDAO(DailyChartDAO):
+# min_max_dates_many 한번의 aggregate에 $unionWith로 묶는 컬렉션 수
+UNION_CHUNK_SIZE = 200
+
+# find_many 종목별 동시 조회 수
+FIND_MANY_WORKERS = 8
+
+
+class MongoDailyChartDAO(MongoDAO, DailyChartDAO):
 
     def __init__(self, db_name=None, table=None):
         super().__init__()
         self._engine = MongoEngine(db_name)
-        self._table = None
         self._table_name = table
-        self.db = self._engine.get_db()
-        # self._table = self._engine.get_db()[table]
-        # self._table_name = table
-        self.conn = self._engine.get_connection()
+        self._catalog = None
+        self._catalog_time = None
 
     def min_max_dates(self, stock_code) -> (str, str):
         """
@@ -29,17 +40,45 @@ class MongoDailyChartDAO(DailyChartDAO):
         :return:
             최초일자, 최종일자
         """
-        result = self.db[stock_code].aggregate([
-                            {"$group": {
-                                "_id": 'min_max',
-                                "max": {"$max": "$date"},
-                                "min": {"$min": "$date"}
-                            }}
-                        ])
+        result = self.db[stock_code].aggregate([{"$group": self._min_max_group('min_max')}])
 
         date_list = list(result)
         return date_list[0]['min'], date_list[0]['max']
 
+    def min_max_dates_many(self, stock_codes: List[str]) -> Dict[str, Tuple[str, str]]:
+        """
+        종목들의 일봉 자료 최초, 최종일자를 반환한다.
+        종목 컬렉션을 $unionWith로 묶어서 UNION_CHUNK_SIZE 종목당 한번만 조회한다.
+        $unionWith를 지원하지 않는 서버(MongoDB 4.4 미만)는 종목별로 조회한다.
+        :param stock_codes: List[str], 종목코드
+        :return:
+            dict, {종목코드: (최초일자, 최종일자)}, 일봉 자료가 없는 종목은 제외
+        """
+        stock_codes = [stock_code for stock_code in dict.fromkeys(stock_codes) if self.exists_table(stock_code)]
+
+        result = {}
+        for i in range(0, len(stock_codes), UNION_CHUNK_SIZE):
+            chunk = stock_codes[i:i + UNION_CHUNK_SIZE]
+            pipeline = [{"$group": self._min_max_group(chunk[0])}]
+            pipeline += [{"$unionWith": {"coll": stock_code, "pipeline": [{"$group": self._min_max_group(stock_code)}]}}
+                         for stock_code in chunk[1:]]
+
+            try:
+                for row in self.db[chunk[0]].aggregate(pipeline):
+                    result[row['_id']] = (row['min'], row['max'])
+            except OperationFailure as err:
+                logger.warning(f'$unionWith not supported, falling back to per ticker query. {err}')
+                for stock_code in chunk:
+                    date_list = list(self.db[stock_code].aggregate([{"$group": self._min_max_group(stock_code)}]))
+                    if len(date_list) > 0:
+                        result[stock_code] = (date_list[0]['min'], date_list[0]['max'])
+
+        return result
+
+    @staticmethod
+    def _min_max_group(group_id: str) -> dict:
+        return {"_id": group_id, "max": {"$max": "$date"}, "min": {"$min": "$date"}}
+
     def find_one(self, stock_code: str, date: str):
         if self.exists_table(stock_code):
             return self.db[stock_code].find_one({"date": date})
@@ -61,16 +100,73 @@ class MongoDailyChartDAO(DailyChartDAO):
         records = list(self.db[stock_code].find(query, {'_id': 0}).sort([("date", pymongo.ASCENDING)]))
         return records
 
+    def find_many(self,
+                  stock_codes: List[str],
+                  from_date: str = None,
+                  to_date: str = None,
+                  columns: List[str] = None,
+                  as_dataframe: bool = False) -> Dict[str, np.ndarray] or DataFrame:
+        """
+        여러 종목의 기간 일봉 자료를 한번에 조회한다. 종목 컬렉션별 조회를 FIND_MANY_WORKERS 스레드로 동시에 실행하고
+        필요한 컬럼만 가져와서(projection) 컬럼별 배열로 모은다.
+        :param stock_codes: List[str], 종목코드
+        :param from_date: str, optional, 시작일자 YYYYMMDD
+        :param to_date: str, optional, 종료일자 YYYYMMDD
+        :param columns: List[str], optional, 조회 컬럼. default: CHART_COLUMNS
+        :param as_dataframe: bool, DataFrame으로 반환 여부
+        :return:
+            dict, {ticker, date, 컬럼명: np.ndarray} 또는 DataFrame. 종목코드, 일자순 long format
+        """
+        columns = list(columns) if columns is not None else self.CHART_COLUMNS
+        stock_codes = [stock_code for stock_code in sorted(set(stock_codes)) if self.exists_table(stock_code)]
+
+        with ThreadPoolExecutor(max_workers=FIND_MANY_WORKERS) as executor:
+            results = executor.map(lambda stock_code: self._find_columns(stock_code, from_date, to_date, columns),
+                                   stock_codes)
+            charts = dict(zip(stock_codes, results))
+
+        return self._concat_chart(charts, columns, as_dataframe)
+
+    def _find_columns(self, stock_code: str, from_date: str, to_date: str, columns: List[str]) -> Dict[str, np.ndarray]:
+        """ 한 종목의 기간 일봉 자료를 컬럼별 배열로 조회 """
+        date_range = {}
+        if from_date is not None:
+            date_range['$gte'] = from_date
+        if to_date is not None:
+            date_range['$lte'] = to_date
+
+        query = {'date': date_range} if len(date_range) > 0 else {}
+        projection = dict({'_id': 0, 'date': 1}, **{column: 1 for column in columns})
+
+        values = {column: [] for column in ['date'] + columns}
+        for record in self.db[stock_code].find(query, projection).sort([("date", pymongo.ASCENDING)]):
+            for column, column_values in values.items():
+                column_values.append(record.get(column))
+
+        return {column: np.asarray(column_values) for column, column_values in values.items()}
+
     def insert(self, stock_code: str, df: DataFrame):
         if df is None or df.empty:
             logger.warning('Dataframe is None or empty, could not insert.')
             return
 
         self.db[stock_code].insert_many(df.to_dict(orient="records"))
+        self._get_catalog().add(stock_code)
 
     def exists_table(self, stock_code: str):
-        return self._engine.exists_table(stock_code)
+        return stock_code in self._get_catalog()
 
     def drop_table(self, stock_code: str):
-        return self.db.drop_collection(stock_code)
+        result = self.db.drop_collection(stock_code)
+        self._get_catalog().discard(stock_code)
+        return result
+
+    def _get_catalog(self) -> set:
+        """ 종목 컬렉션 목록. CATALOG_TTL 동안 캐시하고 insert, drop_table 할 때 갱신한다 """
+        now = time.monotonic()
+        if self._catalog is None or now - self._catalog_time > CATALOG_TTL:
+            self._catalog = set(self.db.list_collection_names())
+            self._catalog_time = now
+
+        return self._catalog
 
@@ -1,31 +1,54 @@
-from typing import List
+from datetime import datetime
+from typing import List, Dict, Tuple
 
 import pymongo
 from pandas import DataFrame
+from pymongo import UpdateOne, DeleteMany
+from pymongo.client_session import ClientSession
 from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, PyMongoError
 
 from skogkatt.core.dao.engine import MongoEngine
+from skogkatt.core.dao.mongo import MongoDAO, MongoChangedDAO
 from skogkatt.core.financial import Statement
 from skogkatt.core.financial import StockSummary
-from skogkatt.core.dao.idao import StockSummaryDAO, FnStatementDAO
+from skogkatt.core.dao.idao import StockSummaryDAO, FnStatementDAO, StatementDigestDAO, FnLayoutDAO
 from skogkatt.core import LoggerFactory
 
 logger = LoggerFactory.get_logger(__name__)
 
+# 재무제표를 한번에 저장할 종목 수(MongoFnStatementDAO.update_many)
+STATEMENT_CHUNK_SIZE = 50
+
+
+class MongoStockSummaryDAO(MongoDAO, StockSummaryDAO):
+    INDEXES = [{'keys': [('stock_code', pymongo.ASCENDING)]}]
 
-class MongoStockSummaryDAO(StockSummaryDAO):
     def __init__(self, db_name='skogkatt_fn_statement', table='stock_summary'):
         super().__init__()
         self._engine = MongoEngine(db_name)
-        self._table = self._engine.get_db()[table]
         self._table_name = table
-        self.conn = self._engine.get_connection()
 
     def update(self, stock_summary: StockSummary) -> int:
         query = {'stock_code': stock_summary.stock_code}
         result = self._table.update_one(query, {"$set": stock_summary.to_dict()}, upsert=True)
         return 1 if result.upserted_id is not None else 0
 
+    def update_many(self, stock_summaries: List[StockSummary]) -> int:
+        """
+        여러 종목의 주식수 요약을 한번에 저장한다(bulk_write).
+        :param stock_summaries: List[StockSummary]
+        :return:
+            int, 새로 삽입한 자료 수
+        """
+        if len(stock_summaries) == 0:
+            return 0
+
+        result = self._table.bulk_write([UpdateOne({'stock_code': summary.stock_code},
+                                                   {"$set": summary.to_dict()}, upsert=True)
+                                         for summary in stock_summaries], ordered=False)
+        return result.upserted_count
+
     def find(self, stock_codes: List[str] = None) -> List[StockSummary]:
         query = {'stock_code': {'$in': stock_codes}} if stock_codes is not None else {}
         records = list(self._table.find(query))
@@ -57,13 +80,17 @@ class MongoStockSummaryDAO(StockSummaryDAO):
         return self._table.count_documents({})
 
 
-class MongoFnStatementDAO(FnStatementDAO):
+class MongoFnStatementDAO(MongoDAO, FnStatementDAO):
+    """ 조회(_find_statements), 저장(update)시 삭제 조건은 모두 종목코드, 연간/분기 구분으로 시작 """
+    INDEXES = [{'keys': [('stock_code', pymongo.ASCENDING),
+                         ('report_code', pymongo.ASCENDING),
+                         ('consensus', pymongo.ASCENDING),
+                         ('fiscal_date', pymongo.ASCENDING)]}]
+
     def __init__(self, db_name='skogkatt_fn_statement', table='statement'):
         super().__init__()
         self._engine = MongoEngine(db_name)
-        self._table = self._engine.get_db()[table]
         self._table_name = table
-        self.conn = self._engine.get_connection()
 
     def update(self, statements: List[Statement]) -> int:
         """
@@ -73,23 +100,108 @@ class MongoFnStatementDAO(FnStatementDAO):
         :return:
             insert 자료 수
         """
+        if len(statements) == 0:
+            return 0
+
         with self.conn.start_session() as session:
             with session.start_transaction():
-                inserted_cnt = 0
-                for stmt in statements:
-                    query = {'stock_code': stmt.stock_code,
-                             'fiscal_date': stmt.fiscal_date,
-                             'report_code': stmt.report_code,
-                             'fs_div': stmt.fs_div}
+                inserted_cnt = self._write_statements(statements, ordered=True, session=session)
 
-                    legacy_cnt = self._table.count_documents(query)
-                    if legacy_cnt > 0:
-                        self._table.delete_many(query)
+        return inserted_cnt
 
-                    result = self._table.insert_many(stmt.to_dataframe().to_dict(orient='records'))
-                    inserted_cnt += len(result.inserted_ids)
-
-                return inserted_cnt
+    def update_many(self,
+                    statements: List[Statement],
+                    chunk_size: int = STATEMENT_CHUNK_SIZE,
+                    ordered: bool = False) -> Dict[str, dict]:
+        """
+        여러 종목의 재무제표를 종목 묶음(chunk_size)별로 한번에 저장한다.
+        묶음마다 삭제(DeleteMany) 1회, 삽입(insert_many) 1회만 DB에 요청하고, 실패한 자료는 종목별 결과에 기록한다.
+        트랜잭션은 쓰기 오류 하나로 묶음 전체를 취소하므로 사용하지 않는다. 종목별 결과는 실제로 저장된 자료 수이다.
+        :param statements: List[Statement], 여러 종목의 재무제표
+        :param chunk_size: int, 한번에 저장할 종목 수
+        :param ordered: bool, 삽입 순서 보장 여부. False 이면 실패한 자료가 있어도 나머지 자료는 삽입
+        :return:
+            dict, {종목코드: {'inserted': 삽입 자료 수, 'errors': List[str] 오류 메세지}}
+        """
+        grouped = {}
+        for stmt in statements:
+            grouped.setdefault(stmt.stock_code, []).append(stmt)
+
+        stock_codes = list(grouped)
+        outcomes = {stock_code: {'inserted': 0, 'errors': []} for stock_code in stock_codes}
+
+        for i in range(0, len(stock_codes), chunk_size):
+            chunk_codes = stock_codes[i:i + chunk_size]
+            chunk = [stmt for stock_code in chunk_codes for stmt in grouped[stock_code]]
+            try:
+                self._write_statements(chunk, ordered=ordered, outcomes=outcomes)
+            except PyMongoError as err:
+                logger.error(f'Statement bulk write failed: {err}')
+                for stock_code in chunk_codes:
+                    outcomes[stock_code]['errors'].append(str(err))
+
+        return outcomes
+
+    def _write_statements(self,
+                          statements: List[Statement],
+                          ordered: bool,
+                          outcomes: Dict[str, dict] = None,
+                          session: ClientSession = None) -> int:
+        """
+        재무제표 키(종목코드, 년월, 연간/분기, 연결/개별)별 기존 자료를 한번에 삭제하고 계정과목 자료를 한번에 삽입한다.
+        :param statements: List[Statement]
+        :param ordered: bool, 삽입 순서 보장 여부
+        :param outcomes: dict, optional, 종목별 결과. 전달되면 BulkWriteError 대신 종목별 삽입 자료 수와 오류를 기록.
+                         쓰기 오류가 나도 나머지 자료가 저장되도록 트랜잭션(session) 없이 사용한다
+        :param session: ClientSession, optional, 삭제와 삽입을 같은 트랜잭션으로 처리할 세션
+        :return:
+            insert 자료 수
+        """
+        keys = list(dict.fromkeys((stmt.stock_code, stmt.fiscal_date, stmt.report_code, stmt.fs_div)
+                                  for stmt in statements))
+        documents = [record for stmt in statements for record in stmt.to_records()]
+
+        try:
+            self._table.bulk_write([DeleteMany({'stock_code': stock_code,
+                                                'fiscal_date': fiscal_date,
+                                                'report_code': report_code,
+                                                'fs_div': fs_div})
+                                    for stock_code, fiscal_date, report_code, fs_div in keys],
+                                   ordered=False, session=session)
+        except BulkWriteError as err:
+            if outcomes is None:
+                raise
+            failed = {keys[error['index']][0]: error.get('errmsg') for error in err.details.get('writeErrors', [])}
+            for stock_code, message in failed.items():
+                outcomes[stock_code]['errors'].append(message)
+
+            """ 기존 자료를 삭제하지 못한 종목은 삽입하지 않는다 """
+            documents = [document for document in documents if document['stock_code'] not in failed]
+
+        if len(documents) == 0:
+            return 0
+
+        try:
+            inserted_cnt = len(self._table.insert_many(documents, ordered=ordered, session=session).inserted_ids)
+            failed = {}
+        except BulkWriteError as err:
+            if outcomes is None:
+                raise
+            failed = {error['index']: error.get('errmsg') for error in err.details.get('writeErrors', [])}
+
+            """ 순서 보장 삽입은 첫 오류 이후 자료를 삽입하지 않는다 """
+            if ordered and len(failed) > 0:
+                documents = documents[:min(failed) + 1]
+            inserted_cnt = len(documents) - len(failed)
+
+        if outcomes is not None:
+            for index, document in enumerate(documents):
+                if index in failed:
+                    outcomes[document['stock_code']]['errors'].append(failed[index])
+                else:
+                    outcomes[document['stock_code']]['inserted'] += 1
+
+        return inserted_cnt
 
     # def get_raw_statements(self, query: dict = None) -> List[dict]:
     #     """
@@ -110,7 +222,16 @@ class MongoFnStatementDAO(FnStatementDAO):
                         to_date: str = None,
                         consensus: int = 0) -> List[dict]:
 
-        where = [{'stock_code': stock_code}, {'report_code': report_code}]
+        return self._find_statements([stock_code], report_code, from_date, to_date, consensus)
+
+    def _find_statements(self,
+                         stock_codes: List[str],
+                         report_code: int,
+                         from_date: str = None,
+                         to_date: str = None,
+                         consensus: int = 0) -> List[dict]:
+
+        where = [{'stock_code': {'$in': stock_codes}}, {'report_code': report_code}]
         if consensus is not None:
             where.append({'consensus': consensus})
 
@@ -122,7 +243,8 @@ class MongoFnStatementDAO(FnStatementDAO):
 
         query = {'$and': where}
         logger.debug(f'cond: {query}')
-        records = list(self._table.find(query, {'_id': 0}).sort([("fiscal_date", pymongo.ASCENDING)]))
+        records = list(self._table.find(query, {'_id': 0}).sort([("stock_code", pymongo.ASCENDING),
+                                                                   ("fiscal_date", pymongo.ASCENDING)]))
 
         return records
 
@@ -134,7 +256,35 @@ class MongoFnStatementDAO(FnStatementDAO):
              consensus: int = 0) -> List[Statement]:
 
         records = self._find_statement(stock_code, report_code, from_date, to_date, consensus)
+        return self._to_statements(records, report_code)
+
+    def find_many(self,
+                  stock_codes: List[str],
+                  report_code: int,
+                  from_date: str = None,
+                  to_date: str = None,
+                  consensus: int = 0) -> Dict[str, List[Statement]]:
+        """
+        여러 종목의 재무제표를 한번에 조회한다.
+        :param stock_codes: List[str], 종목코드 목록
+        :param report_code: int, 연간/분기 구분
+        :param from_date: str, optional, 시작년월
+        :param to_date: str, optional, 종료년월
+        :param consensus: int, optional, 컨센서스 여부
+        :return:
+            dict, {종목코드: List[Statement]}, 자료가 없는 종목은 빈 list
+        """
+        statements = {stock_code: [] for stock_code in stock_codes}
+        if len(stock_codes) == 0:
+            return statements
+
+        records = self._find_statements(list(stock_codes), report_code, from_date, to_date, consensus)
+        for statement in self._to_statements(records, report_code):
+            statements[statement.stock_code].append(statement)
+
+        return statements
 
+    def _to_statements(self, records: List[dict], report_code: int) -> List[Statement]:
         statement_list = []
         if len(records) == 0:
             return statement_list
@@ -203,19 +353,9 @@ class MongoFnStatementAbbrDAO(MongoFnStatementDAO):
     def __init__(self, db_name='skogkatt_fn_statement', table='abbreviation'):
         super().__init__()
         self._engine = MongoEngine(db_name)
-        self._table = self._engine.get_db()[table]
         self._table_name = table
-        self.conn = self._engine.get_connection()
-
-    def find(self,
-             stock_code: str,
-             report_code: int,
-             from_date: str = None,
-             to_date: str = None,
-             consensus: int = 0) -> List[Statement]:
-
-        records = self._find_statement(stock_code, report_code, from_date, to_date, consensus)
 
+    def _to_statements(self, records: List[dict], report_code: int) -> List[Statement]:
         statement_list = []
         if len(records) == 0:
             return statement_list
@@ -240,6 +380,155 @@ class MongoFnStatementAbbrDAO(MongoFnStatementDAO):
 
         return statement_list
 
+
+class MongoStatementDigestDAO(MongoChangedDAO, StatementDigestDAO):
+    """
+    변환(convert)한 재무정보의 (종목코드, 자료구분, 회계일자, 보고서 구분) 별 내용 해시.
+    해시가 바뀌었거나 처음 저장한 자료는 changed로 표시하고,
+    RIM 적정가격 배치는 표시된 종목만 다시 계산한 후 표시를 지운다.
+    """
+    INDEXES = [{'keys': [('stock_code', pymongo.ASCENDING), ('source', pymongo.ASCENDING)]},
+               {'keys': [('changed', pymongo.ASCENDING)]}]
+
+    def __init__(self, db_name='skogkatt_fn_statement', table='statement_digest'):
+        super().__init__()
+        self._engine = MongoEngine(db_name)
+        self._table_name = table
+
+    def update(self, stock_code: str, source: str, digests: Dict[Tuple[str, int], str]) -> bool:
+        """
+        종목의 재무정보 내용 해시를 저장한다. 저장된 해시와 같은 자료는 그대로 둔다.
+        :param stock_code: str, 종목코드
+        :param source: str, 자료구분(stock_summary, statement, abbreviation)
+        :param digests: dict, {(회계일자, 보고서 구분): 내용 해시}
+        :return:
+            bool, 변경된 자료가 있으면 True
+        """
+        stored = {(each.get('fiscal_date'), each.get('report_code')): each.get('digest')
+                  for each in self._table.find({'stock_code': stock_code, 'source': source}, {'_id': 0})}
+
+        changed = [key for key, digest in digests.items() if stored.get(key) != digest]
+        if len(changed) == 0:
+            return False
+
+        now = datetime.now()
+        requests = [UpdateOne({'stock_code': stock_code, 'source': source,
+                               'fiscal_date': fiscal_date, 'report_code': report_code},
+                              self._changed_update({'digest': digests[(fiscal_date, report_code)], 'updated': now},
+                                                   True, now),
+                              upsert=True)
+                    for fiscal_date, report_code in changed]
+        self._table.bulk_write(requests, ordered=False)
+
+        return True
+
+    def find_changed(self) -> List[str]:
+        """
+        내용이 바뀐 후 적정가격을 다시 계산하지 않은 종목코드
+        :return:
+            List[str], 종목코드
+        """
+        return self._find_changed()
+
+    def clear_changed(self, stock_codes: List[str]) -> int:
+        """
+        종목의 변경 표시를 지운다.
+        :param stock_codes: List[str], 종목코드
+        :return:
+            int, 변경 표시를 지운 자료 수
+        """
+        return self._clear_changed(stock_codes)
+
+    def find(self, stock_code: str = None, source: str = None) -> List[dict]:
+        return list(self._table.find(self._query(stock_code=stock_code, source=source), {'_id': 0}))
+
+    def insert(self, stock_code: str, source: str, digests: Dict[Tuple[str, int], str]) -> bool:
+        return self.update(stock_code, source, digests)
+
+    def delete(self, stock_code: str = None) -> int:
+        return self._delete(stock_code=stock_code)
+
+    def count(self, *args, **kwargs):
+        return self._count()
+
+
+class MongoFnLayoutDAO(MongoDAO, FnLayoutDAO):
+    """
+    FnGuide 표 구조의 (수집 배치명, 업종, 재무제표 종류, 지문(계정과목 열 해시)) 별 상태.
+    한 업종에 표 구조가 여러 개일 수 있으므로 지문마다 따로 저장한다.
+    행번호를 다시 찾은(remapped) 구조는 섹터 색인을 [섹터명, 그룹명, 계정과목, 행번호] 목록으로 저장한다.
+    """
+    INDEXES = [{'keys': [('source', pymongo.ASCENDING), ('industry', pymongo.ASCENDING),
+                         ('fs_type', pymongo.ASCENDING), ('fingerprint', pymongo.ASCENDING)], 'unique': True}]
+
+    def __init__(self, db_name='skogkatt_fn_statement', table='fn_layout'):
+        super().__init__()
+        self._engine = MongoEngine(db_name)
+        self._table_name = table
+
+    def find(self, source: str, industry: str = None) -> List[dict]:
+        """
+        :param source: str, 수집 배치명
+        :param industry: str, optional, 업종. None 이면 전체
+        :return:
+            List[dict], {'source', 'industry', 'fs_type', 'fingerprint', 'status', 'sectors', 'missing', ..}
+        """
+        query = {'source': source}
+        if industry is not None:
+            query['industry'] = industry
+
+        return list(self._table.find(query, {'_id': 0}))
+
+    def update(self,
+               source: str,
+               industry: str,
+               fs_type: str,
+               fingerprint: str,
+               status: str,
+               sectors: List[list] = None,
+               missing: List[str] = None,
+               stock_code: str = None) -> int:
+        """
+        업종의 표 구조를 저장한다. 같은 지문의 구조가 있으면 갱신한다.
+        :param source: str, 수집 배치명
+        :param industry: str, 업종
+        :param fs_type: str, 재무제표 종류: BS, IS, CF
+        :param fingerprint: str, 계정과목 열 해시
+        :param status: str, 표 구조 상태(ok, remapped, unsupported)
+        :param sectors: List[list], optional, 다시 찾은 섹터 색인 [섹터명, 그룹명, 계정과목, 행번호]
+        :param missing: List[str], optional, 표에서 찾지 못한 계정과목
+        :param stock_code: str, optional, 표본 종목코드
+        :return:
+            int, 1 if upserted else 0
+        """
+        data = {'status': status, 'sectors': sectors, 'missing': missing if missing is not None else [],
+                'stock_code': stock_code, 'updated': datetime.now()}
+        result = self._table.update_one({'source': source, 'industry': industry, 'fs_type': fs_type,
+                                         'fingerprint': fingerprint},
+                                        {"$set": data}, upsert=True)
+        return 1 if result.upserted_id is not None else 0
+
+    def insert(self, source: str, industry: str, fs_type: str, fingerprint: str, status: str, **kwargs) -> int:
+        return self.update(source, industry, fs_type, fingerprint, status, **kwargs)
+
+    def delete(self, source: str = None, industry: str = None) -> int:
+        query = {}
+        if source is not None:
+            query['source'] = source
+        if industry is not None:
+            query['industry'] = industry
+
+        result = self._table.delete_many(query)
+        return result.deleted_count
+
+    def count(self, source: str = None) -> int:
+        _filter = {}
+        if source is not None:
+            _filter['source'] = source
+
+        return self._table.count_documents(_filter)
+
+
 # class UnresolvedTickerDao(BaseDao):
 #
 #     def __init__(self):
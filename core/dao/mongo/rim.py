@@ -1,18 +1,72 @@
+from typing import List
+
+import pymongo
+from pymongo import UpdateOne
+
 from skogkatt.core.dao.engine import MongoEngine
+from skogkatt.core.dao.mongo import MongoDAO
 from skogkatt.core.dao.idao import RIMPriceEstimateDAO
 from skogkatt.screeners.rim import PriceEstimate
 
 
-class MongoRIMPriceEstimateDAO(RIMPriceEstimateDAO):
+class MongoRIMPriceEstimateDAO(MongoDAO, RIMPriceEstimateDAO):
+    INDEXES = [{'keys': [('stock_code', pymongo.ASCENDING)]}]
+
     def __init__(self, db_name=None, table='rim_price'):
         super().__init__()
         self._engine = MongoEngine(db_name)
-        self._table = self._engine.get_db()[table]
         self._table_name = table
-        self.conn = self._engine.get_connection()
 
     def update(self, price: PriceEstimate) -> int:
         query = {'stock_code': price.stock_code}
         result = self._table.update_one(query, {"$set": price.to_dict()}, upsert=True)
         return 1 if result.upserted_id is not None else 0
 
+    def update_many(self, prices: List[PriceEstimate]) -> int:
+        """
+        여러 종목의 적정가격을 한번에 저장한다(bulk_write).
+        :param prices: List[PriceEstimate]
+        :return:
+            upsert 자료 수
+        """
+        if len(prices) == 0:
+            return 0
+
+        requests = [UpdateOne({'stock_code': price.stock_code}, {"$set": price.to_dict()}, upsert=True)
+                    for price in prices]
+        result = self._table.bulk_write(requests, ordered=False)
+        return result.upserted_count
+
+    def update_prices(self, records: List[dict]) -> int:
+        """
+        저장된 적정가격 자료의 일부 항목을 한번에 수정한다(bulk_write).
+        :param records: List[dict], stock_code와 수정할 항목. ex) {'stock_code': .., 'buy_price': .., 'as_of': ..}
+        :return:
+            수정된 자료 수
+        """
+        if len(records) == 0:
+            return 0
+
+        requests = [UpdateOne({'stock_code': record['stock_code']},
+                              {"$set": {key: value for key, value in record.items() if key != 'stock_code'}})
+                    for record in records]
+        result = self._table.bulk_write(requests, ordered=False)
+        return result.modified_count
+
+    def find(self, stock_codes: List[str] = None) -> List[dict]:
+        query = {'stock_code': {'$in': stock_codes}} if stock_codes is not None else {}
+        return list(self._table.find(query, {'_id': 0}))
+
+    def insert(self, price: PriceEstimate) -> int:
+        return self.update(price)
+
+    def delete(self, stock_code: str = None) -> int:
+        _filter = {}
+        if stock_code is not None:
+            _filter['stock_code'] = stock_code
+
+        result = self._table.delete_many(_filter)
+        return result.deleted_count
+
+    def count(self, *args, **kwargs):
+        return self._table.count_documents({})
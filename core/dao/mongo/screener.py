@@ -1,20 +1,21 @@
 from typing import List
 
+import pymongo
 from pandas import DataFrame
 
 from skogkatt.core.dao.engine import MongoEngine
+from skogkatt.core.dao.mongo import MongoDAO
 from skogkatt.core.dao.idao import FormulaScreenerDAO
 from skogkatt.core.ticker import Ticker
 
 
-class MongoFormulaScreenerDAO(FormulaScreenerDAO):
+class MongoFormulaScreenerDAO(MongoDAO, FormulaScreenerDAO):
+    INDEXES = [{'keys': [('formula', pymongo.ASCENDING), ('date', pymongo.ASCENDING)]}]
 
     def __init__(self, db_name=None, table='screen_report'):
         super().__init__()
         self._engine = MongoEngine(db_name)
-        self._table = self._engine.get_db()[table]
         self._table_name = table
-        self.conn = self._engine.get_connection()
 
     def find(self,
              screener_name: str = None,
@@ -60,8 +61,8 @@ class MongoFormulaScreenerDAO(FormulaScreenerDAO):
         print(query)
         with self.conn.start_session() as session:
             with session.start_transaction():
-                self._table.delete_many(query)
-                self._table.insert_many(ticker_list)
+                self._table.delete_many(query, session=session)
+                self._table.insert_many(ticker_list, session=session)
         return len(ticker_list)
 
     def insert(self, ticker: Ticker) -> int:
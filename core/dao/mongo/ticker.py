@@ -3,18 +3,17 @@ from typing import List
 from pandas import DataFrame
 
 from skogkatt.core.dao.engine import MongoEngine
+from skogkatt.core.dao.mongo import MongoDAO
 from skogkatt.core.dao.idao import TickerDAO
 from skogkatt.core.ticker import Ticker
 
 
-class MongoTickerDAO(TickerDAO):
+class MongoTickerDAO(MongoDAO, TickerDAO):
 
     def __init__(self, db_name=None, table='ticker'):
         super().__init__()
         self._engine = MongoEngine(db_name)
-        self._table = self._engine.get_db()[table]
         self._table_name = table
-        self.conn = self._engine.get_connection()
 
     def find(self,
              stock_code: str = None,
@@ -64,8 +63,8 @@ class MongoTickerDAO(TickerDAO):
         ticker_list = ticker_df.to_dict(orient='records')
         with self.conn.start_session() as session:
             with session.start_transaction():
-                self._table.delete_many({})
-                self._table.insert_many(ticker_list)
+                self._table.delete_many({}, session=session)
+                self._table.insert_many(ticker_list, session=session)
         return len(ticker_list)
 
     def insert(self, ticker: Ticker) -> int:
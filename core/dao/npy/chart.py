@@ -0,0 +1,270 @@
+import json
+import os
+import shutil
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+from skogkatt.core import LoggerFactory
+from skogkatt.core.dao.engine import FileEngine
+from skogkatt.core.dao.idao import DailyChartDAO
+
+logger = LoggerFactory.get_logger(__name__)
+
+# 저장하는 컬럼과 타입. 종목코드, 종목명은 색인에 저장
+CHART_DTYPES = {
+    'date': np.int32,
+    'open': np.int64,
+    'high': np.int64,
+    'low': np.int64,
+    'close': np.int64,
+    'volume': np.int64,
+}
+
+# 종목별 최초/최종일자, 건수 색인 파일
+INDEX_FILE = '_index.json'
+
+
+class NumpyDailyChartDAO(DailyChartDAO):
+    """
+    일봉 차트를 종목별 폴더에 컬럼별 바이너리 파일(date.bin, open.bin, ..)로 저장한다.
+    파일은 일자순으로 정렬된 상태를 유지하고 np.memmap으로 읽으므로 조회 결과는 복사 없이 파일을 참조한다.
+    최종일자 이후 자료는 파일 끝에 추가만 하고, 과거 자료가 섞이면 해당 종목만 다시 쓴다.
+    종목별 최초/최종일자와 건수는 색인 파일(_index.json)로 관리하고 메모리에 캐시한다.
+    색인의 건수까지만 유효한 자료이므로 추가 도중 중단되어도 이전 자료는 그대로 읽힌다.
+    """
+
+    def __init__(self, db_name=None, table=None, path=None):
+        """
+        :param db_name: str, optional, 저장소 폴더명
+        :param table: 사용하지 않음, MongoDailyChartDAO 설정 호환
+        :param path: str, optional, 저장소 상위 폴더. default: get_cache_folder()
+        """
+        super().__init__()
+        self._engine = FileEngine(db_name, path)
+        self._table_name = table
+        self._root = self._engine.get_db()
+        self._lock = threading.RLock()
+        self._index = None
+        self._index_mtime = None
+
+    def min_max_dates(self, stock_code: str) -> (str, str):
+        """
+        해당 종목의 일봉 자료 중 최초, 최종일자를 반환한다. 색인만 읽는다.
+        :param stock_code: str, 종목코드
+        :return:
+            최초일자, 최종일자. 자료가 없으면 (None, None)
+        """
+        entry = self._get_index().get(stock_code)
+        if entry is None:
+            return None, None
+
+        return entry['min'], entry['max']
+
+    def min_max_dates_many(self, stock_codes: List[str]) -> Dict[str, Tuple[str, str]]:
+        """
+        종목들의 일봉 자료 최초, 최종일자를 반환한다. 색인만 읽는다.
+        :param stock_codes: List[str], 종목코드
+        :return:
+            dict, {종목코드: (최초일자, 최종일자)}, 일봉 자료가 없는 종목은 제외
+        """
+        index = self._get_index()
+        return {stock_code: (index[stock_code]['min'], index[stock_code]['max'])
+                for stock_code in stock_codes if stock_code in index}
+
+    def find_one(self, stock_code: str, date: str) -> dict or None:
+        arrays = self.find_arrays(stock_code, date, date)
+        if len(arrays['date']) == 0:
+            return None
+
+        return self._to_records(stock_code, arrays, limit=1)[0]
+
+    def find(self, stock_code: str, from_date: str = None, to_date: str = None) -> List[dict]:
+        arrays = self.find_arrays(stock_code, from_date, to_date)
+        return self._to_records(stock_code, arrays)
+
+    def find_arrays(self, stock_code: str, from_date: str = None, to_date: str = None) -> Dict[str, np.ndarray]:
+        """
+        기간의 일봉 자료를 컬럼별 배열로 반환한다. 배열은 파일을 참조하는 읽기 전용 np.memmap
+        :param stock_code: str, 종목코드
+        :param from_date: str, optional, 시작일자 YYYYMMDD
+        :param to_date: str, optional, 종료일자 YYYYMMDD
+        :return:
+            dict, {컬럼명: np.ndarray}, date는 YYYYMMDD 정수. 자료가 없으면 길이 0 배열
+        """
+        entry = self._get_index().get(stock_code)
+        if entry is None or entry['rows'] == 0:
+            return {column: np.empty(0, dtype=dtype) for column, dtype in CHART_DTYPES.items()}
+
+        folder = self._root.joinpath(stock_code)
+        arrays = {column: np.memmap(folder.joinpath(f'{column}.bin'), dtype=dtype, mode='r', shape=(entry['rows'],))
+                  for column, dtype in CHART_DTYPES.items()}
+
+        dates = arrays['date']
+        start = np.searchsorted(dates, int(from_date), side='left') if from_date is not None else 0
+        end = np.searchsorted(dates, int(to_date), side='right') if to_date is not None else len(dates)
+
+        return {column: array[start:end] for column, array in arrays.items()}
+
+    def find_many(self,
+                  stock_codes: List[str],
+                  from_date: str = None,
+                  to_date: str = None,
+                  columns: List[str] = None,
+                  as_dataframe: bool = False) -> Dict[str, np.ndarray] or DataFrame:
+        """
+        여러 종목의 기간 일봉 자료를 하나의 long format으로 반환한다. 종목별 배열을 복사 없이 쓰려면 find_arrays 사용
+        :param stock_codes: List[str], 종목코드
+        :param from_date: str, optional, 시작일자 YYYYMMDD
+        :param to_date: str, optional, 종료일자 YYYYMMDD
+        :param columns: List[str], optional, 조회 컬럼. default: CHART_COLUMNS
+        :param as_dataframe: bool, DataFrame으로 반환 여부
+        :return:
+            dict, {ticker, date, 컬럼명: np.ndarray} 또는 DataFrame. 종목코드, 일자순 long format
+        """
+        columns = list(columns) if columns is not None else self.CHART_COLUMNS
+
+        charts = {}
+        for stock_code in sorted(set(stock_codes)):
+            arrays = self.find_arrays(stock_code, from_date, to_date)
+            charts[stock_code] = dict({'date': arrays['date'].astype(str)},
+                                      **{column: arrays[column] for column in columns})
+
+        return self._concat_chart(charts, columns, as_dataframe)
+
+    def insert(self, stock_code: str, df: DataFrame):
+        """
+        일봉 자료를 저장한다. 저장된 최종일자 이후 자료만 있으면 파일 끝에 추가하고,
+        그렇지 않으면 기존 자료와 합쳐서(같은 일자는 새 자료로) 다시 쓴다.
+        :param stock_code: str, 종목코드
+        :param df: DataFrame, COLUMNS(date, ticker, name, open, high, low, close, volume)
+        """
+        if df is None or df.empty:
+            logger.warning('Dataframe is None or empty, could not insert.')
+            return
+
+        new_arrays = self._to_arrays(df)
+        name = str(df['name'].iloc[0]) if 'name' in df.columns else None
+
+        with self._lock:
+            index = self._get_index(reload=True)
+            entry = index.get(stock_code)
+            folder = self._root.joinpath(stock_code)
+            folder.mkdir(exist_ok=True)
+
+            if entry is not None and new_arrays['date'][0] > int(entry['max']):
+                self._append(folder, entry['rows'], new_arrays)
+                rows = entry['rows'] + len(new_arrays['date'])
+                min_date = entry['min']
+            else:
+                if entry is not None and entry['rows'] > 0:
+                    new_arrays = self._merge(self.find_arrays(stock_code), new_arrays)
+                self._rewrite(folder, new_arrays)
+                rows = len(new_arrays['date'])
+                min_date = str(new_arrays['date'][0])
+
+            index[stock_code] = {'min': min_date,
+                                 'max': str(new_arrays['date'][-1]),
+                                 'rows': rows,
+                                 'name': name if name is not None else (entry or {}).get('name')}
+            self._save_index(index)
+
+    def count(self, stock_code: str) -> int:
+        entry = self._get_index().get(stock_code)
+        return entry['rows'] if entry is not None else 0
+
+    def exists_table(self, stock_code: str) -> bool:
+        return stock_code in self._get_index()
+
+    def drop_table(self, stock_code: str):
+        with self._lock:
+            index = self._get_index(reload=True)
+            index.pop(stock_code, None)
+            self._save_index(index)
+            shutil.rmtree(self._root.joinpath(stock_code), ignore_errors=True)
+
+    def tables(self) -> List[str]:
+        """
+        :return:
+            List[str], 일봉 자료가 저장된 종목코드
+        """
+        return list(self._get_index())
+
+    @staticmethod
+    def _to_arrays(df: DataFrame) -> Dict[str, np.ndarray]:
+        """ DataFrame을 일자순으로 정렬하고 일자 중복을 제거한 컬럼 배열로 변환 """
+        df = df.drop_duplicates(subset='date', keep='last').sort_values(by='date')
+        arrays = {column: df[column].fillna(0).astype(dtype).to_numpy() for column, dtype in CHART_DTYPES.items()
+                  if column != 'date'}
+        arrays['date'] = df['date'].astype(np.int32).to_numpy()
+        return arrays
+
+    @staticmethod
+    def _merge(stored: Dict[str, np.ndarray], new_arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """ 저장된 자료와 새 자료를 일자순으로 합친다. 같은 일자는 새 자료 사용 """
+        keep = ~np.isin(stored['date'], new_arrays['date'])
+        merged = {column: np.concatenate([np.asarray(stored[column])[keep], new_arrays[column]])
+                  for column in CHART_DTYPES}
+        order = np.argsort(merged['date'], kind='stable')
+        return {column: array[order] for column, array in merged.items()}
+
+    @staticmethod
+    def _append(folder, rows: int, arrays: Dict[str, np.ndarray]):
+        """ 색인 건수 이후를 잘라내고(중단된 추가 자료) 파일 끝에 추가 """
+        for column, dtype in CHART_DTYPES.items():
+            with open(folder.joinpath(f'{column}.bin'), 'r+b') as file:
+                file.truncate(rows * np.dtype(dtype).itemsize)
+                file.seek(0, os.SEEK_END)
+                file.write(np.ascontiguousarray(arrays[column], dtype=dtype).tobytes())
+
+    @staticmethod
+    def _rewrite(folder, arrays: Dict[str, np.ndarray]):
+        for column, dtype in CHART_DTYPES.items():
+            path = folder.joinpath(f'{column}.bin')
+            temp_path = folder.joinpath(f'{column}.bin.tmp')
+            with open(temp_path, 'wb') as file:
+                file.write(np.ascontiguousarray(arrays[column], dtype=dtype).tobytes())
+            os.replace(temp_path, path)
+
+    def _to_records(self, stock_code: str, arrays: Dict[str, np.ndarray], limit: int = None) -> List[dict]:
+        name = self._get_index().get(stock_code, {}).get('name')
+        columns = {column: array[:limit].tolist() for column, array in arrays.items()}
+
+        return [{'date': str(date), 'ticker': stock_code, 'name': name,
+                 'open': columns['open'][i], 'high': columns['high'][i], 'low': columns['low'][i],
+                 'close': columns['close'][i], 'volume': columns['volume'][i]}
+                for i, date in enumerate(columns['date'])]
+
+    def _get_index(self, reload: bool = False) -> dict:
+        """ 색인 파일이 다른 프로세스에서 변경되었으면 다시 읽는다 """
+        path = self._root.joinpath(INDEX_FILE)
+        mtime = path.stat().st_mtime_ns if path.exists() else None
+
+        if self._index is None or reload or mtime != self._index_mtime:
+            with self._lock:
+                if mtime is None:
+                    self._index = {}
+                else:
+                    with open(path, 'rt', encoding='utf-8') as file:
+                        self._index = json.load(file)
+                self._index_mtime = mtime
+
+        return self._index
+
+    def _save_index(self, index: dict):
+        path = self._root.joinpath(INDEX_FILE)
+        temp_path = path.with_suffix('.tmp')
+        with open(temp_path, 'wt', encoding='utf-8') as file:
+            json.dump(index, file, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+        self._index = index
+        self._index_mtime = path.stat().st_mtime_ns
+
+    def update(self, *args, **kwargs):
+        pass
+
+    def delete(self, *args, **kwargs):
+        pass
@@ -1,3 +1,5 @@
+from typing import List
+
 from pandas import DataFrame
 
 
@@ -104,6 +106,23 @@ class Statement:
 
         return df
 
+    def to_records(self) -> List[dict]:
+        """
+        계정과목별 DB 저장 자료. to_dataframe().to_dict(orient='records')와 같은 자료를 DataFrame 없이 만든다.
+        :return:
+            List[dict]
+        """
+        return [{'stock_code': self.stock_code,
+                 'fiscal_date': self.fiscal_date,
+                 'account_id': fact.account_name,
+                 'value': fact.value,
+                 'attribute': fact.group,
+                 'sector': fact.sector,
+                 'report_code': self.report_code,
+                 'fs_div': self.fs_div,
+                 'sj_div': fact.sj_div,
+                 'consensus': self.consensus} for fact in self.facts]
+
     def from_dataframe(self):
         pass
 
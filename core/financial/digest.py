@@ -0,0 +1,64 @@
+import hashlib
+from typing import Dict, List, Tuple
+
+from skogkatt.core.financial import Statement, StockSummary
+from skogkatt.core.financial.dto import FinancialStatementDTO
+
+
+def dto_digest(dto: FinancialStatementDTO) -> str:
+    """
+    재무정보 DTO의 내용 해시. 주식수 요약, 연간/분기 재무제표와 요약 재무제표의 계정 값이 같으면 같은 값
+    :param dto: FinancialStatementDTO
+    :return:
+        str, sha1 hex digest
+    """
+    digest = hashlib.sha1(dto.stock_code.encode('utf-8'))
+
+    summary = dto.stock_summary
+    if summary is not None:
+        digest.update(repr((summary.reference_date, summary.common_stock_cnt,
+                            summary.pref_stock_cnt, summary.treasury_stock_cnt)).encode('utf-8'))
+
+    for statements in (dto.annual_statements, dto.quarter_statements,
+                       dto.annual_abbreviations, dto.quarter_abbreviations):
+        digest.update(b'|')
+        for stmt in statements or []:
+            _update_statement_digest(digest, stmt)
+
+    return digest.hexdigest()
+
+
+def statement_digests(statements: List[Statement]) -> Dict[Tuple[str, int], str]:
+    """
+    한 종목 재무제표의 (회계일자, 보고서 구분) 별 내용 해시.
+    연결/별도, 컨센서스 구분이 다른 재무제표는 같은 해시에 포함한다.
+    :param statements: List[Statement], 한 종목의 재무제표
+    :return:
+        dict, {(회계일자, 보고서 구분): sha1 hex digest}
+    """
+    digests = {}
+    for stmt in sorted(statements, key=lambda each: (each.fiscal_date, str(each.report_code),
+                                                     each.consensus, str(each.fs_div))):
+        key = (stmt.fiscal_date, stmt.report_code)
+        if key not in digests:
+            digests[key] = hashlib.sha1(stmt.stock_code.encode('utf-8'))
+        _update_statement_digest(digests[key], stmt)
+
+    return {key: digest.hexdigest() for key, digest in digests.items()}
+
+
+def summary_digest(summary: StockSummary) -> str:
+    """
+    주식수 요약 내용 해시. 기준일자만 바뀌고 주식수가 같으면 같은 값
+    :param summary: StockSummary
+    :return:
+        str, sha1 hex digest
+    """
+    return hashlib.sha1(repr((summary.stock_code, summary.common_stock_cnt,
+                              summary.pref_stock_cnt, summary.treasury_stock_cnt)).encode('utf-8')).hexdigest()
+
+
+def _update_statement_digest(digest, stmt: Statement):
+    digest.update(repr((stmt.fiscal_date, stmt.report_code, stmt.consensus, stmt.fs_div)).encode('utf-8'))
+    for fact in stmt.facts:
+        digest.update(repr((fact.account_name, fact.value, fact.group, fact.sector, fact.sj_div)).encode('utf-8'))
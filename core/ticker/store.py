@@ -1,4 +1,5 @@
 import re
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import List, Union
@@ -12,6 +13,7 @@ from skogkatt.commons.util.singleton import Singleton
 from skogkatt.conf.app_conf import get_project_path
 from skogkatt.core import LoggerFactory
 from skogkatt.core.dao import dao_factory
+from skogkatt.core.dao.idao import TickerDAO
 from skogkatt.core.ticker import Ticker
 from skogkatt.crawler import TickerCrawler
 from skogkatt.errors import CrawlerError
@@ -39,43 +41,70 @@ def market_type_checker(market: Union[str, list]) -> List[str]:
 
 
 class TickerStore(metaclass=Singleton):
+    """
+    종목 정보 조회. DB의 종목 정보는 처음 조회할 때 읽는다(필요하면 수집 후 읽음).
+    모듈 import 시 DB에 연결하지 않는다.
+    """
 
     def __init__(self):
         self._stock_codes = dict()
         self._corp_codes = dict()
         self._corp_names = []
-
-        self.dao = dao_factory.get("TickerDAO")
-        self.tickers = self.dao.find()
-
-        if len(self.tickers) == 0:
-            logger.info('No ticker data found in database, crawl starts.')
-            crawler = TickerCrawler()
-            crawler.crawl()
-            self.tickers = self.dao.find()
-        else:
-            monitor = BatchMonitor()
-            today = datetime.today()
-            status = monitor.get_status(batch_lookup.TICKER['name'])
-
-            if status is None or days_between(status.end, today) > 1:
-                logger.info('Ticker data in database is out of date, crawl starts.')
-                try:
-                    crawler = TickerCrawler()
-                    crawler.crawl()
-                    self.tickers = self.dao.find()
-                except CrawlerError as err:
-                    logger.warning(f'Ticker crawling failed. {str(err)}, legacy data will be used.')
+        self._tickers = None
+        self._dao = None
+        self._lock = threading.RLock()
+
+    @property
+    def dao(self) -> TickerDAO:
+        if self._dao is None:
+            self._dao = dao_factory.get("TickerDAO")
+        return self._dao
+
+    @property
+    def tickers(self) -> List[Ticker]:
+        if self._tickers is None:
+            self._load()
+        return self._tickers
+
+    def _load(self):
+        with self._lock:
+            if self._tickers is not None:
+                return
+
+            tickers = self.dao.find()
+
+            if len(tickers) == 0:
+                logger.info('No ticker data found in database, crawl starts.')
+                crawler = TickerCrawler()
+                crawler.crawl()
+                tickers = self.dao.find()
             else:
-                logger.debug(f'Ticker data in DB is up to date. {status.end}')
-
-        if len(self.tickers) == 0:
-            raise ValueError('Cannot resolve ticker data.')
-
-        for idx, x in enumerate(self.tickers):
-            self._stock_codes[x.code] = idx
-            self._corp_names.append(x.name)
-            self._corp_codes[x.corp_code] = idx
+                monitor = BatchMonitor()
+                today = datetime.today()
+                status = monitor.get_status(batch_lookup.TICKER['name'])
+
+                if status is None or days_between(status.end, today) > 1:
+                    logger.info('Ticker data in database is out of date, crawl starts.')
+                    try:
+                        crawler = TickerCrawler()
+                        crawler.crawl()
+                        tickers = self.dao.find()
+                    except CrawlerError as err:
+                        logger.warning(f'Ticker crawling failed. {str(err)}, legacy data will be used.')
+                else:
+                    logger.debug(f'Ticker data in DB is up to date. {status.end}')
+
+            if len(tickers) == 0:
+                raise ValueError('Cannot resolve ticker data.')
+
+            stock_codes, corp_codes, corp_names = dict(), dict(), []
+            for idx, x in enumerate(tickers):
+                stock_codes[x.code] = idx
+                corp_names.append(x.name)
+                corp_codes[x.corp_code] = idx
+
+            self._stock_codes, self._corp_codes, self._corp_names = stock_codes, corp_codes, corp_names
+            self._tickers = tickers
 
     def get_tickers(self) -> List[Ticker]:
         return self.tickers
@@ -88,8 +117,9 @@ class TickerStore(metaclass=Singleton):
         :return:
             Ticker
         """
+        tickers = self.tickers
         idx = self._stock_codes.get(code)
-        return self.tickers[idx] if idx is not None else None
+        return tickers[idx] if idx is not None else None
 
     def find_by_name(self, name, exactly=False) -> List[Ticker]:
         """
@@ -100,6 +130,7 @@ class TickerStore(metaclass=Singleton):
         :return:
             List[Ticker]
         """
+        tickers = self.tickers
         ticker_list = []
         if exactly is True:
             name = '^' + name + '$'
@@ -107,7 +138,7 @@ class TickerStore(metaclass=Singleton):
 
         for idx, corp_name in enumerate(self._corp_names):
             if regex.search(corp_name) is not None:
-                ticker_list.append(self.tickers[idx])
+                ticker_list.append(tickers[idx])
 
         return ticker_list
 
@@ -118,8 +149,9 @@ class TickerStore(metaclass=Singleton):
         :return:
             Ticker
         """
+        tickers = self.tickers
         idx = self._corp_codes.get(corp_code)
-        return self.tickers[idx] if idx is not None else None
+        return tickers[idx] if idx is not None else None
 
     def find_by_market(self, market='SK'):
         """
@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 압축 방식별 파일 확장자
+CODEC_SUFFIXES = {'zstd': '.zst', 'gzip': '.gz'}
+
+
+def quarter_of(date: datetime = None) -> str:
+    """
+    :param date: datetime, optional, default: 오늘
+    :return:
+        str, 분기 ex) 2021Q2
+    """
+    date = date if date is not None else datetime.now()
+    return f'{date.year}Q{(date.month - 1) // 3 + 1}'
+
+
+class HtmlArchive:
+    """
+    수집한 페이지 원본(응답 bytes)을 압축해서 내용 해시(sha1) 파일명으로 저장하는 저장소.
+      - objects/ab/abcd...html.zst : 페이지 원본. 같은 내용은 한번만 저장
+      - index/2021Q2.jsonl : 분기별 색인. 종목코드별 내용 해시를 한 줄씩 추가만 하고 종목의 마지막 줄을 사용
+    분기별 색인이 남아 있으므로 지난 분기 페이지도 다시 수집하지 않고 파싱할 수 있다.
+    zstandard 패키지가 있으면 zstd, 없으면 gzip으로 압축한다.
+    """
+
+    def __init__(self, path: str, codec: str = None):
+        """
+        :param path: str, 저장소 폴더
+        :param codec: str, optional, 압축 방식(zstd, gzip). default: zstandard 설치시 zstd
+        """
+        if codec is None:
+            codec = 'zstd' if zstandard is not None else 'gzip'
+        if codec not in CODEC_SUFFIXES:
+            raise ValueError(f'Unsupported codec: {codec}')
+        if codec == 'zstd' and zstandard is None:
+            raise ValueError('zstd codec requires zstandard package')
+
+        self.root = Path(path)
+        self.codec = codec
+        self._lock = threading.RLock()
+        self._indexes = {}
+
+    def put(self, stock_code: str, content: bytes, quarter: str = None) -> str:
+        """
+        페이지 원본을 저장하고 분기 색인에 추가한다.
+        :param stock_code: str, 종목코드
+        :param content: bytes, 응답 원본
+        :param quarter: str, optional, 분기. default: 이번 분기
+        :return:
+            str, 내용 해시
+        """
+        digest = hashlib.sha1(content).hexdigest()
+        path = self._object_path(digest, self.codec)
+
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(f'{path.name}.{threading.get_ident()}.tmp')
+            with open(temp_path, 'wb') as file:
+                file.write(self._compress(content))
+            os.replace(temp_path, path)
+
+        self._append_index(quarter if quarter is not None else quarter_of(),
+                           {'stock_code': stock_code, 'digest': digest, 'codec': self.codec, 'size': len(content),
+                            'stored': datetime.now().isoformat(timespec='seconds')})
+        return digest
+
+    def retain(self, stock_code: str, quarter: str = None) -> bool:
+        """
+        내용이 바뀌지 않은 종목의 가장 최근 자료를 분기 색인에 추가한다. 원본은 다시 저장하지 않는다.
+        :param stock_code: str, 종목코드
+        :param quarter: str, optional, 분기. default: 이번 분기
+        :return:
+            bool, 색인에 추가했으면 True. 저장된 자료가 없거나 이미 색인에 있으면 False
+        """
+        quarter = quarter if quarter is not None else quarter_of()
+        if stock_code in self.index(quarter):
+            return False
+
+        entry = self.find(stock_code)
+        if entry is None:
+            return False
+
+        self._append_index(quarter, dict(entry, stored=datetime.now().isoformat(timespec='seconds')))
+        return True
+
+    def get(self, stock_code: str, quarter: str = None) -> bytes or None:
+        """
+        :param stock_code: str, 종목코드
+        :param quarter: str, optional, 분기. default: 자료가 있는 가장 최근 분기
+        :return:
+            bytes, 페이지 원본. 자료가 없으면 None
+        """
+        entry = self.find(stock_code, quarter)
+        if entry is None:
+            return None
+
+        with open(self._object_path(entry['digest'], entry['codec']), 'rb') as file:
+            return self._decompress(file.read(), entry['codec'])
+
+    def find(self, stock_code: str, quarter: str = None) -> dict or None:
+        """
+        :param stock_code: str, 종목코드
+        :param quarter: str, optional, 분기. default: 자료가 있는 가장 최근 분기
+        :return:
+            dict, 색인 정보 {stock_code, digest, codec, size, stored}. 자료가 없으면 None
+        """
+        quarters = [quarter] if quarter is not None else reversed(self.quarters())
+        for each in quarters:
+            entry = self.index(each).get(stock_code)
+            if entry is not None:
+                return entry
+
+        return None
+
+    def contains(self, stock_code: str, quarter: str = None) -> bool:
+        return self.find(stock_code, quarter) is not None
+
+    def quarters(self) -> List[str]:
+        """
+        :return:
+            List[str], 색인이 있는 분기. 오래된 순
+        """
+        index_dir = self.root.joinpath('index')
+        if not index_dir.exists():
+            return []
+
+        return sorted(path.stem for path in index_dir.glob('*.jsonl'))
+
+    def index(self, quarter: str) -> Dict[str, dict]:
+        """
+        분기 색인. 색인 파일이 다른 프로세스에서 변경되었으면 다시 읽는다.
+        :param quarter: str, 분기
+        :return:
+            dict, {종목코드: 색인 정보}
+        """
+        path = self._index_path(quarter)
+        mtime = path.stat().st_mtime_ns if path.exists() else None
+
+        with self._lock:
+            cached = self._indexes.get(quarter)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+            entries = {}
+            if mtime is not None:
+                with open(path, 'rt', encoding='utf-8') as file:
+                    for line in file:
+                        line = line.strip()
+                        if line:
+                            entry = json.loads(line)
+                            entries[entry['stock_code']] = entry
+
+            self._indexes[quarter] = (mtime, entries)
+            return entries
+
+    def _append_index(self, quarter: str, entry: dict):
+        path = self._index_path(quarter)
+        with self._lock:
+            entries = self.index(quarter)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'at', encoding='utf-8') as file:
+                file.write(json.dumps(entry) + '\n')
+
+            entries[entry['stock_code']] = entry
+            self._indexes[quarter] = (path.stat().st_mtime_ns, entries)
+
+    def _index_path(self, quarter: str) -> Path:
+        return self.root.joinpath('index', f'{quarter}.jsonl')
+
+    def _object_path(self, digest: str, codec: str) -> Path:
+        return self.root.joinpath('objects', digest[:2], f'{digest}.html{CODEC_SUFFIXES[codec]}')
+
+    def _compress(self, content: bytes) -> bytes:
+        if self.codec == 'zstd':
+            return zstandard.ZstdCompressor(level=10).compress(content)
+
+        return gzip.compress(content, compresslevel=6)
+
+    @staticmethod
+    def _decompress(data: bytes, codec: str) -> bytes:
+        if codec == 'zstd':
+            if zstandard is None:
+                raise ValueError('zstd codec requires zstandard package')
+            return zstandard.ZstdDecompressor().decompress(data)
+
+        return gzip.decompress(data)
@@ -0,0 +1,160 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Tuple
+
+from requests import Response
+
+from skogkatt.commons.http.request import Request
+from skogkatt.commons.http.throttle import Throttle
+from skogkatt.core import LoggerFactory
+
+logger = LoggerFactory.get_logger(__name__)
+
+
+class IPRenewGate:
+    """
+    IP 갱신 주기 관리. 주기가 지나면 새 요청을 멈추고 진행 중인 요청이 모두 끝난 후 한 스레드만 IP를 갱신한다.
+    """
+
+    def __init__(self, interval: float = None, renew: Callable[[], Any] = None):
+        """
+        :param interval: float, optional, IP 갱신 주기(초). None 이면 갱신하지 않음
+        :param renew: callable, optional, IP 갱신 함수
+        """
+        self._interval = interval
+        self._renew = renew
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._renewing = False
+        self._renewed_at = time.monotonic()
+
+    @contextmanager
+    def request(self):
+        """ 요청 한 건의 실행 구간. IP 갱신 중이면 갱신이 끝날 때까지 기다린다 """
+        self._enter()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def _enter(self):
+        with self._cond:
+            while self._renewing:
+                self._cond.wait()
+
+            if not self._is_due():
+                self._in_flight += 1
+                return
+
+            self._renewing = True
+            while self._in_flight > 0:
+                self._cond.wait()
+
+        try:
+            elapsed = time.monotonic() - self._renewed_at
+            logger.debug(f'IP used {elapsed / 60:.1f} minutes, renew IP')
+            self._renew()
+        finally:
+            with self._cond:
+                self._renewed_at = time.monotonic()
+                self._renewing = False
+                self._cond.notify_all()
+
+        with self._cond:
+            self._in_flight += 1
+
+    def _is_due(self) -> bool:
+        return self._interval is not None and self._renew is not None \
+            and time.monotonic() - self._renewed_at > self._interval
+
+
+class CrawlEngine:
+    """
+    작업 목록을 스레드 풀로 동시에 실행하는 수집기. 작업 안에서 get()으로 요청하면
+      - Throttle로 전체/호스트별 초당 요청 수와 호스트별 동시 요청 수를 제한하고
+      - IPRenewGate로 IP 갱신 주기마다 진행 중인 요청이 끝난 후 IP를 갱신한다.
+    요청은 스레드별 Request(requests.Session)로 보낸다.
+    작업에서 fatal_errors 오류가 발생하면 아직 시작하지 않은 작업은 실행하지 않고,
+    진행 중인 작업이 끝난 후 처음 발생한 오류를 다시 발생시킨다. 그 외 오류는 로그만 남긴다.
+    """
+
+    def __init__(self,
+                 workers: int = 1,
+                 throttle: Throttle = None,
+                 ip_renew_interval: float = None,
+                 renew: Callable[[], Any] = None,
+                 fatal_errors: Tuple = (Exception,)):
+        """
+        :param workers: int, optional, 동시 실행 작업 수
+        :param throttle: Throttle, optional, 요청 속도 제한. None 이면 제한 없음
+        :param ip_renew_interval: float, optional, IP 갱신 주기(초)
+        :param renew: callable, optional, IP 갱신 함수
+        :param fatal_errors: tuple, optional, 수집을 중단할 오류 타입
+        """
+        self.workers = workers
+        self.throttle = throttle if throttle is not None else Throttle()
+        self.fatal_errors = fatal_errors
+        self._gate = IPRenewGate(ip_renew_interval, renew)
+        self._local = threading.local()
+
+    def get(self, url: str, payload: dict = None, proxies: dict = None, timeout: int = 120,
+            headers: dict = None) -> Response:
+        """
+        GET 요청. 작업 안에서 호출한다.
+        :param url: str, URL
+        :param payload: dict, optional, 요청 파라미터
+        :param proxies: dict, optional, 프록시 설정
+        :param timeout: int, optional, default 120s
+        :param headers: dict, optional, 요청 헤더(If-None-Match 등)
+        :return:
+            requests.Response
+        """
+        with self._gate.request(), self.throttle.slot(url):
+            return self._session().get(url=url, payload=payload, proxies=proxies, timeout=timeout, headers=headers)
+
+    def run(self, items: Iterable, task: Callable[[Any], Any]) -> int:
+        """
+        작업을 동시에 실행한다.
+        :param items: iterable, 작업 대상(종목코드 등)
+        :param task: callable, 작업 함수 task(item)
+        :return:
+            int, 완료한 작업 수
+        """
+        stop = threading.Event()
+        errors = []
+        done = []
+
+        def run_task(item):
+            if stop.is_set():
+                return
+
+            try:
+                task(item)
+                done.append(item)
+            except self.fatal_errors as err:
+                errors.append(err)
+                stop.set()
+            except Exception as err:
+                logger.error(f'{item} - {str(err)}')
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for item in items:
+                executor.submit(run_task, item)
+
+        if len(errors) > 0:
+            raise errors[0]
+
+        return len(done)
+
+    def _session(self) -> Request:
+        """ 스레드별 Request. 요청 간격은 Throttle로 제한하므로 대기하지 않는다 """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = Request(delay=None)
+            self._local.session = session
+
+        return session
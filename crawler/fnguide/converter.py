@@ -1,126 +1,368 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from queue import Queue
+from typing import Iterator, List, Tuple
 
 from skogkatt.batch import batch_lookup
 from skogkatt.batch.queue_factory import queue_factory
-from skogkatt.crawler.fnguide.parser import FnSnapshotParser, FnStatementParser
-from skogkatt.core.dao.idao import StockSummaryDAO, FnStatementDAO, FnStatementAbbrDAO
+from skogkatt.crawler.fnguide.layout import preflight_statements
+from skogkatt.crawler.fnguide.lxml_parser import LxmlSnapshotParser, LxmlStatementParser
+from skogkatt.core.dao.idao import (
+    StockSummaryDAO, FnStatementDAO, FnStatementAbbrDAO, StatementDigestDAO, FetchMetaDAO
+)
 from skogkatt.core.dao import dao_factory
+from skogkatt.core.financial.digest import statement_digests, summary_digest
+from skogkatt.core.financial.dto import FinancialStatementDTO
 from skogkatt.core.decorators import batch_status
 from skogkatt.errors import StatementParseError
 from skogkatt.core import LoggerFactory
+from skogkatt.screeners.rim.cache import price_estimate_cache
 
 logger = LoggerFactory.get_logger(__name__)
 
+# 재무제표를 한번에 저장할 종목 수
+CONVERT_CHUNK_SIZE = 50
+
+# HTML 파싱 프로세스 수. 1 이면 현재 프로세스에서 순서대로 파싱
+CONVERT_WORKERS = os.cpu_count() or 1
+
+# 파싱 프로세스에 한번에 넘기는 종목 수
+PARSE_CHUNK_SIZE = 8
+
+# 파싱 프로세스별 파서
+_process_parser = None
+
 
 def save_failed_ticker(failed_codes):
     dao = dao_factory.get('FailedTickerDAO')
     dao.update(failed_codes)
 
 
+def record_digests(stock_code: str, source: str, statements: list = None, summary=None) -> bool:
+    """
+    변환한 재무정보의 내용 해시를 저장하고 변경 여부를 반환한다.
+    변경된 종목은 RIM 적정가격 증분 계산(RIMPriceEstimator.start_incremental) 대상이 된다.
+    :param stock_code: str, 종목코드
+    :param source: str, 자료구분(stock_summary, statement, abbreviation)
+    :param statements: List[Statement], optional, 재무제표
+    :param summary: StockSummary, optional, 주식수 요약
+    :return:
+        bool, 내용이 바뀌었으면 True
+    """
+    digest_dao: StatementDigestDAO = dao_factory.get('StatementDigestDAO')
+    digests = {(None, None): summary_digest(summary)} if summary is not None else statement_digests(statements)
+    return digest_dao.update(stock_code, source, digests)
+
+
+def resolve_convert_queue(job_name: str, source: str) -> Queue:
+    """
+    변환 작업 큐를 반환한다.
+    DB 큐에 남은 종목이 있으면 그대로 사용하고, 수집 배치(source)의 수집 정보가 있으면
+    내용이 바뀐 종목(FetchMetaDAO.find_changed)만 큐에 할당한다. 수집 정보가 없으면 resolve_queue를 따른다.
+    :param job_name: str, 변환 배치명
+    :param source: str, 수집 배치명
+    :return:
+        Queue object
+    """
+    queue = queue_factory.get_queue(job_name)
+    if not queue.empty():
+        return queue
+
+    fetch_meta_dao: FetchMetaDAO = dao_factory.get('FetchMetaDAO')
+    if fetch_meta_dao.count(source) == 0:
+        return queue_factory.resolve_queue(job_name)
+
+    changed_codes = fetch_meta_dao.find_changed(source)
+    logger.info(f'{source} - changed since last convert: {len(changed_codes)}')
+    if len(changed_codes) == 0:
+        return Queue()
+
+    return queue_factory.assign_queue(job_name, changed_codes)
+
+
+def clear_fetch_changed(source: str, stock_codes: List[str]):
+    """ 변환한 종목의 수집 변경 표시를 지운다 """
+    fetch_meta_dao: FetchMetaDAO = dao_factory.get('FetchMetaDAO')
+    fetch_meta_dao.clear_changed(source, stock_codes)
+
+
+def _init_parser(parser_class, parser_kwargs: dict = None):
+    global _process_parser
+    _process_parser = parser_class(**(parser_kwargs or {}))
+
+
+def _parse_with(parser, stock_code: str, contents: bytes = None) -> Tuple[str, FinancialStatementDTO, tuple]:
+    """
+    파싱 오류는 예외 대신 (실패 원인, 오류 메시지)로 반환한다. 파싱 프로세스의 예외는 pickle되지 않을 수 있다.
+    contents를 지정하면 저장소나 파일 대신 응답 원본을 파싱한다.
+    :return:
+        (종목코드, DTO, 오류) - 성공하면 오류는 None, 실패하면 DTO는 None
+    """
+    try:
+        dto = parser.parse(stock_code) if contents is None else parser.parse(stock_code, contents=contents)
+        return stock_code, dto, None
+    except FileNotFoundError as err:
+        return stock_code, None, ('FileNotFound', str(err))
+    except StatementParseError as err:
+        return stock_code, None, (str(err), str(err))
+
+
+def _parse_in_process(stock_code: str, contents: bytes = None):
+    return _parse_with(_process_parser, stock_code, contents)
+
+
+def parse_files(parser_class, stock_codes: List[str], workers: int = CONVERT_WORKERS, parser_kwargs: dict = None) \
+        -> Iterator[Tuple[str, FinancialStatementDTO, tuple]]:
+    """
+    종목별 HTML을 파싱한다. workers가 2 이상이면 프로세스 풀에서 동시에 파싱하고,
+    결과는 stock_codes 순서대로 반환하므로 앞의 결과를 저장하는 동안 뒤의 종목을 파싱한다.
+    :param parser_class: FnSnapshotParser or FnStatementParser (Lxml 파서 포함)
+    :param stock_codes: List[str], 종목코드
+    :param workers: int, optional, 파싱 프로세스 수
+    :param parser_kwargs: dict, optional, 파서 생성 인자(ex. LxmlStatementParser layouts)
+    :return:
+        Iterator[(종목코드, DTO, 오류)], 오류는 (실패 원인, 오류 메시지)
+    """
+    if workers <= 1 or len(stock_codes) <= 1:
+        parser = parser_class(**(parser_kwargs or {}))
+        for stock_code in stock_codes:
+            yield _parse_with(parser, stock_code)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(stock_codes)),
+                             initializer=_init_parser,
+                             initargs=(parser_class, parser_kwargs)) as executor:
+        yield from executor.map(_parse_in_process, stock_codes, chunksize=PARSE_CHUNK_SIZE)
+
+
+def store_statements(job_name: str,
+                     statement_dao: FnStatementDAO,
+                     dtos: List[FinancialStatementDTO],
+                     failed_codes: List[dict],
+                     abbreviation: bool = False) -> List[FinancialStatementDTO]:
+    """
+    여러 종목의 재무제표를 한번에 저장하고(FnStatementDAO.update_many) 저장에 실패한 종목은 실패 목록에 추가한다.
+    :param job_name: str, 배치명
+    :param statement_dao: FnStatementDAO or FnStatementAbbrDAO
+    :param dtos: List[FinancialStatementDTO], 파싱한 DTO
+    :param failed_codes: List[dict], 실패 목록
+    :param abbreviation: bool, True 이면 요약 재무제표(annual/quarter_abbreviations), False 이면 재무제표 저장
+    :return:
+        List[FinancialStatementDTO], 저장에 성공한 종목의 DTO
+    """
+    if len(dtos) == 0:
+        return []
+
+    statements = []
+    for dto in dtos:
+        if abbreviation:
+            statements.extend(dto.annual_abbreviations + dto.quarter_abbreviations)
+        else:
+            statements.extend(dto.annual_statements + dto.quarter_statements)
+
+    outcomes = statement_dao.update_many(statements)
+
+    stored = []
+    for dto in dtos:
+        errors = outcomes.get(dto.stock_code, {}).get('errors')
+        if errors:
+            logger.error(f'{dto.stock_code} - statement write failed: {errors[0]}')
+            failed_codes.append({'date': datetime.now(), 'job_name': job_name,
+                                 'stock_code': dto.stock_code, 'cause': errors[0]})
+            continue
+
+        stored.append(dto)
+
+    return stored
+
+
+class ConvertWriter:
+    """
+    파싱 결과를 chunk_size 종목씩 모아서 한번에 저장하고 처리, 변경, 실패 종목을 기록한다.
+    저장한 종목은 변환 DB 큐에서 삭제하고 수집 변경 표시와 적정가격 캐시(price_estimate_cache)를 지운다.
+    변환 배치(convert_snapshot, convert_statement)와 스트리밍 변환(pipeline)에서 사용
+    """
+    # 로그에 표시할 자료명
+    name = None
+
+    def __init__(self, job_name: str, source: str, chunk_size: int = CONVERT_CHUNK_SIZE):
+        """
+        :param job_name: str, 변환 배치명. 실패 종목은 이 배치명으로 FailedTickerDAO에 저장
+        :param source: str, 수집 배치명
+        :param chunk_size: int, optional, 한번에 저장할 종목 수
+        """
+        self.job_name = job_name
+        self.source = source
+        self.chunk_size = chunk_size
+        self.processed_codes = []
+        self.changed_codes = []
+        self.failed_codes = []
+        self._pending = []
+
+    def add(self, stock_code: str, dto: FinancialStatementDTO, error: tuple = None) -> List[str]:
+        """
+        파싱 결과를 추가한다. chunk_size 종목이 모이면 저장한다.
+        :param stock_code: str, 종목코드
+        :param dto: FinancialStatementDTO, 파싱 결과. 실패하면 None
+        :param error: tuple, optional, (실패 원인, 오류 메시지)
+        :return:
+            List[str], 이번에 저장한 종목코드
+        """
+        if error is not None:
+            logger.error(error[1])
+            self.failed_codes.append({'date': datetime.now(), 'job_name': self.job_name, 'stock_code': stock_code,
+                                      'cause': error[0]})
+        else:
+            self._pending.append(dto)
+            logger.debug(f'..{self.name.capitalize()} parsed - {stock_code}')
+
+        if len(self._pending) >= self.chunk_size:
+            return self.flush()
+
+        return []
+
+    def flush(self) -> List[str]:
+        """
+        모아 둔 DTO를 저장한다.
+        :return:
+            List[str], 저장한 종목코드
+        """
+        stored_codes = [dto.stock_code for dto in self.store(self._pending)]
+        if len(stored_codes) > 0:
+            price_estimate_cache.invalidate(stored_codes)
+        queue_factory.remove_queue_items(self.job_name, stored_codes)
+        clear_fetch_changed(self.source, stored_codes)
+        self.processed_codes.extend(stored_codes)
+        self._pending.clear()
+
+        return stored_codes
+
+    def store(self, dtos: List[FinancialStatementDTO]) -> List[FinancialStatementDTO]:
+        raise NotImplementedError
+
+    def close(self) -> List[str]:
+        """
+        남은 DTO를 저장하고 실패 종목을 FailedTickerDAO에 저장한다.
+        실패 종목은 변환 DB 큐에 남겨 두므로 다음 실행에서 다시 변환한다.
+        :return:
+            List[처리된 종목코드]
+        """
+        self.flush()
+        logger.info(f'Financial {self.name}s changed: {len(self.changed_codes)}/{len(self.processed_codes)}')
+
+        if len(self.failed_codes) > 0:
+            logger.info(f'There are unresolved financial {self.name}s: {len(self.failed_codes)}, check error.log')
+            save_failed_ticker(self.failed_codes)
+
+        return self.processed_codes
+
+
+class SnapshotWriter(ConvertWriter):
+    name = 'snapshot'
+
+    def __init__(self, job_name: str, source: str, chunk_size: int = CONVERT_CHUNK_SIZE):
+        super().__init__(job_name, source, chunk_size)
+        self.summary_dao: StockSummaryDAO = dao_factory.get('StockSummaryDAO')
+        self.statement_dao: FnStatementAbbrDAO = dao_factory.get('FnStatementAbbrDAO')
+
+    def store(self, dtos: List[FinancialStatementDTO]) -> List[FinancialStatementDTO]:
+        stored = store_statements(self.job_name, self.statement_dao, dtos, self.failed_codes, abbreviation=True)
+        self.summary_dao.update_many([dto.stock_summary for dto in stored])
+
+        for dto in stored:
+            summary_changed = record_digests(dto.stock_code, 'stock_summary', summary=dto.stock_summary)
+            if record_digests(dto.stock_code, 'abbreviation', dto.annual_abbreviations + dto.quarter_abbreviations) \
+                    or summary_changed:
+                self.changed_codes.append(dto.stock_code)
+
+        return stored
+
+
+class StatementWriter(ConvertWriter):
+    name = 'statement'
+
+    def __init__(self, job_name: str, source: str, chunk_size: int = CONVERT_CHUNK_SIZE):
+        super().__init__(job_name, source, chunk_size)
+        self.statement_dao: FnStatementDAO = dao_factory.get('FnStatementDAO')
+
+    def store(self, dtos: List[FinancialStatementDTO]) -> List[FinancialStatementDTO]:
+        stored = store_statements(self.job_name, self.statement_dao, dtos, self.failed_codes)
+        for dto in stored:
+            if record_digests(dto.stock_code, 'statement', dto.annual_statements + dto.quarter_statements):
+                self.changed_codes.append(dto.stock_code)
+
+        return stored
+
+
 @batch_status(batch_lookup.FN_SNAPSHOT_CONVERT['name'])
-def convert_snapshot(queue: Queue = None):
+def convert_snapshot(queue: Queue = None, chunk_size: int = CONVERT_CHUNK_SIZE, workers: int = CONVERT_WORKERS):
     """
     FnGuide에서 수집한 FnSnapshot HTML 자료를 변환하여 DB에 저장한다.
+    큐를 지정하지 않으면 수집 후 내용이 바뀐 종목만 변환한다(resolve_convert_queue).
+    HTML은 workers 개 프로세스에서 파싱하고(parse_files),
+    요약 재무제표는 현재 프로세스에서 chunk_size 종목씩 모아서 한번에 저장한다.
     :param queue: Queue, optional, 처리할 주식코드를 별도로 지정할 때 사용
+    :param chunk_size: int, optional, 한번에 저장할 종목 수
+    :param workers: int, optional, 파싱 프로세스 수. 1 이면 현재 프로세스에서 파싱
     :return:
         List[처리된 종목코드]
     """
     job_name = batch_lookup.FN_SNAPSHOT_CONVERT['name']
-    queue = queue if queue is not None else queue_factory.resolve_queue(job_name)
+    source = batch_lookup.FN_GUIDE_SNAPSHOT['name']
+    queue = queue if queue is not None else resolve_convert_queue(job_name, source)
 
     if queue.empty():
         logger.info(f'Queue for {job_name} is empty, return.')
         return
 
-    processed_codes = []
-    failed_codes = []
-    summary_dao: StockSummaryDAO = dao_factory.get('StockSummaryDAO')
-    statement_dao: FnStatementAbbrDAO = dao_factory.get('FnStatementAbbrDAO')
-    parser = FnSnapshotParser()
-
-    logger.info(f'FnGuide Snapshot HTML parse and save to DB - queued: {queue.qsize()}')
-
-    for count in range(queue.qsize()):
-        start = datetime.now()
-        stock_code = queue.get().get('stock_code')
-        try:
-            # filename = f'{filename_prefix}{stock_code}.html'
-            dto = parser.parse(stock_code)
-            summary_dao.update(dto.stock_summary)
-            statement_dao.update(dto.annual_abbreviations)
-            statement_dao.update(dto.quarter_abbreviations)
-
-            queue_factory.remove_queue_item(job_name, stock_code)
-            processed_codes.append(stock_code)
-        except FileNotFoundError as err:
-            logger.error(str(err))
-            failed_codes.append({'date': start, 'job_name': job_name, 'stock_code': stock_code, 'cause': 'FileNotFound'})
-        except StatementParseError as err:
-            logger.error(str(err))
-            failed_codes.append({'date': start, 'job_name': job_name, 'stock_code': stock_code, 'cause': str(err)})
-
-        elapsed = datetime.now() - start
-        logger.debug(f'..Snapshot converted - {stock_code}, elapsed:{elapsed}')
+    writer = SnapshotWriter(job_name, source, chunk_size)
+    logger.info(f'FnGuide Snapshot HTML parse and save to DB - queued: {queue.qsize()}, workers: {workers}')
 
-    if not queue.empty():
-        logger.info(f'There are unresolved financial snapshots: {queue.qsize()}, check error.log')
-        save_failed_ticker(failed_codes)
-        queue_factory.remove_batch_queue(job_name)
+    stock_codes = [queue.get().get('stock_code') for count in range(queue.qsize())]
+    for stock_code, dto, error in parse_files(LxmlSnapshotParser, stock_codes, workers):
+        writer.add(stock_code, dto, error)
 
-    return processed_codes
+    return writer.close()
 
 
 @batch_status(batch_lookup.FN_STATEMENT_CONVERT['name'])
-def convert_statement(queue: Queue = None):
+def convert_statement(queue: Queue = None,
+                      chunk_size: int = CONVERT_CHUNK_SIZE,
+                      workers: int = CONVERT_WORKERS,
+                      preflight: bool = True):
     """
     FnGuide에서 수집한 재무제표 HTML 자료를 변환하여 DB에 저장한다.
+    큐를 지정하지 않으면 수집 후 내용이 바뀐 종목만 변환한다(resolve_convert_queue).
+    변환 전에 업종별 표본 종목으로 표 구조 변경을 확인하고(preflight_statements),
+    변환할 수 없는 구조로 바뀌었으면 LayoutDriftError로 중단한다. 큐는 그대로 남는다.
+    HTML은 workers 개 프로세스에서 파싱하고(parse_files),
+    재무제표는 현재 프로세스에서 chunk_size 종목씩 모아서 한번에 저장한다.
     :param queue: Queue, optional, 처리할 주식코드를 별도로 지정할 때 사용
+    :param chunk_size: int, optional, 한번에 저장할 종목 수
+    :param workers: int, optional, 파싱 프로세스 수. 1 이면 현재 프로세스에서 파싱
+    :param preflight: bool, optional, 표 구조 확인 여부
     :return:
         List[처리된 종목코드]
     """
-    job_name = 'fn-statement-convert'
-    queue = queue if queue is not None else queue_factory.resolve_queue(job_name)
+    job_name = batch_lookup.FN_STATEMENT_CONVERT['name']
+    source = batch_lookup.FN_GUIDE_STATEMENT['name']
+    queue = queue if queue is not None else resolve_convert_queue(job_name, source)
 
     if queue.empty():
         logger.info(f'Queue for {job_name} is empty, return.')
         return
 
-    processed_codes = []
-    failed_codes = []
-    statement_dao: FnStatementDAO = dao_factory.get('FnStatementDAO')
-    parser = FnStatementParser()
-
-    logger.info(f'FnGuide Statement HTML parse and save to DB - queued: {queue.qsize()}')
-
-    for count in range(queue.qsize()):
-        start = datetime.now()
-        stock_code = queue.get().get('stock_code')
-        try:
-            # filename = f'{filename_prefix}{stock_code}.html'
-            dto = parser.parse(stock_code)
-            statement_dao.update(dto.annual_statements)
-            statement_dao.update(dto.quarter_statements)
-
-            queue_factory.remove_queue_item(job_name, stock_code)
-            processed_codes.append(stock_code)
-        except FileNotFoundError as err:
-            logger.error(str(err))
-            failed_codes.append(
-                {'date': start, 'job_name': job_name, 'stock_code': stock_code, 'cause': 'FileNotFound'})
-        except StatementParseError as err:
-            logger.error(str(err))
-            failed_codes.append({'date': start, 'job_name': job_name, 'stock_code': stock_code, 'cause': str(err)})
-
-        elapsed = datetime.now() - start
-        logger.debug(f'..Statement converted - {stock_code}, elapsed:{elapsed}')
+    writer = StatementWriter(job_name, source, chunk_size)
+    logger.info(f'FnGuide Statement HTML parse and save to DB - queued: {queue.qsize()}, workers: {workers}')
 
-    if not queue.empty():
-        logger.info(f'There are unresolved financial statements: {queue.qsize()}, check error.log')
-        save_failed_ticker(failed_codes)
-        queue_factory.remove_batch_queue(job_name)
+    stock_codes = [queue.get().get('stock_code') for count in range(queue.qsize())]
+    layouts = preflight_statements(stock_codes) if preflight else {}
+
+    for stock_code, dto, error in parse_files(LxmlStatementParser, stock_codes, workers, {'layouts': layouts}):
+        writer.add(stock_code, dto, error)
 
-    return processed_codes
+    return writer.close()
 
 
 if __name__ == '__main__':
@@ -2,8 +2,13 @@
 FnGuide HTML을 DataFrame으로 변환시 참조할 행번호.
 """
 from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from pandas import DataFrame
 
 from skogkatt.core.financial.constants import StatementType, StatementSector
+from skogkatt.errors import StatementParseError
 
 """ FnGuide Financial Highlight Table """
 FN_HIGHLIGHT_ROW_INDEX = {
@@ -147,6 +152,88 @@ STATEMENT_SECTORS = {
 }
 
 
+class SectorIndexPlan:
+    """
+    재무제표 종류(BS, IS, CF)별 섹터 색인을 한번에 펼친 행번호 배열.
+    섹터/그룹 순서대로 행번호(rows), 계정과목(accounts), FnGuide 계정명(labels)을 이어 붙이고
+    그룹별 구간(groups)을 기록해서 계정 확인과 값 추출을 표마다 한번의 배열 연산으로 처리한다.
+    """
+    __slots__ = ('rows', 'accounts', 'labels', 'groups')
+
+    def __init__(self, sector_indexes: OrderedDict):
+        """
+        :param sector_indexes: OrderedDict, {섹터명: {그룹명: {계정과목: 행번호}}}
+        """
+        rows, accounts, groups = [], [], []
+        for sector_name, sector in sector_indexes.items():
+            if sector is None:
+                continue
+            for group_name, group_attributes in sector.items():
+                start = len(rows)
+                rows.extend(group_attributes.values())
+                accounts.extend(group_attributes.keys())
+                groups.append((sector_name, group_name, start, len(rows)))
+
+        self.rows = np.array(rows, dtype=np.intp)
+        self.accounts = accounts
+        # 중복되는 계정과목명을 없애기 위해 "비유동부채.계약부채"와 같이 구분자를 추가한 과목명을 원래 계정명으로 복구
+        self.labels = np.array([account.split(".")[-1] for account in accounts], dtype=object)
+        self.groups = groups
+
+    def validate(self, parsed_accounts: list) -> List[str]:
+        """
+        행번호 색인의 계정과 FnGuide 표의 계정과목이 일치하는지 확인
+        :param parsed_accounts: list, FnGuide 표의 계정과목(행번호 순)
+        :return:
+            List of 계정명 불일치 항목
+        """
+        out_of_range = np.flatnonzero(self.rows >= len(parsed_accounts))
+        if len(out_of_range) > 0:
+            position = out_of_range[0]
+            raise StatementParseError(f'Mismatched row index - group: {self._group_of(position)}, '
+                                      f'{self.rows[position]}')
+
+        parsed = np.array(parsed_accounts, dtype=object)[self.rows]
+        invalid = self.labels != parsed
+
+        mismatched = []
+        if not invalid.any():
+            return mismatched
+
+        for sector_name, group_name, start, stop in self.groups:
+            positions = start + np.flatnonzero(invalid[start:stop])
+            if len(positions) > 0:
+                message = (
+                    f'Mismatched - group: {group_name}, '
+                    f'row_index: {self.rows[positions].tolist()}, '
+                    f'legacy: {self.labels[positions].tolist()}, '
+                    f'parsed: {parsed[positions].tolist()}'
+                )
+                mismatched.append(message)
+
+        return mismatched
+
+    def take(self, fn_statement_df: DataFrame, column_count: int) -> List[list] or None:
+        """
+        표에서 색인의 행만 한번에 가져와서 빈 값은 0으로 채운다.
+        :param fn_statement_df: DataFrame, 재무제표(첫 컬럼은 계정과목)
+        :param column_count: int, 값을 가져올 년/월 컬럼 수
+        :return:
+            List[list], 년/월 컬럼별 값 목록(rows 순). 문자열이 섞인 컬럼이 있으면 None
+        """
+        df_values = fn_statement_df.iloc[:, 1:column_count + 1]
+        if any(dtype == object for dtype in df_values.dtypes):
+            return None
+
+        df_values = df_values.take(self.rows).fillna(0)
+        return [df_values[column].tolist() for column in df_values.columns]
+
+    def _group_of(self, position: int) -> str:
+        for sector_name, group_name, start, stop in self.groups:
+            if start <= position < stop:
+                return group_name
+
+
 class SectorIndexer:
     """
     FnGuide 재무제표에서 필요한 자료를 섹터별로 나누어서 저장하기 위한 행번호 색인.
@@ -158,7 +245,7 @@ class SectorIndexer:
                      외부차입 그룹[단기사채, 단기차입금, ...]
 
     """
-    __slots__ = ('financing', 'investment', 'income', 'cash_flow', 'statement_sectors')
+    __slots__ = ('financing', 'investment', 'income', 'cash_flow', 'statement_sectors', 'plans')
 
     def __init__(self, statement_sectors: dict = None):
         if statement_sectors is None:
@@ -169,6 +256,9 @@ class SectorIndexer:
         super(SectorIndexer, self).__setattr__('income', statement_sectors.get('income'))
         super(SectorIndexer, self).__setattr__('cash_flow', statement_sectors.get('cash_flow'))
         super(SectorIndexer, self).__setattr__('statement_sectors', statement_sectors)
+        super(SectorIndexer, self).__setattr__(
+            'plans', {fs_type: SectorIndexPlan(self.get_sector_indexes(fs_type))
+                      for fs_type in (StatementType.BS, StatementType.IS, StatementType.CF)})
 
     def find(self, name: str):
         if name == StatementSector.financing:
@@ -201,6 +291,19 @@ class SectorIndexer:
 
         return sectors
 
+    def get_plan(self, fs_type: str) -> SectorIndexPlan:
+        """
+        재무제표 종류별로 미리 펼쳐 둔 행번호 배열을 반환
+        :param fs_type: str, 재무제표 종류: BS, IS, CF
+        :return:
+            SectorIndexPlan
+        """
+        plan = self.plans.get(fs_type)
+        if plan is None:
+            raise ValueError(f'Unknown report class name: {fs_type}')
+
+        return plan
+
     def __setattr__(self, *args):
         raise TypeError('SectorIndexer cannot be modified')
 
@@ -0,0 +1,252 @@
+"""
+FnGuide 재무제표 표 구조(계정과목 열) 변경 감지.
+행번호 색인(index.py)은 고정되어 있으므로 FnGuide 표 구조가 바뀌면 전체 종목의 변환이 실패한다.
+변환 배치 시작 전 업종별 표본 종목들의 표 지문(계정과목 열 해시)을 저장된 지문과 비교해서(preflight_statements)
+  - 저장된 구조이면 바로 변환하고
+  - 새 구조는 계정과목 이름으로 행번호를 다시 찾아(remap_sectors) 지문별 색인을 저장하고
+  - 전에 변환되던 종목의 새 구조에서 계정과목을 찾을 수 없으면 배치를 시작하기 전에 중단한다(LayoutDriftError).
+한 업종에도 표 구조가 여러 개일 수 있으므로 지문은 (업종, 재무제표 종류, 지문) 별로 저장한다.
+보험, 증권 등 금융업처럼 표 구조가 다른 업종도 업종별로 지문과 색인을 저장하고,
+파서는 페이지의 표 지문으로 색인을 골라서 사용한다(LxmlStatementParser layouts).
+"""
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Tuple
+
+from pandas import DataFrame
+
+from skogkatt.batch import batch_lookup
+from skogkatt.core import LoggerFactory
+from skogkatt.core.dao import dao_factory
+from skogkatt.core.dao.idao import FnLayoutDAO, FnStatementDAO
+from skogkatt.core.financial.constants import StatementType
+from skogkatt.core.ticker.store import ticker_store
+from skogkatt.crawler.fnguide.index import SectorIndexer, SectorIndexPlan
+from skogkatt.errors import LayoutDriftError, StatementParseError
+
+logger = LoggerFactory.get_logger(__name__)
+
+# 표 구조 상태
+LAYOUT_OK = 'ok'                    # 기본 행번호 색인과 일치
+LAYOUT_REMAPPED = 'remapped'        # 계정과목 이름으로 행번호를 다시 찾음
+LAYOUT_UNSUPPORTED = 'unsupported'  # 색인의 계정과목이 없음
+
+# 업종별 표본 페이지 수. 읽을 수 없는 페이지는 건너뛰고 다음 종목을 읽는다
+PREFLIGHT_SAMPLES = 3
+
+
+def fingerprint(labels: List[str]) -> str:
+    """
+    :param labels: List[str], 표의 계정과목(행번호 순)
+    :return:
+        str, 계정과목 열의 해시(sha1)
+    """
+    return hashlib.sha1('\n'.join(str(label) for label in labels).encode('utf-8')).hexdigest()
+
+
+def table_fingerprints(reports: Dict[str, DataFrame]) -> Dict[str, str]:
+    """
+    :param reports: dict, {재무제표 종류: DataFrame}. 첫 컬럼은 account_id
+    :return:
+        dict, {재무제표 종류: 계정과목 열의 해시}
+    """
+    return {fs_type: fingerprint(report_df['account_id'].tolist()) for fs_type, report_df in reports.items()}
+
+
+def remap_sectors(sectors: OrderedDict, labels: List[str]) -> Tuple[OrderedDict or None, List[str]]:
+    """
+    섹터 색인의 계정과목을 표에서 이름으로 찾아서 행번호를 다시 만든다.
+    같은 이름의 계정(ex. 계약부채, 비유동부채.계약부채)은 기존 행번호 순서대로 표의 같은 이름 행에 차례로 배정하고,
+    이름이 한번만 나오는 계정은 기존 행번호와 가장 가까운 행을 사용한다.
+    :param sectors: OrderedDict, 재무제표 종류 하나의 {섹터명: {그룹명: {계정과목: 행번호}}}
+    :param labels: List[str], 표의 계정과목(행번호 순)
+    :return:
+        (OrderedDict, 찾지 못한 계정과목). 찾지 못한 계정과목이 있으면 OrderedDict은 None
+    """
+    positions = {}
+    for row, label in enumerate(labels):
+        positions.setdefault(label, []).append(row)
+
+    entries = {}
+    for sector_name, sector in sectors.items():
+        for group_name, group_attributes in sector.items():
+            for account, row in group_attributes.items():
+                entries.setdefault(account.split(".")[-1], []).append((row, account))
+
+    rows = {}
+    missing = []
+    for label, accounts in entries.items():
+        found = positions.get(label, [])
+        if len(found) == len(accounts):
+            rows.update({account: row for (old_row, account), row in zip(sorted(accounts), found)})
+        elif len(accounts) == 1 and len(found) > 0:
+            old_row, account = accounts[0]
+            rows[account] = min(found, key=lambda row: abs(row - old_row))
+        else:
+            missing.extend(account for old_row, account in accounts)
+
+    if len(missing) > 0:
+        return None, missing
+
+    remapped = OrderedDict()
+    for sector_name, sector in sectors.items():
+        remapped[sector_name] = OrderedDict(
+            (group_name, {account: rows[account] for account in group_attributes})
+            for group_name, group_attributes in sector.items())
+
+    return remapped, missing
+
+
+def inspect_layout(fs_type: str, annual_df: DataFrame, quarter_df: DataFrame, indexer: SectorIndexer = None) -> dict:
+    """
+    재무제표 종류 하나의 표 구조를 확인한다.
+    :param fs_type: str, 재무제표 종류: BS, IS, CF
+    :param annual_df: DataFrame, 연간 재무제표
+    :param quarter_df: DataFrame, 분기 재무제표
+    :param indexer: SectorIndexer, optional, 기본 행번호 색인
+    :return:
+        dict, {'fingerprint', 'status', 'sectors', 'missing'}. sectors는 remapped 일때 다시 만든 섹터 색인
+    """
+    indexer = indexer if indexer is not None else SectorIndexer()
+    annual_labels = annual_df['account_id'].tolist()
+    quarter_labels = quarter_df['account_id'].tolist()
+    layout = {'fingerprint': fingerprint(annual_labels), 'status': LAYOUT_OK, 'sectors': None, 'missing': []}
+
+    if validates(indexer.get_plan(fs_type), annual_labels, quarter_labels):
+        return layout
+
+    sectors, missing = remap_sectors(indexer.get_sector_indexes(fs_type), annual_labels)
+    if sectors is not None and validates(SectorIndexPlan(sectors), annual_labels, quarter_labels):
+        layout.update(status=LAYOUT_REMAPPED, sectors=sectors)
+    else:
+        layout.update(status=LAYOUT_UNSUPPORTED, missing=missing)
+
+    return layout
+
+
+def validates(plan: SectorIndexPlan, *labels_list: List[str]) -> bool:
+    try:
+        return all(len(plan.validate(labels)) == 0 for labels in labels_list)
+    except StatementParseError:
+        return False
+
+
+def sectors_to_rows(sectors: OrderedDict) -> List[list]:
+    """ 섹터 색인을 DB에 저장할 [섹터명, 그룹명, 계정과목, 행번호] 목록으로 바꾼다. 계정과목에 '.'이 있어 키로 쓰지 않는다 """
+    return [[sector_name, group_name, account, row]
+            for sector_name, sector in sectors.items()
+            for group_name, group_attributes in sector.items()
+            for account, row in group_attributes.items()]
+
+
+def rows_to_sectors(rows: List[list]) -> OrderedDict:
+    sectors = OrderedDict()
+    for sector_name, group_name, account, row in rows:
+        sectors.setdefault(sector_name, OrderedDict()).setdefault(group_name, {})[account] = row
+
+    return sectors
+
+
+def load_statement_layouts(source: str = None) -> Dict[str, Dict[str, OrderedDict]]:
+    """
+    저장된 구조별 색인 중 행번호를 다시 만든(remapped) 색인을 반환한다.
+    :param source: str, optional, 수집 배치명. default: FnGuide 재무제표 수집
+    :return:
+        dict, {재무제표 종류: {표 지문: 섹터 색인}}
+    """
+    source = source if source is not None else batch_lookup.FN_GUIDE_STATEMENT['name']
+    layout_dao: FnLayoutDAO = dao_factory.get('FnLayoutDAO')
+
+    layouts = {}
+    for each in layout_dao.find(source):
+        if each.get('status') == LAYOUT_REMAPPED:
+            layouts.setdefault(each['fs_type'], {})[each['fingerprint']] = rows_to_sectors(each['sectors'])
+
+    return layouts
+
+
+def read_samples(parser, industry: str, stock_codes: List[str]) -> Iterator[Tuple[str, Dict[str, tuple]]]:
+    """
+    업종의 표본 페이지를 PREFLIGHT_SAMPLES 개까지 읽는다. 읽을 수 없는 페이지는 건너뛴다.
+    :param parser: LxmlStatementParser, 표본 페이지를 읽을 파서
+    :param industry: str, 업종
+    :param stock_codes: List[str], 업종의 종목코드
+    :return:
+        Iterator[(종목코드, {재무제표 종류: (연간 DataFrame, 분기 DataFrame)})]
+    """
+    from skogkatt.crawler.fnguide.lxml_parser import FALLBACK_ERRORS
+
+    samples = 0
+    for stock_code in stock_codes:
+        if samples >= PREFLIGHT_SAMPLES:
+            return
+        try:
+            reports = parser.read_reports(stock_code)
+        except (FileNotFoundError, *FALLBACK_ERRORS) as err:
+            logger.warning(f'{industry} - layout sample {stock_code} skipped: {str(err)}')
+            continue
+
+        samples += 1
+        yield stock_code, reports
+
+
+def preflight_statements(stock_codes: List[str],
+                         parser=None,
+                         source: str = None,
+                         abort: bool = True) -> Dict[str, Dict[str, OrderedDict]]:
+    """
+    변환 전에 업종별 표본 종목들의 재무제표 표 지문을 저장된 지문과 비교한다.
+    저장되지 않은 지문은 표 구조를 확인해서(inspect_layout) 지문별로 저장하고,
+    변환할 수 없는 구조이면서 전에 변환된 재무제표가 있는 종목이면 저장하지 않고 중단한다.
+    :param stock_codes: List[str], 변환할 종목코드
+    :param parser: LxmlStatementParser, optional, 표본 페이지를 읽을 파서
+    :param source: str, optional, 수집 배치명. default: FnGuide 재무제표 수집
+    :param abort: bool, optional, False 이면 구조 변경을 로그만 남긴다
+    :return:
+        dict, {재무제표 종류: {표 지문: 섹터 색인}}, load_statement_layouts 참조
+    """
+    from skogkatt.crawler.fnguide.lxml_parser import LxmlStatementParser
+
+    source = source if source is not None else batch_lookup.FN_GUIDE_STATEMENT['name']
+    parser = parser if parser is not None else LxmlStatementParser()
+    layout_dao: FnLayoutDAO = dao_factory.get('FnLayoutDAO')
+    statement_dao: FnStatementDAO = dao_factory.get('FnStatementDAO')
+    indexer = SectorIndexer()
+
+    industries = OrderedDict()
+    for stock_code in stock_codes:
+        ticker = ticker_store.find_by_stock_code(stock_code)
+        industries.setdefault(ticker.industry if ticker is not None else '', []).append(stock_code)
+
+    drifted = []
+    for industry, codes in industries.items():
+        known = {}
+        for each in layout_dao.find(source, industry):
+            known.setdefault(each['fs_type'], set()).add(each['fingerprint'])
+
+        for stock_code, reports in read_samples(parser, industry, codes):
+            for fs_type in (StatementType.BS, StatementType.IS, StatementType.CF):
+                annual_df, quarter_df = reports[fs_type]
+                if fingerprint(annual_df['account_id'].tolist()) in known.get(fs_type, ()):
+                    continue
+
+                layout = inspect_layout(fs_type, annual_df, quarter_df, indexer)
+                if layout['status'] == LAYOUT_UNSUPPORTED and statement_dao.count(stock_code=stock_code) > 0:
+                    drifted.append(f'{industry}({stock_code}) {fs_type} - missing: {",".join(layout["missing"]) or "-"}')
+                    continue
+
+                if fs_type in known:
+                    logger.warning(f'{industry}({stock_code}) - new {fs_type} layout: {layout["status"]}')
+
+                layout_dao.update(source, industry, fs_type, layout['fingerprint'], layout['status'],
+                                  sectors=sectors_to_rows(layout['sectors']) if layout['sectors'] is not None else None,
+                                  missing=layout['missing'], stock_code=stock_code)
+                known.setdefault(fs_type, set()).add(layout['fingerprint'])
+
+    if len(drifted) > 0:
+        message = f'FnGuide statement layout changed - {"; ".join(drifted)}'
+        if abort:
+            raise LayoutDriftError(message)
+        logger.error(message)
+
+    return load_statement_layouts(source)
@@ -0,0 +1,282 @@
+from collections import OrderedDict
+from typing import Dict, List
+
+import lxml.html
+from lxml.etree import ParserError
+from pandas import DataFrame
+
+from skogkatt.crawler.archive import HtmlArchive
+from skogkatt.crawler.fnguide.index import FN_HIGHLIGHT_ROW_INDEX, SectorIndexer
+from skogkatt.crawler.fnguide.layout import table_fingerprints
+from skogkatt.crawler.fnguide.parser import FnSnapshotParser, FnStatementParser, prepare_statements
+from skogkatt.crawler.util import read_table
+from skogkatt.core import LoggerFactory
+from skogkatt.core.financial import Statement, StockSummary
+from skogkatt.core.financial.constants import ReportCode, StatementType
+from skogkatt.core.financial.dto import FinancialStatementDTO
+from skogkatt.core.financial.synonym import is_synonym, find_synonyms, find_unity_synonym
+from skogkatt.errors import StatementParseError
+
+logger = LoggerFactory.get_logger(__name__)
+
+"""
+FnSnapshotParser, FnStatementParser의 lxml 버전.
+html5lib BeautifulSoup 대신 lxml로 한번만 파싱하고, 표는 다시 HTML로 쓰지 않고 셀 텍스트에서 바로 DataFrame을 만든다(read_table).
+재무제표 계정 확인과 계정과목 추가는 기존 파서와 같이 SectorIndexPlan으로 처리하고 결과 Statement는 기존 파서와 같다.
+계정 불일치(StatementParseError)는 기존 파서와 같은 오류를 발생시키고,
+그 외 lxml로 파싱한 문서 구조가 예상과 다르면 기존 파서(html5lib)로 다시 파싱한다.
+"""
+
+# lxml 파싱 실패시 기존 파서로 다시 파싱하는 오류
+FALLBACK_ERRORS = (KeyError, IndexError, ValueError, AttributeError, ParserError)
+
+
+def read_document(stock_code: str, archive, file_path, file=None, quarter: str = None, contents: bytes = None):
+    """
+    수집한 페이지를 lxml로 읽는다. file을 지정하지 않으면 저장소(archive)에서 읽고, 없으면 html 파일을 읽는다.
+    응답 원본(contents)을 지정하면 그대로 사용한다.
+    :return:
+        lxml.html.HtmlElement, 문서 root
+    """
+    if contents is None and file is None and archive is not None:
+        contents = archive.get(stock_code, quarter)
+        if contents is None and quarter is not None:
+            raise FileNotFoundError(f'{stock_code} is not archived in {quarter}')
+
+    if contents is None:
+        with open(file if file is not None else file_path, 'rb') as html_file:
+            contents = html_file.read()
+
+    return lxml.html.document_fromstring(contents)
+
+
+def text_of(elements: list) -> str:
+    """ 첫번째 요소의 텍스트. 요소가 없으면 IndexError """
+    return elements[0].text_content()
+
+
+def drop_elements(elements: list):
+    """ 요소를 삭제한다. 요소 뒤의 텍스트는 남긴다(BeautifulSoup Tag.decompose와 같음) """
+    for element in elements:
+        element.drop_tree()
+
+
+def has_class(class_name: str) -> str:
+    return f'contains(concat(" ", normalize-space(@class), " "), " {class_name} ")'
+
+
+class LxmlSnapshotParser(FnSnapshotParser):
+
+    def parse(self, stock_code, file=None, quarter: str = None, contents: bytes = None) -> FinancialStatementDTO:
+        """
+        FnGuide 스냅샷 html에서 발행주식수, 연간, 분기 재무제표 자료를 추출한다. FnSnapshotParser.parse 참조
+        """
+        doc = read_document(stock_code, self.archive, self.resolve_file_path(stock_code), file, quarter, contents)
+
+        try:
+            return self._parse_document(stock_code, doc)
+        except StatementParseError as err:
+            raise StatementParseError(err_msg=f'fnguide snapshot parse failed - {str(err)}', stock_code=stock_code)
+        except FALLBACK_ERRORS as err:
+            logger.warning(f'{stock_code} - lxml snapshot parse failed, retry with html5lib: {str(err)}')
+            return super().parse(stock_code, file=file, quarter=quarter, contents=contents)
+
+    def _parse_document(self, stock_code: str, doc) -> FinancialStatementDTO:
+        tables = doc.xpath('//table')
+
+        error_labels = self.validate_labels(tables)
+        if len(error_labels) > 0:
+            raise StatementParseError(err_msg=f'fnguide label mismatched: {",".join(error_labels)}',
+                                      stock_code=stock_code)
+
+        summary_tables = [next(caption.iterancestors('table')) for caption in doc.xpath('//caption')
+                          if caption.text_content() == 'Financial Highlight']
+        highlights = []
+        for table in summary_tables[1:3]:     # 연결 - 연간, 분기
+            drop_elements(table.xpath(f'.//span[{has_class("csize")}]'))
+            highlights.append(read_table(table, header=1))
+
+        dto = FinancialStatementDTO(stock_code)
+        dto.stock_summary = self.parse_summary(stock_code, tables, doc)
+        dto.annual_abbreviations = self.parse_highlight(stock_code, highlights[0], ReportCode.summary_annual)
+        dto.quarter_abbreviations = self.parse_highlight(stock_code, highlights[1], ReportCode.summary_quarter)
+
+        return dto
+
+    @staticmethod
+    def validate_labels(tables: list):
+        error_labels = []
+        labels = dict()
+
+        labels['발행주식수'] = text_of(tables[0].xpath('.//tr[7]//th[1]//div')).replace('\xa0', ' ').strip()
+        labels['자기주식'] = text_of(tables[4].xpath('.//tr[5]//th[1]//div')).replace('\xa0', ' ').strip()
+
+        for expected, actual in labels.items():
+            if not actual.startswith(expected) and not is_synonym(expected, actual):
+                error_labels.append(f'expected: {expected}, actual: {actual}')
+
+        return error_labels
+
+    def parse_summary(self, stock_code: str, tables: list, doc=None) -> StockSummary:
+        stock_summary = StockSummary(stock_code)
+
+        # 시세현활 [년/월/일] -> 년-월-일
+        ref_date = text_of(doc.xpath(f'//div[@id="div1"]//span[{has_class("date")}]')).replace('[', '').replace(']', '')
+        stock_summary.reference_date = ref_date.replace('/', '-')
+
+        # 발행주식수 보통주/우선주
+        stock_cnt = text_of(tables[0].xpath('.//tr[7]//td[1]')).split('/')
+        common_stock_cnt = stock_cnt[0].replace(',', '')
+        pref_stock_cnt = stock_cnt[1].replace(',', '')
+
+        # 자기주식 from table 주주구분현황
+        treasury_stock_cnt = text_of(tables[4].xpath('.//tr[5]//td[2]')).strip().replace(',', '')
+
+        stock_summary.common_stock_cnt = int(common_stock_cnt)
+        stock_summary.pref_stock_cnt = int(pref_stock_cnt) if len(pref_stock_cnt) > 0 else 0
+        stock_summary.treasury_stock_cnt = int(treasury_stock_cnt) if len(treasury_stock_cnt) > 0 else 0
+
+        return stock_summary
+
+    def parse_highlight(self,
+                        stock_code: str,
+                        fs_df: DataFrame,
+                        report_code: int,
+                        fs_div: str = 'CFS') -> List[Statement]:
+        accounts = fs_df[fs_df.columns[0]].tolist()
+        self.validate_accounts(accounts)
+
+        """ 첫번째 행인 매출액 필드명이 업종별로 다를 수 있므로 매출액으로 통일한다 """
+        accounts[0] = '매출액'
+
+        dates = fs_df.columns[1:].tolist()
+        statements = prepare_statements(stock_code, dates, report_code)
+
+        for i in range(len(statements)):
+            statements[i].report_code = report_code
+            statements[i].fs_div = fs_div
+            statements[i].append_facts(accounts, fs_df[fs_df.columns[i + 1]].tolist(), None, None, None)
+
+        return statements
+
+    @staticmethod
+    def validate_accounts(accounts: list, row_index_dict: dict = None):
+        """
+        요약 재무제표 계정이 행번호 색인과 일치하는지 확인. FnSnapshotParser.validate_index 참조
+        """
+        if row_index_dict is None:
+            row_index_dict = FN_HIGHLIGHT_ROW_INDEX
+
+        if len(row_index_dict) != len(accounts):
+            raise StatementParseError(err_msg=f'Account counts are different, legacy: {len(row_index_dict)}, '
+                                              f'parsed: {len(accounts)}')
+
+        """ 첫번째 행(매출액, 보험료수익, 순영업수익 등)은 제외하고 비교 """
+        mismatched = [(account, row_index) for account, row_index in list(row_index_dict.items())[1:]
+                      if account != accounts[row_index]]
+
+        if len(mismatched) > 0:
+            message = (
+                f'Mismatched - row_index: {[row_index for account, row_index in mismatched]}, '
+                f'legacy: {[account for account, row_index in mismatched]}, '
+                f'parsed: {[accounts[row_index] for account, row_index in mismatched]}'
+            )
+            raise StatementParseError(err_msg=message)
+
+
+class LxmlStatementParser(FnStatementParser):
+
+    def __init__(self, archive: HtmlArchive = None, layouts: Dict[str, Dict[str, OrderedDict]] = None):
+        """
+        :param archive: HtmlArchive, optional, 페이지 원본 저장소. default: FNGUIDE_STATEMENT_ARCHIVE_PATH
+        :param layouts: dict, optional, 표 구조별 섹터 색인 {재무제표 종류: {표 지문: 섹터 색인}}.
+                        페이지의 표 지문과 같은 색인이 있으면 기본 행번호 색인 대신 사용한다(layout.preflight_statements)
+        """
+        super().__init__(archive)
+        self.layouts = layouts if layouts is not None else {}
+        self._indexers = {}
+
+    def parse(self, stock_code, file=None, indexer: SectorIndexer = None, quarter: str = None,
+              contents: bytes = None) -> FinancialStatementDTO:
+        """
+        재무제표 데이터를 추출해서 FinancialStatementDTO에 담아 반환한다. FnStatementParser.parse 참조
+        """
+        doc = read_document(stock_code, self.archive, self.resolve_file_path(stock_code), file, quarter, contents)
+
+        try:
+            self.classify_tables(doc.xpath('//table'))
+            self.sector_indexer = self.resolve_indexer(indexer)
+
+            dto = FinancialStatementDTO(stock_code)
+            dto.annual_statements = self.parse_statements(stock_code, ReportCode.annual, self.annual_reports)
+            dto.quarter_statements = self.parse_statements(stock_code, ReportCode.quarter, self.quarter_reports)
+
+            return dto
+        except StatementParseError as err:
+            raise self.parse_error(stock_code, err)
+        except FALLBACK_ERRORS as err:
+            logger.warning(f'{stock_code} - lxml statement parse failed, retry with html5lib: {str(err)}')
+            self.annual_reports = OrderedDict()
+            self.quarter_reports = OrderedDict()
+            return super().parse(stock_code, file=file, indexer=indexer, quarter=quarter, contents=contents)
+
+    def read_reports(self, stock_code: str, file=None, quarter: str = None) -> Dict[str, tuple]:
+        """
+        재무제표 표만 DataFrame으로 읽는다. 표 구조 확인(layout.preflight_statements)에 사용
+        :return:
+            dict, {재무제표 종류: (연간 DataFrame, 분기 DataFrame)}
+        """
+        doc = read_document(stock_code, self.archive, self.resolve_file_path(stock_code), file, quarter)
+        self.annual_reports = OrderedDict()
+        self.quarter_reports = OrderedDict()
+        self.classify_tables(doc.xpath('//table'))
+
+        return {fs_type: (report_df, self.quarter_reports[fs_type]) for fs_type, report_df in self.annual_reports.items()}
+
+    def resolve_indexer(self, indexer: SectorIndexer = None) -> SectorIndexer:
+        """
+        연간 재무제표의 표 지문으로 표 구조별 섹터 색인을 찾아서 행번호 색인을 만든다.
+        :param indexer: SectorIndexer, optional, 기본 행번호 색인
+        :return:
+            SectorIndexer, 표 구조별 색인이 없으면 기본 행번호 색인
+        """
+        indexer = indexer if indexer is not None else SectorIndexer()
+        if len(self.layouts) == 0:
+            return indexer
+
+        matched = tuple((fs_type, fingerprint) for fs_type, fingerprint in table_fingerprints(self.annual_reports).items()
+                        if fingerprint in self.layouts.get(fs_type, {}))
+        if len(matched) == 0:
+            return indexer
+
+        key = (id(indexer.statement_sectors), matched)
+        if key not in self._indexers:
+            statement_sectors = dict(indexer.statement_sectors)
+            for fs_type, fingerprint in matched:
+                statement_sectors.update(self.layouts[fs_type][fingerprint])
+            self._indexers[key] = SectorIndexer(statement_sectors)
+
+        return self._indexers[key]
+
+    def classify_tables(self, tables: list):
+        """
+        재무제표 표에서 링크를 삭제하고 숨긴 행은 표시한 후, 연간/분기, 재무제표 종류별 DataFrame으로 저장한다.
+        :param tables: 재무제표 html table element list
+        """
+        for table in tables[:6]:
+            drop_elements(table.xpath('.//a'))
+            for tr in table.xpath('.//tr[@style]'):
+                del tr.attrib['style']
+
+        reports = {StatementType.BS: (2, 3), StatementType.IS: (0, 1), StatementType.CF: (4, 5)}
+        for fs_type, (annual, quarter) in reports.items():
+            self.annual_reports[fs_type] = self.rename_column(read_table(tables[annual]))
+            self.quarter_reports[fs_type] = self.rename_column(read_table(tables[quarter]))
+
+    @staticmethod
+    def rename_column(df: DataFrame):
+        """ 첫 컬럼을 account_id로 바꾸고 동의어가 있는 계정과목은 대표 동의어로 통일한다 """
+        df = df.rename(columns={df.columns[0]: 'account_id'})
+        df['account_id'] = [find_unity_synonym(account_id) if find_synonyms(account_id) is not None else account_id
+                            for account_id in df['account_id'].tolist()]
+        return df
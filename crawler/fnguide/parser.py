@@ -9,11 +9,12 @@ import pandas as pd
 from pandas import DataFrame
 
 from skogkatt.conf.crawl_conf import (
-    FNGUIDE_SNAPSHOT_FILE_PREFIX, FNGUIDE_SNAPSHOT_FILE_STORAGE_PATH,
-    FNGUIDE_STATEMENT_FILE_PREFIX, FNGUIDE_STATEMENT_FILE_STORAGE_PATH
+    FNGUIDE_SNAPSHOT_FILE_PREFIX, FNGUIDE_SNAPSHOT_FILE_STORAGE_PATH, FNGUIDE_SNAPSHOT_ARCHIVE_PATH,
+    FNGUIDE_STATEMENT_FILE_PREFIX, FNGUIDE_STATEMENT_FILE_STORAGE_PATH, FNGUIDE_STATEMENT_ARCHIVE_PATH
 )
+from skogkatt.crawler.archive import HtmlArchive
 from skogkatt.crawler.fnguide.index import FN_HIGHLIGHT_ROW_INDEX, SectorIndexer
-from skogkatt.crawler.util import read_from, remove_tag, remove_style, to_dataframe
+from skogkatt.crawler.util import read_from, read_html, remove_tag, remove_style, to_dataframe
 from skogkatt.errors import StatementParseError
 from skogkatt.core.financial.constants import ReportCode, StatementType
 from skogkatt.core.financial.dto import FinancialStatementDTO
@@ -26,6 +27,26 @@ from skogkatt.core.ticker.store import ticker_store
 logger = LoggerFactory.get_logger(__name__)
 
 
+def read_page(stock_code: str, archive: HtmlArchive, file_path: Path, quarter: str = None):
+    """
+    수집한 페이지를 읽는다. 저장소(archive)에 없으면 html 파일을 읽는다.
+    :param stock_code: str, 종목코드
+    :param archive: HtmlArchive, 페이지 원본 저장소
+    :param file_path: Path, html 파일
+    :param quarter: str, optional, 저장소 분기. default: 가장 최근 분기
+    :return:
+        BeautifulSoup
+    """
+    contents = archive.get(stock_code, quarter) if archive is not None else None
+    if contents is not None:
+        return read_html(contents)
+
+    if quarter is not None:
+        raise FileNotFoundError(f'{stock_code} is not archived in {quarter}')
+
+    return read_from(file_path)
+
+
 def prepare_statements(stock_code: str, dates: List[str], report_code: int):
     """
     입력받은 날짜(년/월) 개수 만큼 Statement 객체를 만들어 리스트로 반환
@@ -61,7 +82,11 @@ def prepare_statements(stock_code: str, dates: List[str], report_code: int):
 
 class FnSnapshotParser:
 
-    def __init__(self):
+    def __init__(self, archive: HtmlArchive = None):
+        """
+        :param archive: HtmlArchive, optional, 페이지 원본 저장소. default: FNGUIDE_SNAPSHOT_ARCHIVE_PATH
+        """
+        self.archive = archive if archive is not None else HtmlArchive(FNGUIDE_SNAPSHOT_ARCHIVE_PATH)
         self._soup = None
 
     @staticmethod
@@ -70,16 +95,23 @@ class FnSnapshotParser:
         file_path = Path(FNGUIDE_SNAPSHOT_FILE_STORAGE_PATH).joinpath(file_name)
         return file_path
 
-    def parse(self, stock_code, file=None) -> FinancialStatementDTO:
+    def parse(self, stock_code, file=None, quarter: str = None, contents: bytes = None) -> FinancialStatementDTO:
         """
         FnGuide 스냅샷 html에서 발행주식수, 연간, 분기 재무제표 자료를 추출한다.
+        file을 지정하지 않으면 저장소(archive)에서 읽고, 저장소에 없으면 html 파일을 읽는다.
         :param stock_code: str, 주식 종목코드
         :param file: str, optional, 파싱할 파일을 직접 지정하는 경우 파일명
+        :param quarter: str, optional, 저장소에서 읽을 분기(ex. 2021Q2). default: 가장 최근 분기
+        :param contents: bytes, optional, 수집한 응답 원본. 지정하면 저장소나 파일을 읽지 않는다
         :return:
             FinancialStatementDTO
         """
-        file = self.resolve_file_path(stock_code) if file is None else file
-        self._soup = read_from(file)
+        if contents is not None:
+            self._soup = read_html(contents)
+        elif file is None:
+            self._soup = read_page(stock_code, self.archive, self.resolve_file_path(stock_code), quarter)
+        else:
+            self._soup = read_from(file)
         tables = self._soup.find_all("table")
 
         dto = None
@@ -266,7 +298,11 @@ class FnSnapshotParser:
 
 class FnStatementParser:
 
-    def __init__(self):
+    def __init__(self, archive: HtmlArchive = None):
+        """
+        :param archive: HtmlArchive, optional, 페이지 원본 저장소. default: FNGUIDE_STATEMENT_ARCHIVE_PATH
+        """
+        self.archive = archive if archive is not None else HtmlArchive(FNGUIDE_STATEMENT_ARCHIVE_PATH)
         self.sector_indexer = None
         self._soup = None
         self.annual_reports = OrderedDict()
@@ -278,18 +314,22 @@ class FnStatementParser:
         file_path = Path(FNGUIDE_STATEMENT_FILE_STORAGE_PATH).joinpath(file_name)
         return file_path
 
-    def parse(self, stock_code, file=None, indexer: SectorIndexer = None) -> FinancialStatementDTO:
+    def parse(self, stock_code, file=None, indexer: SectorIndexer = None, quarter: str = None,
+              contents: bytes = None) -> FinancialStatementDTO:
         """
         재무제표 데이터를 추출해서 FinancialStatementDTO에 담아 반환한다.
+        file을 지정하지 않으면 저장소(archive)에서 읽고, 저장소에 없으면 html 파일을 읽는다.
         :param stock_code: str, 종목코드
         :param file: str, optional, 파일명. 파싱할 파일을 직접 지정
         :param indexer: SectorIndexer, optional, FnGuide 행번호 색인
+        :param quarter: str, optional, 저장소에서 읽을 분기(ex. 2021Q2). default: 가장 최근 분기
+        :param contents: bytes, optional, 수집한 응답 원본. 지정하면 저장소나 파일을 읽지 않는다
         :return:
             FinancialStatementDTO
         """
 
         try:
-            tables = self._prepare_statement_tables(stock_code, file)
+            tables = self._prepare_statement_tables(stock_code, file, quarter, contents)
 
             self.classify_reports(tables)
             self.sector_indexer = indexer if indexer is not None else SectorIndexer()
@@ -303,21 +343,31 @@ class FnStatementParser:
             raise
         except (KeyError, IndexError, StatementParseError, RuntimeError) as err:
             # logger.error("fnguide statement crawl failed - stock_code: %s", stock_code, exc_info=True)
-            ticker = ticker_store.find_by_stock_code(stock_code)
-            raise StatementParseError(
-                err_msg=f'fnguide statement parse failed - {str(err)}',
-                stock_code=stock_code, industry=ticker.industry, corp_name=ticker.name)
+            raise self.parse_error(stock_code, err)
 
-    def _prepare_statement_tables(self, stock_code, file=None):
+    @staticmethod
+    def parse_error(stock_code, err) -> StatementParseError:
+        ticker = ticker_store.find_by_stock_code(stock_code)
+        return StatementParseError(
+            err_msg=f'fnguide statement parse failed - {str(err)}',
+            stock_code=stock_code, industry=ticker.industry, corp_name=ticker.name)
+
+    def _prepare_statement_tables(self, stock_code, file=None, quarter: str = None, contents: bytes = None):
         """
         재무제표 HTML Table에서 불필요한 태그와 CSS를 제거해서 반환한다.
-        file 인자가 없으면 종목코드로 해당 HTML 파일을 디스크에서 찾는다
+        file 인자가 없으면 종목코드로 저장소(archive)나 디스크의 HTML 파일을 찾는다
         :param stock_code: 종목코드
         :param file: optional, HTML 파일
+        :param quarter: str, optional, 저장소 분기
+        :param contents: bytes, optional, 응답 원본
         :return:
         """
-        file = self.resolve_file_path(stock_code) if file is None else file
-        self._soup = read_from(file)
+        if contents is not None:
+            self._soup = read_html(contents)
+        elif file is None:
+            self._soup = read_page(stock_code, self.archive, self.resolve_file_path(stock_code), quarter)
+        else:
+            self._soup = read_from(file)
         tables = self._soup.find_all("table")
 
         self.remove_display_none(tables)
@@ -421,6 +471,29 @@ class FnStatementParser:
         :return:
             a List of Statement
         """
+        plan = self.sector_indexer.get_plan(fs_type)
+        column_values = plan.take(fn_statement_df, len(statements))
+        if column_values is None:
+            return self.append_group_facts_to(statements, fn_statement_df, report_code, fs_div, fs_type)
+
+        for sector_name, group_name, start, stop in plan.groups:
+            accounts = plan.accounts[start:stop]
+            for i in range(len(statements)):
+                statements[i].report_code = report_code
+                statements[i].fs_div = fs_div
+                statements[i].append_facts(accounts, column_values[i][start:stop], group_name, sector_name, fs_type)
+
+        return statements
+
+    def append_group_facts_to(self,
+                              statements: List[Statement],
+                              fn_statement_df: DataFrame,
+                              report_code: int,
+                              fs_div: str,
+                              fs_type: str):
+        """
+        문자열이 섞인 재무제표의 append_facts_to. 그룹별로 행을 선택한 후 빈 값을 채운다.
+        """
         # 재무재표에서 추출할 항목의 행번호를 담고있는 dictionary
         sector_indexes = self.sector_indexer.get_sector_indexes(fs_type)
 
@@ -447,55 +520,4 @@ class FnStatementParser:
         :return:
             List of 계정명 불일치 항목
         """
-        mismatched = []
-        sector_indexes = self.sector_indexer.get_sector_indexes(fs_type)
-        for sector_name, sector in sector_indexes.items():
-            for group_name, group_attributes in sector.items():
-                row_indexes = list(group_attributes.values())
-                df_legacy = DataFrame(group_attributes.items(), columns=['account', 'row_index'])
-
-                # 중복되는 계정과목명을 없애기 위해 "비유동부채.계약부채"와 같이 구분자를 추가한 과목명을 원래 계정명으로 복구
-                df_legacy = df_legacy.assign(account=[x.split(".")[-1] for x in df_legacy['account']])
-
-                try:
-                    df_check = self.make_account_index(row_indexes, fn_statement_df)
-                except KeyError as err:
-                    raise StatementParseError(f'Mismatched row index - group: {group_name}, {str(err)}')
-
-                df_legacy['account_match'] = np.where(df_legacy['account'] == df_check['account'], 'True', 'False')
-                result = df_legacy.groupby(['account_match']).groups
-                invalid_account_rows = result.get('False', None)
-
-                if invalid_account_rows is not None:
-                    legacy_account_ids = df_legacy.loc[invalid_account_rows]['account'].tolist()
-                    legacy_row_ids = df_legacy.loc[invalid_account_rows]['row_index'].tolist()
-                    crawled_account_ids = df_check.loc[invalid_account_rows]['account'].tolist()
-
-                    message = (
-                        f'Mismatched - group: {group_name}, '
-                        f'row_index: {legacy_row_ids}, '
-                        f'legacy: {legacy_account_ids}, '
-                        f'parsed: {crawled_account_ids}'
-                    )
-
-                    mismatched.append(message)
-
-        return mismatched
-
-    @staticmethod
-    def make_account_index(row_indexes: List[int], target_df: DataFrame):
-        """
-        DataFrame의 계정과목을 기준 행번호로 정렬해서 반환한다.
-        :param row_indexes: 기준 행번호
-        :param target_df: 대상 DataFrame
-        :return:
-            DataFrame
-        """
-        df_check = DataFrame(columns=['account', 'row_index'])
-
-        for i in range(len(row_indexes)):
-            check_account_id = target_df.loc[row_indexes[i]]['account_id']
-            df_check.loc[i] = [check_account_id, row_indexes[i]]
-
-        df_check.reset_index(inplace=True)
-        return df_check
+        return self.sector_indexer.get_plan(fs_type).validate(fn_statement_df['account_id'].tolist())
@@ -0,0 +1,258 @@
+"""
+FnGuide 수집 → 파싱 → 저장 스트리밍 변환.
+수집 배치가 파일(저장소)에 저장하고 변환 배치가 나중에 다시 읽는 대신, 한 프로세스 안에서 세 단계를 동시에 실행한다.
+ - 수집: CrawlEngine 스레드가 요청 속도 제한(Throttle) 안에서 수집하고(PageFetcher) 내용이 바뀐 페이지만 다음 단계로 넘긴다
+ - 파싱: 파싱 프로세스 풀(parse_workers)에서 응답 원본을 바로 파싱한다. parse_workers가 1 이면 파싱 스레드에서 파싱
+ - 저장: 현재 스레드에서 chunk_size 종목씩, 또는 flush_interval 동안 새 결과가 없으면 모아 둔 종목을 저장한다(ConvertWriter)
+단계 사이 큐는 크기가 정해져 있어(queue_size) 뒤 단계가 밀리면 앞 단계가 기다린다.
+수집 정보(FetchMetaDAO), 실패 종목(FailedTickerDAO), 내용 해시(StatementDigestDAO)는 수집/변환 배치와 같이 기록하고,
+오류나 중단으로 저장하지 못한 종목은 변경 표시가 남아 있으므로 실패 종목으로 기록해서 변환 배치가 다시 변환하도록 한다.
+저장소(HtmlArchive)는 선택 사항으로 지정하면 수집 배치와 같이 응답 원본을 저장한다.
+"""
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from queue import Queue, Empty, Full
+from threading import Event, Thread
+from typing import List
+
+from skogkatt.batch import batch_lookup
+from skogkatt.batch.queue_factory import queue_factory
+from skogkatt.commons.http.throttle import Throttle
+from skogkatt.conf.crawl_conf import (
+    FNGUIDE_SNAPSHOT_ARCHIVE_PATH, FNGUIDE_STATEMENT_ARCHIVE_PATH, PROXIES, CRAWL_WORKERS
+)
+from skogkatt.core import LoggerFactory
+from skogkatt.core.decorators import batch_status
+from skogkatt.crawler.archive import HtmlArchive
+from skogkatt.crawler.fnguide.converter import (
+    CONVERT_CHUNK_SIZE, CONVERT_WORKERS, ConvertWriter, SnapshotWriter, StatementWriter,
+    _init_parser, _parse_with, _parse_in_process
+)
+from skogkatt.crawler.fnguide.layout import load_statement_layouts
+from skogkatt.crawler.fnguide.lxml_parser import LxmlSnapshotParser, LxmlStatementParser
+from skogkatt.crawler.fnguide.scraper import IP_RENEW_INTERVAL, PageFetcher, create_engine
+from skogkatt.crawler.fnguide.url_builder import FnSnapshotUrlBuilder, FnStatementUrlBuilder
+from skogkatt.crawler.util import UrlBuilder
+
+logger = LoggerFactory.get_logger(__name__)
+
+# 단계 사이 큐 크기
+PIPELINE_QUEUE_SIZE = 16
+
+# 새 파싱 결과가 없을 때 모아 둔 종목을 저장하는 간격(초)
+FLUSH_INTERVAL = 2.0
+
+# 큐를 기다리면서 중단 여부를 확인하는 간격(초)
+_PUT_TIMEOUT = 0.1
+
+
+def stream_convert(batch_name: str,
+                   url_builder: UrlBuilder,
+                   parser_class,
+                   writer: ConvertWriter,
+                   queue: Queue = None,
+                   workers: int = CRAWL_WORKERS,
+                   parse_workers: int = CONVERT_WORKERS,
+                   throttle: Throttle = None,
+                   proxies: dict = PROXIES,
+                   archive: HtmlArchive = None,
+                   parser_kwargs: dict = None,
+                   queue_size: int = PIPELINE_QUEUE_SIZE,
+                   flush_interval: float = FLUSH_INTERVAL) -> List[str]:
+    """
+    큐에 담긴 종목을 수집하면서 바로 파싱해서 저장한다.
+    수집한 종목은 바로 수집 DB 큐에서 삭제하고, 내용이 바뀐 종목만 파싱한다.
+    수집 중 중단 오류(CrawlEngine fatal_errors)가 발생하면 이미 수집한 종목은 파싱, 저장한 후 오류를 다시 발생시킨다.
+    파싱, 저장 단계의 오류로 변환 전에 버려진 종목은 FailedTickerDAO에 'Dropped'로 저장한다.
+
+    :param batch_name: str, 수집 배치명
+    :param url_builder: UrlBuilder, parameter를 생성해주는 UrlBuilder
+    :param parser_class: LxmlSnapshotParser or LxmlStatementParser
+    :param writer: ConvertWriter, 파싱 결과 저장
+    :param queue: Queue, optional, 별도의 큐를 사용할 경우
+    :param workers: int, optional, 동시 요청 수
+    :param parse_workers: int, optional, 파싱 프로세스 수. 1 이면 파싱 스레드에서 파싱
+    :param throttle: Throttle, optional, 요청 속도 제한
+    :param proxies: dict, optional, 프록시 설정. None 이면 프록시를 사용하지 않고 IP도 갱신하지 않음
+    :param archive: HtmlArchive, optional, 응답 원본 저장소. None 이면 저장하지 않음
+    :param parser_kwargs: dict, optional, 파서 생성 인자
+    :param queue_size: int, optional, 단계 사이 큐 크기
+    :param flush_interval: float, optional, 새 파싱 결과가 없을 때 모아 둔 종목을 저장하는 간격(초)
+    :return:
+        List[처리된 종목코드]
+    """
+    queue = queue if queue is not None else queue_factory.resolve_queue(batch_name)
+
+    if queue.empty():
+        logger.info(f'Queue for {batch_name} is empty, return.')
+        return []
+
+    stock_codes = [queue.get().get('stock_code') for count in range(queue.qsize())]
+    engine = create_engine(workers, throttle, IP_RENEW_INTERVAL, proxies)
+    fetcher = PageFetcher(batch_name, engine, url_builder, stock_codes, proxies=proxies, archive=archive)
+
+    pages = Queue(maxsize=queue_size)
+    results = Queue(maxsize=queue_size)
+    stop = Event()
+    errors = []
+    fetched_at = {}
+    fetched_codes = []
+    handled_codes = set()
+    latencies = []
+
+    def put(target: Queue, item) -> bool:
+        """ 큐에 자리가 날 때까지 기다린다. 저장 단계가 중단되면 False """
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=_PUT_TIMEOUT)
+                return True
+            except Full:
+                continue
+        return False
+
+    def fetch_item(stock_code: str):
+        if stop.is_set():
+            return
+
+        contents, changed = fetcher.fetch(stock_code)
+        queue_factory.remove_queue_item(batch_name, stock_code)
+        if changed:
+            fetched_at[stock_code] = time.monotonic()
+            fetched_codes.append(stock_code)
+            put(pages, (stock_code, contents))
+
+    def fetch_all():
+        try:
+            engine.run(stock_codes, fetch_item)
+        except Exception as err:
+            errors.append(err)
+        finally:
+            put(pages, None)
+
+    def parse_all(executor: ProcessPoolExecutor = None):
+        try:
+            parser = parser_class(**(parser_kwargs or {})) if executor is None else None
+            while not stop.is_set():
+                try:
+                    item = pages.get(timeout=_PUT_TIMEOUT)
+                except Empty:
+                    continue
+                if item is None:
+                    break
+
+                stock_code, contents = item
+                if executor is None:
+                    result = _parse_with(parser, stock_code, contents)
+                else:
+                    result = executor.submit(_parse_in_process, stock_code, contents)
+                if not put(results, result):
+                    break
+        except Exception as err:
+            errors.append(err)
+        finally:
+            put(results, None)
+
+    def stored(stock_codes_: List[str]):
+        now = time.monotonic()
+        latencies.extend(now - fetched_at.pop(stock_code) for stock_code in stock_codes_ if stock_code in fetched_at)
+
+    logger.info(f'{batch_name} - stream convert, queued: {len(stock_codes)}, workers: {workers}, '
+                f'parse_workers: {parse_workers}')
+
+    executor = None
+    if parse_workers > 1:
+        executor = ProcessPoolExecutor(max_workers=parse_workers, initializer=_init_parser,
+                                       initargs=(parser_class, parser_kwargs))
+        """ 수집 스레드를 시작하기 전에 파싱 프로세스를 만든다. 다른 스레드가 잡고 있는 lock이 복사되지 않도록 """
+        executor.submit(int).result()
+
+    threads = [Thread(target=fetch_all, daemon=True), Thread(target=parse_all, args=(executor,), daemon=True)]
+    [thread.start() for thread in threads]
+
+    try:
+        while True:
+            try:
+                result = results.get(timeout=flush_interval)
+            except Empty:
+                stored(writer.flush())
+                continue
+
+            if result is None:
+                break
+
+            stock_code, dto, error = result.result() if isinstance(result, Future) else result
+            handled_codes.add(stock_code)
+            stored(writer.add(stock_code, dto, error))
+    finally:
+        stop.set()
+        [thread.join() for thread in threads]
+        if executor is not None:
+            executor.shutdown()
+
+        """ 수집 정보를 저장하고 수집 큐에서 삭제했지만 변환하지 못한 종목 """
+        for stock_code in fetched_codes:
+            if stock_code not in handled_codes:
+                writer.add(stock_code, None, ('Dropped', f'{batch_name} - {stock_code} dropped before conversion'))
+
+        processed_codes = writer.close()
+
+    stored(processed_codes)
+
+    if len(latencies) > 0:
+        logger.info(f'{batch_name} - fetch to store latency avg: {sum(latencies) / len(latencies):.2f}s, '
+                    f'max: {max(latencies):.2f}s')
+
+    if len(errors) > 0:
+        raise errors[0]
+
+    return processed_codes
+
+
+@batch_status(batch_lookup.FN_GUIDE_SNAPSHOT['name'])
+def stream_snapshot(queue: Queue = None,
+                    workers: int = CRAWL_WORKERS,
+                    parse_workers: int = CONVERT_WORKERS,
+                    chunk_size: int = CONVERT_CHUNK_SIZE,
+                    archive: bool = True,
+                    **kwargs) -> List[str]:
+    """
+    FnGuide 스냅샷을 수집하면서 바로 변환한다. stream_convert 참조
+    :param queue: Queue, optional, 종목코드 Queue. default: 스냅샷 수집 배치 큐
+    :param workers: int, optional, 동시 요청 수
+    :param parse_workers: int, optional, 파싱 프로세스 수
+    :param chunk_size: int, optional, 한번에 저장할 종목 수
+    :param archive: bool, optional, 응답 원본을 저장소(FNGUIDE_SNAPSHOT_ARCHIVE_PATH)에도 저장할지 여부
+    :return:
+        List[처리된 종목코드]
+    """
+    source = batch_lookup.FN_GUIDE_SNAPSHOT['name']
+    return stream_convert(source, FnSnapshotUrlBuilder(), LxmlSnapshotParser,
+                          SnapshotWriter(batch_lookup.FN_SNAPSHOT_CONVERT['name'], source, chunk_size),
+                          queue=queue, workers=workers, parse_workers=parse_workers,
+                          archive=HtmlArchive(FNGUIDE_SNAPSHOT_ARCHIVE_PATH) if archive else None, **kwargs)
+
+
+@batch_status(batch_lookup.FN_GUIDE_STATEMENT['name'])
+def stream_statement(queue: Queue = None,
+                     workers: int = CRAWL_WORKERS,
+                     parse_workers: int = CONVERT_WORKERS,
+                     chunk_size: int = CONVERT_CHUNK_SIZE,
+                     archive: bool = True,
+                     **kwargs) -> List[str]:
+    """
+    FnGuide 재무제표를 수집하면서 바로 변환한다. stream_convert 참조
+    수집 전에는 페이지가 없으므로 표 구조 확인(preflight_statements)은 하지 않고, 저장된 표 구조별 색인을 사용한다.
+    :param queue: Queue, optional, 종목코드 Queue. default: 재무제표 수집 배치 큐
+    :param workers: int, optional, 동시 요청 수
+    :param parse_workers: int, optional, 파싱 프로세스 수
+    :param chunk_size: int, optional, 한번에 저장할 종목 수
+    :param archive: bool, optional, 응답 원본을 저장소(FNGUIDE_STATEMENT_ARCHIVE_PATH)에도 저장할지 여부
+    :return:
+        List[처리된 종목코드]
+    """
+    source = batch_lookup.FN_GUIDE_STATEMENT['name']
+    return stream_convert(source, FnStatementUrlBuilder(), LxmlStatementParser,
+                          StatementWriter(batch_lookup.FN_STATEMENT_CONVERT['name'], source, chunk_size),
+                          queue=queue, workers=workers, parse_workers=parse_workers,
+                          archive=HtmlArchive(FNGUIDE_STATEMENT_ARCHIVE_PATH) if archive else None,
+                          parser_kwargs={'layouts': load_statement_layouts(source)}, **kwargs)
@@ -1,22 +1,31 @@
-import random
-import time
+import hashlib
 from pathlib import Path
 from queue import Queue
+from typing import List, Tuple
 
+import lxml.html
+import stem
 from bs4 import BeautifulSoup
+from lxml.etree import ParserError
 
 from requests import Timeout, HTTPError, RequestException
 from requests.exceptions import ProxyError
 
 from skogkatt.conf.crawl_conf import (
-    FNGUIDE_SNAPSHOT_FILE_STORAGE_PATH, FNGUIDE_SNAPSHOT_FILE_PREFIX,
-    FNGUIDE_STATEMENT_FILE_STORAGE_PATH, FNGUIDE_STATEMENT_FILE_PREFIX, PROXIES
+    FNGUIDE_SNAPSHOT_FILE_STORAGE_PATH, FNGUIDE_SNAPSHOT_FILE_PREFIX, FNGUIDE_SNAPSHOT_ARCHIVE_PATH,
+    FNGUIDE_STATEMENT_FILE_STORAGE_PATH, FNGUIDE_STATEMENT_FILE_PREFIX, FNGUIDE_STATEMENT_ARCHIVE_PATH, PROXIES,
+    CRAWL_WORKERS, CRAWL_RATE, CRAWL_BURST, CRAWL_HOST_POLICIES
 )
 
 from skogkatt.batch import batch_lookup
 from skogkatt.batch.queue_factory import queue_factory
+from skogkatt.commons.http.throttle import Throttle
+from skogkatt.crawler.archive import HtmlArchive
+from skogkatt.crawler.engine import CrawlEngine
 from skogkatt.crawler.fnguide.url_builder import FnSnapshotUrlBuilder, FnStatementUrlBuilder
 from skogkatt.crawler.util import UrlBuilder, renew_connection
+from skogkatt.core.dao import dao_factory
+from skogkatt.core.dao.idao import FetchMetaDAO
 from skogkatt.core.decorators import batch_status
 from skogkatt.core import LoggerFactory
 from skogkatt.commons.http.request import request
@@ -30,7 +39,10 @@ IP_RENEW_INTERVAL = 300
 """
 FnGuide 사이트에서 Snapshot, 재무제표 html 파일을 크롤링해서 파일로 저장한다.
 분기별 업데이트 일정을 참고하여 FnGuide에서 분기자료 업데이트 확인 후 개별 실행 권장:
- - 접속차단 방지를 위해 5분마다 IP를 바꾸고, 1건 수집 후 1~4초간 쉬기 때문에 시간 오래 걸림
+ - 접속차단 방지를 위해 5분마다 IP를 바꾸고, 요청 속도를 제한(CRAWL_RATE, CRAWL_HOST_POLICIES)하면서 동시에 수집
+ - 종목별 응답 정보(ETag, Last-Modified)와 표(table) 내용 해시를 FetchMetaDAO에 저장하고,
+   내용이 바뀐 종목만 파일로 저장하고 변환(convert) 대상으로 표시
+ - 배치(start)는 응답 원본을 분기별 압축 저장소(HtmlArchive)에 저장하고, 파서는 저장소에서 바로 읽음
  - Terminal에서 실행시 Tor 네트워크 설정(renew_connection 메소드) 실행시 에러 발생하므로 IDE에서 실행
  
 --- 업데이트 일정 ---
@@ -42,15 +54,166 @@ FnGuide 사이트에서 Snapshot, 재무제표 html 파일을 크롤링해서 
 """
 
 
+def content_digest(content: bytes) -> str:
+    """
+    페이지의 재무정보 표(table) 내용 해시. 표 밖의 광고, 스크립트 등이 바뀌어도 같은 값이다.
+    수집 스레드에서 계산하므로 html5lib 대신 lxml로 읽는다.
+    :param content: bytes, 응답 원본
+    :return:
+        str, sha1 hex digest
+    """
+    sha = hashlib.sha1()
+    try:
+        root = lxml.html.document_fromstring(content)
+    except ParserError:
+        return sha.hexdigest()
+
+    for table in root.iter('table'):
+        sha.update(lxml.html.tostring(table, encoding='utf-8'))
+
+    return sha.hexdigest()
+
+
+def conditional_headers(meta: dict) -> dict:
+    """
+    저장된 응답 정보로 조건부 요청 헤더를 만든다.
+    :param meta: dict, FetchMetaDAO.find 결과의 종목별 정보
+    :return:
+        dict, If-None-Match, If-Modified-Since
+    """
+    headers = {}
+    if meta.get('etag') is not None:
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified') is not None:
+        headers['If-Modified-Since'] = meta['last_modified']
+
+    return headers
+
+
+def create_engine(workers: int = CRAWL_WORKERS,
+                  throttle: Throttle = None,
+                  ip_renew_interval: int = IP_RENEW_INTERVAL,
+                  proxies: dict = PROXIES) -> CrawlEngine:
+    """
+    FnGuide 수집기. 요청 오류는 수집을 중단하는 오류로 처리한다.
+    :param workers: int, optional, 동시 요청 수
+    :param throttle: Throttle, optional, 요청 속도 제한. default: CRAWL_RATE, CRAWL_BURST, CRAWL_HOST_POLICIES
+    :param ip_renew_interval: int, optional, IP 갱신 주기 in seconds
+    :param proxies: dict, optional, 프록시 설정. None 이면 IP를 갱신하지 않음
+    :return:
+        CrawlEngine
+    """
+    return CrawlEngine(workers=workers,
+                       throttle=throttle if throttle is not None else
+                       Throttle(CRAWL_RATE, CRAWL_BURST, CRAWL_HOST_POLICIES),
+                       ip_renew_interval=ip_renew_interval,
+                       renew=renew_connection if proxies is not None else None,
+                       fatal_errors=(RequestException, ConnectionError, stem.SocketError))
+
+
+class PageFetcher:
+    """
+    종목 페이지 한 건을 수집하고 응답 정보를 저장한다. batch_crawl과 스트리밍 변환(pipeline)에서 사용.
+    conditional 이면 이전 응답의 ETag, Last-Modified로 조건부 요청을 보내고, 304 응답이거나
+    표 내용 해시(content_digest)가 같으면 다시 저장하지 않는다. 내용이 바뀐 종목은 FetchMetaDAO에 changed로 표시한다.
+    """
+
+    def __init__(self,
+                 batch_name: str,
+                 engine: CrawlEngine,
+                 url_builder: UrlBuilder,
+                 stock_codes: List[str],
+                 file_path: str = None,
+                 file_name_prefix: str = None,
+                 proxies: dict = PROXIES,
+                 conditional: bool = True,
+                 archive: HtmlArchive = None):
+        """
+        :param batch_name: str, 수집 배치명
+        :param engine: CrawlEngine, 수집기
+        :param url_builder: UrlBuilder, parameter를 생성해주는 UrlBuilder
+        :param stock_codes: List[str], 수집할 종목코드. 저장된 수집 정보를 한번에 읽는다
+        :param file_path: str, optional, 파일 저장 경로. None 이면 파일로 저장하지 않는다
+        :param file_name_prefix: str, optional, 저장할 파일명 prefix
+        :param proxies: dict, optional, 프록시 설정
+        :param conditional: bool, optional, False 이면 저장된 수집 정보와 관계없이 모두 다시 저장하고 changed로 표시
+        :param archive: HtmlArchive, optional, 응답 원본 저장소. 지정하면 파일 대신 저장소에 저장
+        """
+        self.batch_name = batch_name
+        self.engine = engine
+        self.url_builder = url_builder
+        self.file_path = Path(file_path) if file_path is not None else None
+        self.file_name_prefix = file_name_prefix
+        self.proxies = proxies
+        self.archive = archive
+        self.fetch_meta_dao: FetchMetaDAO = dao_factory.get('FetchMetaDAO')
+        self.stored_meta = self.fetch_meta_dao.find(batch_name, stock_codes) if conditional else {}
+
+    def fetch(self, stock_code: str) -> Tuple[bytes or None, bool]:
+        """
+        :param stock_code: str, 종목코드
+        :return:
+            (응답 원본, 변경 여부). 304 응답이면 응답 원본은 None
+        """
+        url, payload = self.url_builder.build(stock_code=stock_code)
+        file_name = f'{self.file_name_prefix}{stock_code}.html'
+        meta = self.stored_meta.get(stock_code, {})
+        if self.archive is not None:
+            exists = self.archive.contains(stock_code)
+        else:
+            exists = self.file_path is not None and self.file_path.joinpath(file_name).exists()
+
+        """ 저장된 파일이 없으면 본문이 필요하므로 조건부 요청을 보내지 않는다 """
+        headers = conditional_headers(meta) if exists else None
+        res = self.engine.get(url=url, payload=payload, proxies=self.proxies, headers=headers)
+
+        if res.status_code == 304:
+            if self.archive is not None:
+                self.archive.retain(stock_code)
+            self.fetch_meta_dao.update(self.batch_name, stock_code, meta.get('etag'), meta.get('last_modified'))
+            return None, False
+
+        """ 304 외의 응답은 정상(200)일 때만 페이지로 저장한다. 오류 응답은 HTTPError로 수집을 중단한다 """
+        res.raise_for_status()
+        if res.status_code != 200:
+            raise HTTPError(f'Unexpected response status {res.status_code}: {stock_code}', response=res)
+
+        digest = content_digest(res.content)
+        changed = digest != meta.get('digest')
+        if self.archive is not None:
+            if changed or not exists:
+                self.archive.put(stock_code, res.content)
+            else:
+                self.archive.retain(stock_code)
+        elif self.file_path is not None and (changed or not exists):
+            save_file(str(BeautifulSoup(res.content, "html5lib")), file_path=self.file_path, file_name=file_name)
+
+        self.fetch_meta_dao.update(self.batch_name, stock_code, res.headers.get('ETag'),
+                                   res.headers.get('Last-Modified'), digest, changed)
+        return res.content, changed
+
+
 def batch_crawl(batch_name: str,
                 file_path: str,
                 file_name_prefix: str,
                 url_builder: UrlBuilder,
                 ip_renew_interval: int = IP_RENEW_INTERVAL,
-                queue: Queue = None,):
+                queue: Queue = None,
+                workers: int = CRAWL_WORKERS,
+                throttle: Throttle = None,
+                proxies: dict = PROXIES,
+                conditional: bool = True,
+                archive: HtmlArchive = None):
     """
     큐에 담긴 주식 종목코드를 읽어 파일로 저장한다.
     배치 주기, 주기 확인여부를 적용하여 batch_name을 Key로 DB에 큐 데이터를 만들고 이를 사용한다.
+    CrawlEngine으로 workers 개를 동시에 요청하고, 요청 속도는 throttle로 제한한다.
+    저장한 종목은 바로 DB 큐에서 삭제하므로 중단 후 다시 실행하면 남은 종목만 수집한다.
+    conditional 이면 이전 응답의 ETag, Last-Modified로 조건부 요청을 보내고, 304 응답이거나
+    표 내용 해시(content_digest)가 같으면 파일을 다시 저장하지 않는다.
+    내용이 바뀐 종목은 FetchMetaDAO에 changed로 표시하고 변환 배치는 표시된 종목만 변환한다.
+    archive를 지정하면 html5lib로 다시 쓴 파일 대신 응답 원본을 archive의 이번 분기 색인에 저장하고,
+    바뀌지 않은 종목은 원본 저장 없이 가장 최근 자료를 이번 분기 색인에 추가한다(HtmlArchive.retain).
 
     :param batch_name: str, 배치이름
     :param file_path: str, 파일 저장 경로
@@ -58,6 +221,11 @@ def batch_crawl(batch_name: str,
     :param url_builder: UrlBuilder, parameter를 생성해주는 UrlBuilder
     :param ip_renew_interval: int, optional, IP 갱신 주기 in seconds
     :param queue: Queue, optional, 별도의 큐를 사용할 경우
+    :param workers: int, optional, 동시 요청 수
+    :param throttle: Throttle, optional, 요청 속도 제한. default: CRAWL_RATE, CRAWL_BURST, CRAWL_HOST_POLICIES
+    :param proxies: dict, optional, 프록시 설정. None 이면 프록시를 사용하지 않고 IP도 갱신하지 않음
+    :param conditional: bool, optional, False 이면 저장된 수집 정보와 관계없이 모두 다시 저장하고 changed로 표시
+    :param archive: HtmlArchive, optional, 응답 원본 저장소. None 이면 file_path에 html 파일로 저장
     :return:
         int, 큐에 남아있는 아이템 개수
     """
@@ -67,39 +235,30 @@ def batch_crawl(batch_name: str,
         logger.info(f'Queue for {batch_name} is empty, return.')
         return
 
-    file_path = Path(file_path)
-    ip_time = time.time()
+    stock_codes = [queue.get().get('stock_code') for count in range(queue.qsize())]
+    engine = create_engine(workers, throttle, ip_renew_interval, proxies)
+    fetcher = PageFetcher(batch_name, engine, url_builder, stock_codes, file_path, file_name_prefix, proxies,
+                          conditional, archive)
+    changed_codes = []
 
-    for count in range(queue.qsize()):
-        stock_code = queue.get().get('stock_code')
-        url, payload = url_builder.build(stock_code=stock_code)
-        filename = f'{file_name_prefix}{stock_code}.html'
+    def scrape_item(stock_code: str):
+        content, changed = fetcher.fetch(stock_code)
+        if changed:
+            changed_codes.append(stock_code)
 
-        try:
-            current = time.time()
-            elapsed = current - ip_time
-            if elapsed > ip_renew_interval:
-                logger.debug(f'IP used {elapsed / 60} minutes, renew tor IP')
-                renew_connection()
-                ip_time = current
-
-            res = request.get(url=url, payload=payload, proxies=PROXIES)
-            soup = BeautifulSoup(res.content, "html5lib")
-            save_file(str(soup), file_path=file_path, file_name=filename)
+        queue_factory.remove_queue_item(batch_name, stock_code)
 
-            queue_factory.remove_queue_item(batch_name, stock_code)
-
-            sleep = random.randrange(1, 4)
-            time.sleep(sleep)
-
-        except ProxyError as err:
-            logger.fatal(f'Proxy Server is not running, check your proxies: {err}')
-            raise
-        except (Timeout, ConnectionError, HTTPError, RequestException) as err:
-            logger.fatal(f'Cannot scrape FnGuide Data: {err}')
-            raise
+    try:
+        done = engine.run(stock_codes, scrape_item)
+    except ProxyError as err:
+        logger.fatal(f'Proxy Server is not running, check your proxies: {err}')
+        raise
+    except (Timeout, ConnectionError, HTTPError, RequestException) as err:
+        logger.fatal(f'Cannot scrape FnGuide Data: {err}')
+        raise
 
-    return queue.qsize()
+    logger.info(f'{batch_name} - changed: {len(changed_codes)}/{done}')
+    return len(stock_codes) - done
 
 
 def scrape_by(stock_code: str,
@@ -146,7 +305,8 @@ class FnGuideSnapshotScraper:
                         file_name_prefix=FNGUIDE_SNAPSHOT_FILE_PREFIX,
                         url_builder=FnSnapshotUrlBuilder(),
                         ip_renew_interval=IP_RENEW_INTERVAL,
-                        queue=queue)
+                        queue=queue,
+                        archive=HtmlArchive(FNGUIDE_SNAPSHOT_ARCHIVE_PATH))
 
         return remained
 
@@ -171,7 +331,8 @@ class FnGuideStatementScraper:
                         file_name_prefix=FNGUIDE_STATEMENT_FILE_PREFIX,
                         url_builder=FnStatementUrlBuilder(),
                         ip_renew_interval=IP_RENEW_INTERVAL,
-                        queue=queue)
+                        queue=queue,
+                        archive=HtmlArchive(FNGUIDE_STATEMENT_ARCHIVE_PATH))
 
         return remained
 
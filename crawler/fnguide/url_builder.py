@@ -13,9 +13,9 @@ class FnSnapshotUrlBuilder(UrlBuilder):
         stock_code = kwargs.get('stock_code', None)
         if stock_code is None:
             raise KeyError('stock_code is required')
-        self._payload['gicode'] = f'A{stock_code}'
+        payload = dict(self._payload, gicode=f'A{stock_code}')
 
-        return self._url, self._payload
+        return self._url, payload
 
 
 class FnStatementUrlBuilder(UrlBuilder):
@@ -29,6 +29,6 @@ class FnStatementUrlBuilder(UrlBuilder):
         stock_code = kwargs.get('stock_code', None)
         if stock_code is None:
             raise KeyError('stock_code is required.')
-        self._payload['gicode'] = f'A{stock_code}'
+        payload = dict(self._payload, gicode=f'A{stock_code}')
 
-        return self._url, self._payload
+        return self._url, payload
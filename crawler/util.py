@@ -1,3 +1,6 @@
+from io import StringIO
+
+import lxml.html
 import pandas as pd
 import stem
 from abc import ABCMeta, abstractmethod
@@ -26,6 +29,16 @@ def read_from(file_path) -> BeautifulSoup:
         return BeautifulSoup(contents, 'html5lib')
 
 
+def read_html(contents: bytes or str) -> BeautifulSoup:
+    """
+    HTML 원본(HtmlArchive.get 등)을 읽어서 BeautifulSoup 반환
+    :param contents: bytes or str, HTML. bytes 이면 문서에 지정된 인코딩을 따름
+    :return:
+        BeautifulSoup
+    """
+    return BeautifulSoup(contents, 'html5lib')
+
+
 def remove_style(source, tag, style_txt=None):
     """
     html style attribute 제거. 특정 값을 가진 스타일만 제거할 때는
@@ -104,6 +117,20 @@ def to_dataframe(data_table, header_index=0, replace_column: dict = None):
     return df
 
 
+def read_table(table, header=0) -> pd.DataFrame:
+    """
+    lxml table element를 DataFrame으로 변환한다.
+    문서 전체가 아닌 표 부분만 HTML로 써서 pd.read_html(flavor='lxml')로 읽으므로
+    display:none 제외, colspan/rowspan 복사, 천단위 구분자 숫자 변환은 pd.read_html(str(table))과 같다.
+    :param table: lxml.html.HtmlElement, table
+    :param header: int or List[int], 헤더 행 번호
+    :return:
+        DataFrame
+    """
+    html = lxml.html.tostring(table, encoding='unicode', with_tail=False)
+    return pd.read_html(StringIO(html), flavor='lxml', header=header, thousands=',')[0]
+
+
 def renew_connection():
     """
     signal TOR for a new connection
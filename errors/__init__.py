@@ -26,6 +26,12 @@ class StatementParseError(RuntimeError):
         self.corp_name = kwargs.get('corp_name', None)
 
 
+class LayoutDriftError(RuntimeError):
+    def __init__(self, err_msg='FnGuide page layout changed'):
+        super().__init__(err_msg)
+        self.message = err_msg
+
+
 class NoDataFoundError(ValueError):
     def __init__(self, err_msg='No data found'):
         super().__init__(err_msg)
@@ -5,6 +5,7 @@ from tabulate import tabulate
 from skogkatt.core import LoggerFactory
 from skogkatt.core.dao import dao_factory
 from skogkatt.core.ticker.store import ticker_store
+from skogkatt.screeners.rim.helper import DBHelper
 from skogkatt.screeners.rim.pricer import Pricer
 
 logger = LoggerFactory.get_logger(__name__)
@@ -44,14 +45,25 @@ class FormulaScreener:
 
     def append_price_estimate(self):
         pricer = Pricer()
+        db_helper = DBHelper()
         for key, df in self.filtered_tickers.items():
             stock_codes = df['stock_code'].values.tolist()
 
+            """ 오늘 계산해서 캐시된 종목은 재무정보를 읽지 않는다 """
+            cached = {stock_code: pricer.find_cached_estimate(stock_code) for stock_code in stock_codes}
+            missing = [stock_code for stock_code, estimate in cached.items() if estimate is None]
+            dto_dict = db_helper.get_fn_statement_dtos(missing) if len(missing) > 0 else {}
+
             rim_prices = []
 
             for stock_code in stock_codes:
-                ticker = ticker_store.find_by_stock_code(stock_code)
-                estimate = pricer.estimate(ticker, crawl=self.crawl)
+                estimate = cached[stock_code]
+                if estimate is None:
+                    ticker = ticker_store.find_by_stock_code(stock_code)
+                    estimate = pricer.estimate(ticker, crawl=self.crawl, statement_dto=dto_dict.get(stock_code))
+
+                    if self.crawl:
+                        time.sleep(TR_INTERVAL)
 
                 if estimate is None:
                     rim_prices.append([None, None, None, None, None, None])
@@ -65,9 +77,6 @@ class FormulaScreener:
                         estimate.req_profit_rate
                     ])
 
-                if self.crawl:
-                    time.sleep(TR_INTERVAL)
-
             date = datetime.today()
             columns = ['affordable', 'buy', 'sell', 'criteria', 'criteria_roe', 'req_profit_rate']
             df[columns] = rim_prices
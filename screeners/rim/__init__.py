@@ -1,5 +1,8 @@
+from datetime import datetime
 from typing import List
-from pandas import DataFrame
+
+import numpy
+from pandas import DataFrame, MultiIndex, Series
 
 
 class PriceEstimate:
@@ -21,16 +24,35 @@ class PriceEstimate:
         self._roe_criteria = roe_criteria
         self._fiscal_quarter = fiscal_quarter
         self._req_profit_rate = req_profit_rate
+        self._discount_base = None
+
+    def set_discount_base(self, equity_std: List[float], stock_cnt: int, std_date: str, as_of: str = None):
+        """
+        재무정보가 바뀌지 않았을 때 날짜 경과만 반영해서 적정가격을 다시 계산(할인)하기 위한 기준 값을 저장한다.
+        :param equity_std: List[float], 초과이익 계수별 주주가치(분석시점 기준)
+        :param stock_cnt: int, 발행주식수(보통주 + 우선주 - 자기주식)
+        :param std_date: str, 분석기준 일자 YYYYMMDD
+        :param as_of: str, optional, 적정가격 계산 기준일자 YYYYMMDD. default: 오늘
+        """
+        self._discount_base = {'equity_std': list(equity_std),
+                               'stock_cnt': int(stock_cnt),
+                               'std_date': std_date,
+                               'as_of': as_of if as_of is not None else datetime.today().strftime('%Y%m%d')}
 
     def to_dict(self):
-        return {'stock_code': self.stock_code,
-                'buy_price': self.buy_price,
-                'sell_price': self.sell_price,
-                'affordable_price': self.affordable_price,
-                'roe_estimated': self.applied_roe,
-                'roe_criteria': self.roe_criteria,
-                'req_profit_rate': self.req_profit_rate,
-                'fiscal_quarter': self.fiscal_quarter}
+        result = {'stock_code': self.stock_code,
+                  'buy_price': self.buy_price,
+                  'sell_price': self.sell_price,
+                  'affordable_price': self.affordable_price,
+                  'roe_estimated': self.applied_roe,
+                  'roe_criteria': self.roe_criteria,
+                  'req_profit_rate': self.req_profit_rate,
+                  'fiscal_quarter': self.fiscal_quarter}
+
+        if self._discount_base is not None:
+            result.update(self._discount_base)
+
+        return result
 
     @property
     def stock_code(self):
@@ -76,6 +98,80 @@ class PriceEstimate:
         return self._table
 
 
+class PriceGrid:
+    """
+    요구수익률, 적용 ROE, 초과이익 계수 조합별 RIM 계산 결과
+    각 값은 (종목, 요구수익률, ROE, 초과이익 계수) 4차원 배열이다.
+    ROE 축을 지정하지 않으면 ROE 축은 길이 1이고 종목별 적용 ROE(applied_roes)로 계산한 값이다.
+    """
+    DIMS = ('stock_code', 'req_profit_rate', 'roe', 'coefficient')
+    FIELDS = ('price', 'equity_current', 'equity_std', 'pv_of_ri', 'per')
+
+    def __init__(self,
+                 stock_codes: List[str],
+                 req_profit_rates,
+                 roes,
+                 coefficients,
+                 applied_roes,
+                 values: dict):
+
+        self.stock_codes = list(stock_codes)
+        self.req_profit_rates = numpy.asarray(req_profit_rates, dtype=float)
+        self.roes = None if roes is None else numpy.asarray(roes, dtype=float)
+        self.coefficients = numpy.asarray(coefficients, dtype=float)
+        self.applied_roes = numpy.asarray(applied_roes, dtype=float)     # 종목별 적용 ROE
+        self._values = values
+
+    @property
+    def shape(self):
+        return self.price.shape
+
+    @property
+    def price(self) -> numpy.ndarray:
+        """ RIM 적정주가(현재 기준) """
+        return self._values['price']
+
+    @property
+    def equity_current(self) -> numpy.ndarray:
+        """ 주주가치(현재 기준) """
+        return self._values['equity_current']
+
+    @property
+    def per(self) -> numpy.ndarray:
+        return self._values['per']
+
+    def get(self, field: str) -> numpy.ndarray:
+        return self._values[field]
+
+    def sel(self, stock_code: str, field: str = 'price') -> numpy.ndarray:
+        """
+        한 종목의 (요구수익률, ROE, 초과이익 계수) 배열을 반환한다.
+        :param stock_code: 종목코드
+        :param field: FIELDS 중 하나
+        :return:
+            numpy.ndarray
+        """
+        return self._values[field][self.stock_codes.index(stock_code)]
+
+    def to_dataframe(self) -> DataFrame:
+        """
+        조합별 계산 결과를 (종목, 요구수익률, ROE, 초과이익 계수) MultiIndex DataFrame으로 반환한다.
+        ROE 축이 없으면 ROE 레벨은 종목별 적용 ROE
+        """
+        stock_idx, req_idx, roe_idx, coef_idx = numpy.indices(self.shape).reshape(4, -1)
+        if self.roes is None:
+            roes = self.applied_roes[stock_idx]
+        else:
+            roes = self.roes[roe_idx]
+
+        index = MultiIndex.from_arrays([numpy.asarray(self.stock_codes)[stock_idx],
+                                        self.req_profit_rates[req_idx],
+                                        roes,
+                                        self.coefficients[coef_idx]], names=self.DIMS)
+
+        return DataFrame({field: self._values[field].ravel() for field in self.FIELDS}, index=index)
+
+
 class Criteria:
     ITEMS = ['영업자산이익률', '비영업자산이익률', '차입이자율']
     OPTIONS = ['가중평균', '최근']
@@ -92,17 +188,16 @@ class Criteria:
     def apply(self, df: DataFrame) -> DataFrame:
         df['criteria'] = self.items['criteria']
         column_selected = 'applied_value'
-        df[column_selected] = None
-
-        for i in range(self.items.shape[0]):
-            criteria = self.items.iloc[i]['criteria']
-            name = self.items.iloc[i].name
 
+        selected = {}
+        for name, criteria in self.items['criteria'].items():
             if '가중평균' == criteria:
-                df.loc[name, column_selected] = df.loc[name, criteria]
+                selected[name] = df.loc[name, criteria]
             elif '최근' == criteria:
                 filter_col = [col for col in df if col.startswith('최근')]
-                df.loc[name, column_selected] = df.loc[name, filter_col[0]]
+                selected[name] = df.loc[name, filter_col[0]]
+
+        df[column_selected] = Series([selected.get(name) for name in df.index], index=df.index, dtype=object)
 
         return df
 
@@ -0,0 +1,220 @@
+import os
+import pickle
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import closing
+from datetime import datetime
+from typing import List, Tuple
+
+from skogkatt.commons.util.file import get_cache_folder
+from skogkatt.commons.util.singleton import Singleton
+from skogkatt.conf.app_conf import app_config
+from skogkatt.core import LoggerFactory
+from skogkatt.screeners.rim import PriceEstimate
+
+logger = LoggerFactory.get_logger(__name__)
+
+# 프로세스 메모리에 유지하는 적정가격 수
+LRU_SIZE = 4096
+
+# 다른 프로세스의 invalidate를 확인하는 최소 간격(초). 조회할 때마다 캐시 파일을 열지 않는다
+GENERATION_SYNC_INTERVAL = 1.0
+
+# 디스크 캐시 파일명, 실행 모드별로 분리
+CACHE_FILE = 'price_estimate_{mode}.sqlite'
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS price_estimate (
+        stock_code TEXT NOT NULL,
+        fiscal_quarter TEXT NOT NULL,
+        req_profit_rate TEXT NOT NULL,
+        criteria TEXT NOT NULL,
+        as_of TEXT NOT NULL,
+        dto_hash TEXT NOT NULL,
+        estimate BLOB NOT NULL,
+        PRIMARY KEY (stock_code, fiscal_quarter, req_profit_rate, criteria, as_of)
+    )"""
+
+# invalidate 할 때마다 증가. 다른 프로세스의 invalidate를 메모리 캐시에 반영하는데 사용
+CREATE_GENERATION = """
+    CREATE TABLE IF NOT EXISTS generation (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        value INTEGER NOT NULL
+    )"""
+
+
+class PriceEstimateCache(metaclass=Singleton):
+    """
+    RIM 적정가격(PriceEstimate) 계산 결과 캐시.
+    (종목코드, 최근분기, 요구수익률, 계산조건, 기준일자) 별로 재무정보 해시와 함께 저장한다.
+    프로세스 메모리(LRU)와 get_cache_folder() 아래 SQLite 파일 두 단계로 찾는다.
+    적정가격은 기준시점부터 경과일수로 현재가치를 계산하므로 기준일자(오늘)가 바뀌면 새로 계산한다.
+    재무정보를 저장하는 쪽(변환 배치, Pricer 크롤링)에서 invalidate로 해당 종목 결과를 삭제한다.
+    다른 프로세스에서 invalidate 하면 파일의 generation 값이 바뀌므로 메모리 캐시를 비운다.
+    generation 값은 GENERATION_SYNC_INTERVAL 초에 한번만 확인한다.
+    """
+
+    def __init__(self, lru_size: int = LRU_SIZE):
+        self._lru_size = lru_size
+        self._lru = OrderedDict()
+        self._generation = None
+        self._synced_at = None
+        self._disk_ready = set()
+
+    @staticmethod
+    def make_key(stock_code: str,
+                 fiscal_quarter: str,
+                 req_profit_rate: float,
+                 criteria: str,
+                 as_of: str = None) -> Tuple[str, str, str, str, str]:
+        """
+        :param stock_code: str, 종목코드
+        :param fiscal_quarter: str, 최근분기 YYYY/MM
+        :param req_profit_rate: float, 요구 수익률 %
+        :param criteria: str, 계산조건(ROE 추정조건, 잔여이익 현재가치 계산 방식 등)
+        :param as_of: str, optional, 기준일자 YYYYMMDD. default: 오늘
+        :return:
+            tuple, 캐시 키
+        """
+        as_of = as_of if as_of is not None else datetime.today().strftime('%Y%m%d')
+        return stock_code, fiscal_quarter, f'{float(req_profit_rate):.4f}', criteria, as_of
+
+    def get(self, key: Tuple, dto_hash: str = None) -> PriceEstimate or None:
+        """
+        캐시된 적정가격을 반환한다.
+        :param key: tuple, make_key
+        :param dto_hash: str, optional, 계산에 사용할 재무정보 해시(dto_digest). 전달되면 해시가 같은 경우만 반환
+        :return:
+            PriceEstimate, 없으면 None
+        """
+        self._sync_generation()
+        entry = self._lru.get(key)
+        if entry is None:
+            entry = self._read_disk(key)
+            if entry is None:
+                return None
+            self._put_lru(key, entry)
+        else:
+            self._lru.move_to_end(key)
+
+        if dto_hash is not None and entry[0] != dto_hash:
+            return None
+
+        return entry[1]
+
+    def put(self, key: Tuple, estimate: PriceEstimate, dto_hash: str):
+        """
+        적정가격을 캐시에 저장한다.
+        :param key: tuple, make_key
+        :param estimate: PriceEstimate
+        :param dto_hash: str, 계산에 사용한 재무정보 해시(dto_digest)
+        """
+        entry = (dto_hash, estimate)
+        self._put_lru(key, entry)
+
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute('INSERT OR REPLACE INTO price_estimate VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             key + (dto_hash, pickle.dumps(estimate, protocol=pickle.HIGHEST_PROTOCOL)))
+        except sqlite3.Error as err:
+            logger.warning(f'Price estimate disk cache write failed: {err}')
+
+    def invalidate(self, stock_codes: List[str] = None):
+        """
+        종목의 캐시된 적정가격을 삭제한다.
+        :param stock_codes: List[str], optional, 종목코드. None 이면 전체 삭제
+        """
+        if stock_codes is None:
+            self._lru.clear()
+        else:
+            stock_codes = set(stock_codes)
+            for key in [key for key in self._lru if key[0] in stock_codes]:
+                del self._lru[key]
+
+        try:
+            with closing(self._connect()) as conn, conn:
+                if stock_codes is None:
+                    conn.execute('DELETE FROM price_estimate')
+                else:
+                    conn.executemany('DELETE FROM price_estimate WHERE stock_code = ?',
+                                     [(stock_code,) for stock_code in stock_codes])
+                if self._read_generation(conn) != self._generation:
+                    self._lru.clear()
+
+                conn.execute('UPDATE generation SET value = value + 1 WHERE id = 0')
+                self._generation = self._read_generation(conn)
+        except sqlite3.Error as err:
+            logger.warning(f'Price estimate disk cache invalidation failed: {err}')
+
+    def _sync_generation(self):
+        """
+        다른 프로세스에서 invalidate 했거나 실행 모드가 바뀌었으면 메모리 캐시를 비운다.
+        실행 모드가 같으면 GENERATION_SYNC_INTERVAL 초 안에는 다시 확인하지 않는다.
+        """
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < GENERATION_SYNC_INTERVAL \
+                and self._generation is not None and self._generation[0] == app_config.current_mode:
+            return
+
+        try:
+            with closing(self._connect()) as conn:
+                generation = self._read_generation(conn)
+        except sqlite3.Error as err:
+            logger.warning(f'Price estimate disk cache read failed: {err}')
+            return
+
+        self._synced_at = now
+        if generation != self._generation:
+            self._lru.clear()
+            self._generation = generation
+
+    @staticmethod
+    def _read_generation(conn: sqlite3.Connection) -> Tuple[int, int]:
+        return app_config.current_mode, conn.execute('SELECT value FROM generation WHERE id = 0').fetchone()[0]
+
+    def _put_lru(self, key: Tuple, entry: Tuple):
+        self._lru[key] = entry
+        self._lru.move_to_end(key)
+        while len(self._lru) > self._lru_size:
+            self._lru.popitem(last=False)
+
+    def _read_disk(self, key: Tuple) -> Tuple[str, PriceEstimate] or None:
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute('SELECT dto_hash, estimate FROM price_estimate '
+                                   'WHERE stock_code = ? AND fiscal_quarter = ? AND req_profit_rate = ? '
+                                   'AND criteria = ? AND as_of = ?', key).fetchone()
+        except sqlite3.Error as err:
+            logger.warning(f'Price estimate disk cache read failed: {err}')
+            return None
+
+        if row is None:
+            return None
+
+        try:
+            return row[0], pickle.loads(row[1])
+        except (pickle.UnpicklingError, AttributeError, ImportError, EOFError) as err:
+            logger.warning(f'Price estimate disk cache entry ignored: {err}')
+            return None
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        실행 모드별 캐시 파일 연결. 프로세스 간 공유할 수 있도록 사용할 때마다 연결한다.
+        처음 연결할 때 테이블을 만들고 지난 기준일자 자료를 삭제한다.
+        """
+        path = os.path.join(get_cache_folder(), CACHE_FILE.format(mode=app_config.current_mode))
+        conn = sqlite3.connect(path, timeout=30)
+
+        if path not in self._disk_ready:
+            with conn:
+                conn.execute(CREATE_TABLE)
+                conn.execute(CREATE_GENERATION)
+                conn.execute('INSERT OR IGNORE INTO generation VALUES (0, 0)')
+                conn.execute('DELETE FROM price_estimate WHERE as_of < ?', (datetime.today().strftime('%Y%m%d'),))
+            self._disk_ready.add(path)
+
+        return conn
+
+
+price_estimate_cache = PriceEstimateCache()
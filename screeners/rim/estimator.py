@@ -1,8 +1,9 @@
-import copy
 import logging
 from typing import List
 
-from pandas import DataFrame
+import numpy
+import pandas as pd
+from pandas import DataFrame, MultiIndex
 from tabulate import tabulate
 
 from skogkatt.commons.util.date import get_annual_periods, get_quarter_periods
@@ -18,6 +19,19 @@ from skogkatt.screeners.rim import Criteria
 logger = LoggerFactory.get_logger(__name__)
 
 
+# ROE 분석 항목: (항목, 분자, 분모)
+ROE_FACTORS = [('영업자산이익률', '영업이익', '영업용자산'),
+               ('비영업자산이익률', '비영업이익', '비영업자산'),
+               ('차입이자율', '이자비용', '외부차입'),
+               ('지배주주 ROE', '지배주주순이익', '자기자본')]
+
+# ROE 분석 기간 구분: 연간 2개년, 최근4분기, 가중평균
+ROE_PERIODS = ['전년도', '당해년도', '최근4분기', '가중평균']
+
+# 집계표 계산 후 제외하는 항목
+AGGREGATE_EXCLUDED = ['유보이익', '주주투자', '금융투자', '여유자금', '기타', '신용조달']
+
+
 def aggregate_statements(statements: List[Statement]):
     """
     재무제표 attribute별 집계표를 만든다.
@@ -37,20 +51,49 @@ def aggregate_statements(statements: List[Statement]):
         ...
         ...
     """
-    df = DataFrame()
+    df = aggregate_statements_many(statements)
+    df.columns = df.columns.droplevel('stock_code')
+    df.columns.name = None
 
-    for stmt in statements:
-        df_stmt = stmt.to_dataframe()
-        summary = df_stmt.groupby(['attribute'], sort=False)['value'].sum(numeric_only=True)
-        df[f'{stmt.fiscal_date}'] = summary
+    return df
 
-        df.loc['자기자본'] = df.loc['유보이익'] + df.loc['주주투자']
-        df.loc['영업부채'] = df.loc['신용조달']
-        df.loc['영업용자산'] = df.loc['설비투자'] + df.loc['운전자산']
-        df.loc['비영업자산'] = df.loc['금융투자'] + df.loc['여유자금']
-        df.loc['비영업이익'] = df.loc['당기순이익'] - df.loc['영업이익'] + df.loc['이자비용'] + df.loc['법인세비용']
 
-    df = df.drop(['유보이익', '주주투자', '금융투자', '여유자금', '기타', '신용조달'], axis=0)
+def aggregate_statements_many(statements: List[Statement]) -> DataFrame:
+    """
+    여러 종목의 재무제표 attribute별 집계표를 한번에 만든다.
+    전체 재무제표를 하나의 (종목, 회계일자, attribute, 값) 표로 만들어 한번에 합산하고
+    자기자본, 영업용자산 등 계산 항목도 전체 컬럼에 대해 한번에 계산한다.
+    같은 종목, 회계일자의 재무제표가 여러 개면 마지막 재무제표 값을 사용한다.
+    :param statements: List[Statement], 재무제표 리스트
+    :return:
+        DataFrame, 컬럼은 (stock_code, fiscal_date) MultiIndex, 재무제표 순서
+    """
+    """ 같은 종목, 회계일자 재무제표 중 마지막 재무제표 순번. 컬럼 순서는 처음 나온 순서 """
+    last_seq = {}
+    for seq, stmt in enumerate(statements):
+        last_seq[(stmt.stock_code, stmt.fiscal_date)] = seq
+
+    attributes = list(dict.fromkeys(fact.group for stmt in statements for fact in stmt.facts if fact.group is not None))
+    records = DataFrame([(stmt.stock_code, stmt.fiscal_date, fact.group, fact.value)
+                         for seq, stmt in enumerate(statements)
+                         if last_seq[(stmt.stock_code, stmt.fiscal_date)] == seq
+                         for fact in stmt.facts],
+                        columns=['stock_code', 'fiscal_date', 'attribute', 'value'])
+
+    summary = records.groupby(['attribute', 'stock_code', 'fiscal_date'], sort=False)['value'].sum(numeric_only=True)
+    columns = MultiIndex.from_tuples(list(last_seq.keys()), names=['stock_code', 'fiscal_date'])
+    df = summary.unstack(['stock_code', 'fiscal_date']).reindex(index=attributes, columns=columns)
+
+    derived = DataFrame({
+        '자기자본': df.loc['유보이익'] + df.loc['주주투자'],
+        '영업부채': df.loc['신용조달'],
+        '영업용자산': df.loc['설비투자'] + df.loc['운전자산'],
+        '비영업자산': df.loc['금융투자'] + df.loc['여유자금'],
+        '비영업이익': df.loc['당기순이익'] - df.loc['영업이익'] + df.loc['이자비용'] + df.loc['법인세비용'],
+    }).T
+
+    df = pd.concat([df.drop(AGGREGATE_EXCLUDED, axis=0), derived])
+    df.index.name = 'attribute'
 
     return df
 
@@ -111,6 +154,48 @@ def calc_corp_tax(sales_profit, non_sales_profit, interest_cost):
     return tax
 
 
+def calc_corp_tax_many(sales_profit: numpy.ndarray, non_sales_profit: numpy.ndarray, interest_cost: numpy.ndarray):
+    """
+    calc_corp_tax 의 배열 버전
+    :return:
+        numpy.ndarray, 법인세비용
+    """
+    target_income = sales_profit + non_sales_profit - interest_cost
+
+    with numpy.errstate(invalid='ignore'):
+        return numpy.select([target_income <= 2,
+                             (2 < target_income) & (target_income <= 200),
+                             (200 < target_income) & (target_income <= 3000),
+                             target_income > 3000],
+                            [target_income * 0.1,
+                             target_income * 0.2 - 0.2,
+                             target_income * 0.22 - 4.2,
+                             target_income * 0.25 - 94.2],
+                            default=0)
+
+
+def _stack_by_ticker(df: DataFrame, stock_codes: List[str]) -> (numpy.ndarray, numpy.ndarray, numpy.ndarray):
+    """
+    aggregate_statements_many 집계표를 (attribute, 종목, 컬럼 순서) 배열로 바꾼다.
+    종목별 컬럼 수가 다르면 뒤쪽은 NaN
+    :return:
+        (값 배열, 종목별 컬럼 수, (종목, 컬럼 순서) 회계일자 배열)
+    """
+    codes = df.columns.get_level_values('stock_code')
+    ticker_idx = pd.Index(stock_codes).get_indexer(codes)
+    position = pd.Series(codes).groupby(codes, sort=False).cumcount().to_numpy()
+    counts = numpy.bincount(ticker_idx, minlength=len(stock_codes))
+
+    width = max(int(counts.max(initial=0)), 1)
+    values = numpy.full((len(df.index), len(stock_codes), width), numpy.nan)
+    values[:, ticker_idx, position] = df.to_numpy(dtype=float)
+
+    dates = numpy.full((len(stock_codes), width), None, dtype=object)
+    dates[ticker_idx, position] = df.columns.get_level_values('fiscal_date')
+
+    return values, counts, dates
+
+
 def calc_control_holder_net_profit(df_aggregate, net_income):
     """
     6) 지배주주 순이익 = (지배주주순이익(4분기합) / (지배주주순이익(4분기합) + 비지배주주순이익(4분기합))) * 당기순이익
@@ -180,26 +265,142 @@ class ROEEstimator:
 
         self._aggregate(dto)
 
-        result_df = self._prepare_dataframe(dto)
-        self._append_factor_to(result_df, '영업자산이익률', '영업이익', '영업용자산')
-        self._append_factor_to(result_df, '비영업자산이익률', '비영업이익', '비영업자산')
-        self._append_factor_to(result_df, '차입이자율', '이자비용', '외부차입')
-        self._append_factor_to(result_df, '지배주주 ROE', '지배주주순이익', '자기자본')
+        self.weights = self._resolve_weights()
+        rows = {'가중치': self.weights + [None]}
+        for factor, numerator, denominator in ROE_FACTORS:
+            rows[factor] = self._calc_factor(numerator, denominator)
 
+        result_df = DataFrame.from_dict({name: values[:3] for name, values in rows.items()},
+                                        orient='index', columns=self._make_column_headers())
+        result_df['가중평균'] = pd.Series({name: values[3] for name, values in rows.items()}, dtype=object)
         result_df = self.apply_criteria(criteria, result_df)
         self.estimated_roe = result_df.loc['지배주주 ROE', 'applied_value']
 
         return result_df
 
+    def estimate_many(self, dtos: List[FinancialStatementDTO], criteria: Criteria = None) -> DataFrame:
+        """
+        여러 종목의 미래 ROE 값을 한번에 추정한다.
+        전체 종목의 재무제표를 aggregate_statements_many로 한번에 집계하고, 항목별 계산과
+        apply_criteria의 이자비용, 법인세비용, 순이익 계산을 종목 배열에 대한 연산으로 처리한다.
+        계산 순서와 반올림은 estimate와 같으므로 종목별 결과와 일치한다.
+
+        :param dtos: List[FinancialStatementDTO], 종목별 재무제표
+        :param criteria: optional, Criteria, 추정 조건: 가중평균 or 최근 4분기
+        :return:
+            DataFrame, index: stock_code,
+            columns: (ROE_FACTORS 항목, ROE_PERIODS + applied_value), ('가중치', 기간), ('적용값', 이자비용 ~ ROE 분석값)
+            추정 ROE는 ('지배주주 ROE', 'applied_value'). 분기 재무제표가 없거나
+            연간 집계 컬럼(연간 + 최근분기)이 4개가 아닌 종목은 제외
+        """
+        if criteria is None:
+            criteria = Criteria(default_option="가중평균")
+
+        dtos = [dto for dto in dtos
+                if dto.quarter_statements is not None and len(dto.quarter_statements) > 0
+                and dto.annual_statements is not None]
+        stock_codes = [dto.stock_code for dto in dtos]
+        if len(dtos) == 0:
+            return DataFrame()
+
+        """ 연간 자료에 최근분기 데이터 추가 """
+        annual_df = aggregate_statements_many(
+            [stmt for dto in dtos for stmt in dto.annual_statements + [dto.quarter_statements[-1]]])
+        quarter_df = aggregate_statements_many([stmt for dto in dtos for stmt in dto.quarter_statements])
+
+        annual, annual_counts, annual_dates = _stack_by_ticker(annual_df, stock_codes)
+        quarter, quarter_counts, quarter_dates = _stack_by_ticker(quarter_df, stock_codes)
+
+        valid = (annual_counts == 4) & (quarter_counts > 0)
+        if not valid.all():
+            logger.error(f'ROE 추정 제외 - 연간 집계 컬럼 수 오류: {list(numpy.asarray(stock_codes)[~valid])}')
+            stock_codes = list(numpy.asarray(stock_codes)[valid])
+            annual, annual_dates, quarter = annual[:, valid, :4], annual_dates[valid], quarter[:, valid]
+
+        def annual_row(attribute):
+            return annual[annual_df.index.get_loc(attribute)]
+
+        def quarter_row(attribute):
+            return quarter[quarter_df.index.get_loc(attribute)]
+
+        """ 분기 자료 계정별 4분기 합 """
+        quarter_sum = numpy.where(numpy.isnan(quarter), 0, quarter).sum(axis=2)
+
+        def quarter_sum_row(attribute):
+            return quarter_sum[quarter_df.index.get_loc(attribute)]
+
+        """ 가중치: _resolve_weights """
+        closing_month = numpy.asarray([int(date.split('/')[1]) for date in annual_dates[:, 2]])
+        recent_month = numpy.asarray([int(date.split('/')[1]) for date in annual_dates[:, 3]])
+        weight = ((recent_month + 12 - closing_month) % 12) / 6
+        weights = [numpy.full(len(stock_codes), 1.0), weight, numpy.full(len(stock_codes), 3.0)]
+        weight_sum = 1.0 + weight + 3.0
+
+        result = {}
+        for period, value in zip(ROE_PERIODS, weights):
+            result[('가중치', period)] = value
+
+        """ 항목별 연간, 최근4분기, 가중평균: _append_factor_to """
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            for factor, numerator, denominator in ROE_FACTORS:
+                num, den = annual_row(numerator), annual_row(denominator)
+                values = [numpy.round(num[:, 1] * 2 / (den[:, 1] + den[:, 0]) * 100, 2),
+                          numpy.round(num[:, 2] * 2 / (den[:, 2] + den[:, 1]) * 100, 2),
+                          numpy.round(quarter_sum_row(numerator) * 2 /
+                                      (den[:, 3] + quarter_row(denominator)[:, 0]) * 100, 2)]
+
+                weighted = 0
+                for value, weight in zip(values, weights):
+                    weighted = weighted + value * weight
+                values.append(numpy.round(weighted / weight_sum, 2))
+
+                for period, value in zip(ROE_PERIODS, values):
+                    result[(factor, period)] = value
+
+            """ 추정 조건 적용: Criteria.apply """
+            for name in Criteria.ITEMS:
+                period = '가중평균' if criteria.items.loc[name, 'criteria'] == '가중평균' else '최근4분기'
+                result[(name, 'applied_value')] = result[(name, period)]
+
+            """ apply_criteria """
+            interest_cost = annual_row('외부차입')[:, 3] * (result[('차입이자율', 'applied_value')] / 100)
+            sales_profit = annual_row('영업용자산')[:, 3] * (result[('영업자산이익률', 'applied_value')] / 100)
+            non_sales_profit = annual_row('비영업자산')[:, 3] * (result[('비영업자산이익률', 'applied_value')] / 100)
+            tax = calc_corp_tax_many(sales_profit, non_sales_profit, interest_cost)
+            net_income = sales_profit + non_sales_profit - interest_cost - tax
+
+            c_holder_profit = quarter_sum_row('지배주주순이익')
+            nc_holder_profit = quarter_sum_row('비지배주주순이익')
+            ctrl_profit = (c_holder_profit / (c_holder_profit + nc_holder_profit)) * net_income
+            non_ctrl_profit = (nc_holder_profit / (nc_holder_profit + c_holder_profit)) * net_income
+
+            roe = ctrl_profit / annual_row('자기자본')[:, 3] * 100
+
+        result[('지배주주 ROE', 'applied_value')] = numpy.round(roe, 2)
+        applied_values = {'이자비용': interest_cost,
+                          '영업이익': sales_profit,
+                          '비영업이익': non_sales_profit,
+                          '법인세비용': tax,
+                          '당기순이익': net_income,
+                          '지배주주순이익': ctrl_profit,
+                          '비지배주주순이익': non_ctrl_profit,
+                          'ROE 분석값': roe}
+        for name, value in applied_values.items():
+            result[('적용값', name)] = value
+
+        df = DataFrame(result, index=pd.Index(stock_codes, name='stock_code'))
+        return df[[('가중치', period) for period in ROE_PERIODS[:3]] +
+                  [(factor, period) for factor, _, _ in ROE_FACTORS for period in ROE_PERIODS + ['applied_value']] +
+                  [('적용값', name) for name in applied_values]]
+
     def _aggregate(self, dto: FinancialStatementDTO):
         """
         연간, 분기 재무제표에서 필요한 항목을 추출해서 각각 DataFrame을 만든다.
         :param dto:
         :return:
         """
-        # 연간 자료에 최근분기 데이터 추가
-        annual_statements = copy.deepcopy(dto.annual_statements)
-        annual_statements.append(dto.quarter_statements[-1])
+        # 연간 자료에 최근분기 데이터 추가. 재무제표는 변경하지 않으므로 복사하지 않는다.
+        annual_statements = dto.annual_statements + [dto.quarter_statements[-1]]
 
         self.annual_df = aggregate_statements(annual_statements)
         self.quarter_df = aggregate_statements(dto.quarter_statements)
@@ -207,15 +408,6 @@ class ROEEstimator:
         # 분기 자료에 계정별 4분기 합 추가
         self.quarter_df['sum'] = self.quarter_df.sum(axis=1, skipna=True)
 
-    def _prepare_dataframe(self, dto):
-        columns = self._make_column_headers()
-        df = DataFrame(columns=columns)
-        self.weights = self._resolve_weights()
-        df.loc['가중치'] = self.weights
-        df['가중평균'] = None
-        # print(tabulate(df, headers="keys", tablefmt="psql"))
-        return df
-
     def _make_column_headers(self):
         """
         ROE 분석용 DataFrame 생성을 위한 컬럼명을 만들어서 반환한다.
@@ -245,9 +437,9 @@ class ROEEstimator:
         logger.debug(f'결산월: {closing_month}, 최종월: {recent_month}, 결산후 개월: {month_elapsed}, 전년도 가중치: {weight}')
         return [1.0, weight, 3.0]
 
-    def _append_factor_to(self, df: DataFrame, factor: str, numerator: str, denominator: str):
+    def _calc_factor(self, numerator: str, denominator: str) -> List[float]:
         """
-        DataFrame에 계산 항목을 추가한다.
+        계산 항목의 전년도, 당해년도, 최근4분기, 가중평균 값을 계산한다.
 
         영업자산 이익률(연간) = 당해년도 영업이익 * 2 / (당해년도 영업용자산 + 전년도 영업용자산)
         비영업자산이익률(연간) = 당해년도 비영업이익 * 2 / (당해년도 비영업자산 + 전년도 비영업자산)
@@ -259,18 +451,17 @@ class ROEEstimator:
 
         영업자산 이익률(가중평균) = sum(년도별 영업자산 이익률 * 해당년도 가중평균) / 가중평균값 합계
 
-        :param df: 집계항목을 추가할 DataFrame
-        :param factor: str, 집계표에 추가할 항목명
         :param numerator: str, 계산시 분모 항목명
         :param denominator: str, 계산시 분자 항목명
         :return:
+            List[전년도, 당해년도, 최근4분기, 가중평균]
         """
-        df.loc[factor, df.columns[0]] = self.mean_annual(numerator, denominator, 1, 0)
-        df.loc[factor, df.columns[1]] = self.mean_annual(numerator, denominator, 2, 1)
-        df.loc[factor, df.columns[2]] = self.mean_recent_quarter(numerator, denominator)
-        df.loc[factor, df.columns[3]] = self.weighted_average(df, factor)
+        values = [self.mean_annual(numerator, denominator, 1, 0),
+                  self.mean_annual(numerator, denominator, 2, 1),
+                  self.mean_recent_quarter(numerator, denominator)]
+        values.append(self.weighted_average(values))
 
-        return df
+        return values
 
     def mean_annual(self, numerator: str, denominator: str, first_index: int, second_index: int):
         """
@@ -313,11 +504,10 @@ class ROEEstimator:
 
         return result
 
-    def weighted_average(self, df: DataFrame, factor: str) -> float:
+    def weighted_average(self, values: List[float]) -> float:
         """
         가중평균 값을 계산해서 반환한다.
-        :param df: 계산 대상 DataFrame
-        :param factor: 계산할 항목
+        :param values: List[float], 전년도, 당해년도, 최근4분기 값
         :return:
             float, 가중평균 값
         """
@@ -325,8 +515,7 @@ class ROEEstimator:
         result = 0
 
         for i in range(len(self.weights)):
-            value = df.loc[factor, df.columns[i]]
-            result = result + value * self.weights[i]
+            result = result + values[i] * self.weights[i]
 
         return round(result / sum(self.weights), 2)
 
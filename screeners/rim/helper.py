@@ -1,5 +1,5 @@
 import math
-from typing import List
+from typing import List, Dict
 
 from skogkatt.commons.util.date import get_quarter_periods, get_annual_periods
 from skogkatt.core.dao import dao_factory
@@ -52,6 +52,40 @@ class DBHelper:
 
         return dto
 
+    def get_fn_statement_dtos(self, stock_codes: List[str]) -> Dict[str, FinancialStatementDTO]:
+        """
+        여러 종목의 FinancialStatementDTO를 한번에 만든다.
+        get_fn_statement_dto와 같은 조건으로 조회하되 종목별로 조회하지 않고
+        컬렉션별로 한번씩($in) 조회해서 종목별로 나눈다.
+        :param stock_codes: List[str], 종목코드 목록
+        :return:
+            dict, {종목코드: FinancialStatementDTO}. 요약정보 또는 연간 요약 재무제표가 없는 종목은 제외
+        """
+        stock_codes = list(dict.fromkeys(stock_codes))
+        summaries = {summary.stock_code: summary for summary in self.summary_dao.find(stock_codes)}
+
+        annual_from, annual_to = get_annual_periods(5)
+        quarter_from, quarter_to = get_quarter_periods(6)
+        annual_abbreviations = self.stmt_abbr_dao.find_many(stock_codes, ReportCode.summary_annual, annual_from, annual_to)
+        quarter_abbreviations = self.stmt_abbr_dao.find_many(stock_codes, ReportCode.summary_quarter, quarter_from, quarter_to)
+        annual_statements = self.stmt_dao.find_many(stock_codes, ReportCode.annual)
+        quarter_statements = self.stmt_dao.find_many(stock_codes, ReportCode.quarter)
+
+        dto_dict = {}
+        for stock_code in stock_codes:
+            if stock_code not in summaries or len(annual_abbreviations[stock_code]) == 0:
+                continue
+
+            dto = FinancialStatementDTO(stock_code)
+            dto.stock_summary = summaries[stock_code]
+            dto.annual_abbreviations = annual_abbreviations[stock_code]
+            dto.quarter_abbreviations = quarter_abbreviations[stock_code]
+            dto.annual_statements = annual_statements[stock_code]
+            dto.quarter_statements = quarter_statements[stock_code]
+            dto_dict[stock_code] = dto
+
+        return dto_dict
+
     def find_stock_summary(self, stock_code: str) -> StockSummary or None:
         return self.summary_dao.find_one(stock_code)
 
@@ -10,17 +10,18 @@ from pandas import DataFrame
 from tabulate import tabulate
 
 from skogkatt.commons.util.date import get_fiscal_date, days_between
-from skogkatt.commons.util.numeral import format_with
 from skogkatt.core import LoggerFactory
 from skogkatt.core.dao import dao_factory
 from skogkatt.core.dao.idao import StockSummaryDAO, FnStatementAbbrDAO
 from skogkatt.core.financial import Statement
+from skogkatt.core.financial.digest import dto_digest
 from skogkatt.core.financial.dto import FinancialStatementDTO
 from skogkatt.core.ticker import Ticker
 from skogkatt.crawler.fnguide.parser import FnSnapshotParser, FnStatementParser
 from skogkatt.crawler.fnguide.scraper import FnGuideSnapshotScraper, FnGuideStatementScraper
 from skogkatt.errors import PricerError, NoDataFoundError, StatementParseError
-from skogkatt.screeners.rim import PriceEstimate
+from skogkatt.screeners.rim import PriceEstimate, PriceGrid
+from skogkatt.screeners.rim.cache import price_estimate_cache
 from skogkatt.screeners.rim.estimator import ROEEstimator
 
 from skogkatt.screeners.rim.helper import DBHelper
@@ -38,6 +39,29 @@ COEFFICIENTS = [{'label': '초과이익 지속', 'coefficient': 1.0, 'decision':
 # 요구 수익율
 REQ_PROFIT_RATE = 7.89
 
+# 잔여이익 현재가치 계산 방식
+PV_TABLE = 'table'              # 분석 년수만큼 초과이익 테이블을 만들어 할인
+PV_CLOSED_FORM = 'closed-form'  # 초과이익 테이블 없이 공식으로 계산, 무한 기간 가능
+
+# 잔여이익 현재가치 공식의 log(1 + x) 급수를 사용하는 |a * c| 상한. 이상이면 수렴이 느려서 직접 곱한다
+SERIES_LIMIT = 0.9
+
+# log(1 + x) 급수 최대 항 수
+SERIES_MAX_TERMS = 1000
+
+
+def round_decimals(values, decimals: int = 2):
+    """
+    numpy.round 와 같은 계산(rint(x * 10^d) / 10^d)으로 소수점 자리수를 반올림한다.
+    작은 배열을 반복해서 반올림할 때 numpy.round 호출 부담을 줄이기 위해 사용하며 결과는 numpy.round와 같다.
+    :param values: numpy.ndarray or float
+    :param decimals: int, 소수점 자리수
+    :return:
+        numpy.ndarray or numpy.float64
+    """
+    factor = 10.0 ** decimals
+    return numpy.rint(values * factor) / factor
+
 
 def pivot_table(df_source: DataFrame):
     """
@@ -54,17 +78,24 @@ def pivot_table(df_source: DataFrame):
         | ROE     |      7.62        |      8.44        |     14           |      9.63       |     10.64        |
         +---------+------------------+------------------+------------------+-----------------+------------------+
     """
-    df = DataFrame()
-
-    groups = df_source.groupby(['fiscal_date'])
+    columns = {}
+    index = None
     group_data = None
-    for date, group_data in groups:
-        df[date] = group_data['value']
+    for date, group_data in df_source.groupby('fiscal_date'):
+        """ 첫번째 회계일자의 계정 순번 기준으로 맞춘다 """
+        if index is None:
+            index = group_data.index
+        columns[date] = group_data['value'].reindex(index)
 
+    df = DataFrame(columns, index=index)
     df.index = group_data['account_id'].values.tolist()
     return df
 
 
+# extract_facts 컬럼
+FACT_COLUMNS = ['stock_code', 'fiscal_date', 'account_id', 'value', 'report_code', 'fs_div', 'consensus']
+
+
 def extract_facts(statements: List[Statement], accounts: Tuple = None, consensus: int = 0) -> DataFrame:
     """
     재무제표에서 필요한 항목만 추출해서 반환한다.
@@ -72,22 +103,21 @@ def extract_facts(statements: List[Statement], accounts: Tuple = None, consensus
     :param statements: List[Statement], 재무제표 리스트
     :param consensus: int, 컨센서스 포함여부 1: 컨센서스, 0: 실적자료, 2: 컨센 + 실적
     :return:
-        DataFrame
+        DataFrame, index는 재무제표 내 계정 순번(Statement.to_dataframe 의 index)
     """
-    df = DataFrame()
+    records = []
+    positions = []
     for stmt in statements:
-        df_stmt = stmt.to_dataframe()
-
-        if consensus != 2:
-            df_stmt = df_stmt[df_stmt['consensus'] == consensus]
+        if consensus != 2 and stmt.consensus != consensus:
+            continue
 
-        if accounts is not None:
-            df_stmt = df_stmt.loc[df_stmt['account_id'].isin(accounts)]
+        for position, fact in enumerate(stmt.facts):
+            if accounts is None or fact.account_name in accounts:
+                positions.append(position)
+                records.append((stmt.stock_code, stmt.fiscal_date, fact.account_name, fact.value,
+                                stmt.report_code, stmt.fs_div, stmt.consensus))
 
-        df = df.append(df_stmt)
-
-    df = df.drop(['attribute', 'sector', 'sj_div'], axis=1)
-    return df
+    return DataFrame.from_records(records, index=positions, columns=FACT_COLUMNS)
 
 
 def get_annual_fact(statements: List[Statement]) -> DataFrame:
@@ -118,7 +148,9 @@ def calc_quarter_roe(ticker: Ticker, df_quarters: DataFrame) -> DataFrame:
         | ROE     |     10.79        |
         +---------+------------------+
     """
-    print(tabulate(df_quarters, headers="keys", tablefmt="psql"))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(tabulate(df_quarters, headers="keys", tablefmt="psql"))
+
     # 매출액 Min value
     min_sales = df_quarters.loc['매출액'].min()
 
@@ -146,12 +178,350 @@ def calc_quarter_roe(ticker: Ticker, df_quarters: DataFrame) -> DataFrame:
                  f'지배주주지분:{min_ctrl_interest}, 지배주주지분평균:{ctrl_interest_avg},'
                  f'지배주주순이익:{sum_ctrl_income}, ROE: {roe}')
 
-    result_df = DataFrame(columns=[f'{df_quarters.columns[-1]}'], index=['지배주주순이익', '지배주주지분', 'ROE'])
-    result_df.loc['지배주주순이익', result_df.columns[0]] = sum_ctrl_income
-    result_df.loc['지배주주지분', result_df.columns[0]] = ctrl_interest
-    result_df.loc['ROE', result_df.columns[0]] = roe
+    return DataFrame({f'{df_quarters.columns[-1]}': [sum_ctrl_income, ctrl_interest, roe]},
+                     index=['지배주주순이익', '지배주주지분', 'ROE'],
+                     dtype=object)
+
+
+def pv_of_ri_closed_form(equities,
+                         excess_profit_rates,
+                         req_profit_rate: float,
+                         coefficients,
+                         years: int = ANALYSIS_YEARS) -> numpy.ndarray:
+    """
+    미래 잔여이익의 현재가치(PV of RI)를 초과이익 테이블 없이 계산한다.
+    지배주주지분(B)이 매년 ROE(요구수익률 r + 초과이익률 e * c^k)만큼 증가하고 요구수익률로 할인하면
+    k년차 잔여이익의 현재가치 합은 다음과 같이 정리된다.
+
+        a = e / (100 + r)
+        PV = B * (∏(1 + a * c^k) - 1),  k = 1 ~ years
+
+    곱의 로그는 log(1 + x) 급수와 등비수열의 합으로 계산한다.
+
+        log ∏ = Σ_j (-1)^(j+1) * a^j / j * c^j * (1 - c^(j * years)) / (1 - c^j)
+
+    c = 1 이면 log ∏ = years * log(1 + a). 무한 기간은 합이 발산하므로 분석 년수(ANALYSIS_YEARS)를 적용한다.
+    |a * c| >= SERIES_LIMIT 이면 급수가 느리게 수렴하거나 발산하므로 (1 + a * c^k)를 직접 곱한다.
+    요구수익률은 초과이익 테이블과 같이 소수점 2자리로 반올림해서 성장률과 할인율에 모두 적용한다.
+    매년 반올림하지 않으므로 초과이익 테이블 방식(PV_TABLE)과는 반올림 오차만큼 차이가 있다.
+
+    :param equities: array like, 기준시점 지배주주지분
+    :param excess_profit_rates: array like, 기준시점 초과이익률
+    :param req_profit_rate: float or array like, 요구 수익률 %
+    :param coefficients: float or array like, 초과이익 계수(0 < c <= 1)
+    :param years: int, optional, 분석 년수. None 이면 무한 기간(초과이익 지속 계수는 ANALYSIS_YEARS)
+    :return:
+        numpy.ndarray, 인자를 broadcast 한 shape
+    """
+    equities, excess_profit_rates, req_profit_rate, coefficients = numpy.broadcast_arrays(
+        numpy.asarray(equities, dtype=float),
+        numpy.asarray(excess_profit_rates, dtype=float),
+        numpy.asarray(req_profit_rate, dtype=float),
+        numpy.asarray(coefficients, dtype=float))
+
+    if numpy.any((coefficients <= 0) | (coefficients > 1)):
+        raise ValueError(f'Coefficient must be in (0, 1]: {coefficients}')
+
+    infinite = years is None
+    a = excess_profit_rates / (100 + numpy.round(req_profit_rate, 2))
+    log_product = numpy.zeros(a.shape)
+
+    with numpy.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        """ 초과이익 지속(c = 1): years * log(1 + a) """
+        unit = coefficients == 1
+        log_product[unit] = (ANALYSIS_YEARS if infinite else years) * numpy.log1p(a[unit])
+
+        """ 초과이익 감소(c < 1): log(1 + x) 급수 """
+        series = ~unit & (numpy.abs(a * coefficients) < SERIES_LIMIT)
+        log_product[series] = _sum_log_series(a[series], coefficients[series], years)
+
+        pv_of_ri = numpy.array(equities * numpy.expm1(log_product), dtype=float)
+
+        """ 초과이익률이 커서 급수가 느리게 수렴하거나 1년차 ROE가 -100% 이하인 경우는 직접 곱한다 """
+        direct = ~unit & ~series
+        if direct.any():
+            count = _direct_years(a[direct], coefficients[direct]) if infinite else years
+            powers = coefficients[direct][:, None] ** numpy.arange(1, count + 1)
+            product = numpy.prod(1 + a[direct][:, None] * powers, axis=1)
+            pv_of_ri[direct] = equities[direct] * (product - 1)
+
+    return pv_of_ri
+
+
+def _direct_years(a: numpy.ndarray, c: numpy.ndarray) -> int:
+    """ 무한 기간을 직접 곱할 때 |a * c^k|가 float 정밀도 이하가 되는 년수 """
+    eps = numpy.finfo(float).eps
+    years = numpy.log(eps / numpy.maximum(numpy.abs(a), eps)) / numpy.log(c)
+    return max(int(numpy.ceil(numpy.max(years))), 1)
+
+
+def _sum_log_series(a: numpy.ndarray, c: numpy.ndarray, years: int = None) -> numpy.ndarray:
+    """
+    Σ_k log(1 + a * c^k), k = 1 ~ years 를 등비수열 합의 급수로 계산한다.
+    :raise ValueError: c >= 1 이거나 |a * c| >= 1 이면 급수가 발산하고, SERIES_MAX_TERMS 항까지 수렴하지 않으면 오류
+    """
+    if numpy.any(c >= 1) or numpy.any(numpy.abs(a * c) >= 1):
+        raise ValueError('log(1 + x) series requires c < 1 and |a * c| < 1.')
+
+    total = numpy.zeros(a.shape)
+    power_a, power_c = numpy.ones(a.shape), numpy.ones(c.shape)
 
-    return result_df
+    for j in range(1, SERIES_MAX_TERMS + 1):
+        power_a, power_c = power_a * a, power_c * c
+        if years is None:
+            geometric = power_c / (1 - power_c)
+        else:
+            geometric = power_c * (1 - power_c ** years) / (1 - power_c)
+
+        term = (-1) ** (j + 1) * power_a / j * geometric
+        total += term
+        if numpy.all(numpy.abs(term) <= numpy.finfo(float).eps * numpy.abs(total)):
+            return total
+
+    raise ValueError(f'log(1 + x) series did not converge in {SERIES_MAX_TERMS} terms, '
+                     f'max |a * c|: {numpy.max(numpy.abs(a * c)):.4f}')
+
+
+def _check_table_years(pv_method: str, years: int):
+    if pv_method != PV_TABLE:
+        raise ValueError(f'Unknown PV method: {pv_method}')
+    if years is None:
+        raise ValueError('Infinite horizon is only available with the closed-form PV method.')
+
+
+def estimate_prices_many(equities,
+                         excess_profit_rates,
+                         days_elapsed,
+                         stock_counts,
+                         req_profit_rate=REQ_PROFIT_RATE,
+                         controlling_incomes=None,
+                         coefficients: List[dict] = None,
+                         years: int = ANALYSIS_YEARS,
+                         pv_method: str = PV_TABLE) -> dict:
+    """
+    N개 종목의 기준 데이터로 초과이익 계수별 RIM 적정가격을 한번에 계산한다.
+    초과이익 테이블, 잔여이익 현재가치, 주주가치, 적정주가, PER 순서로 (종목, 초과이익 계수) 배열을 계산한다.
+    매년 ROE, 지배주주순이익, 초과이익, 지배주주지분을 소수점 2자리로 반올림하므로
+    numpy.float64 값으로 한 해씩 계산한 결과와 반올림 단계까지 동일하다.
+
+    :param equities: array like, 기준시점 지배주주지분
+    :param excess_profit_rates: array like, 기준시점 초과이익률(적용 ROE - 요구수익률, 소수점 2자리)
+    :param days_elapsed: array like, 기준시점 - 현재 경과일수
+    :param stock_counts: array like, 발행주식수(보통주 + 우선주 - 자기주식)
+    :param req_profit_rate: float or array like, 요구 수익률 %, 배열이면 종목별 요구 수익률
+    :param controlling_incomes: array like, optional, PER 계산용 지배주주순이익. None은 NaN 처리
+    :param coefficients: List[dict], optional, 초과이익 계수. default: COEFFICIENTS
+    :param years: int, optional, 분석 년수. default: ANALYSIS_YEARS, PV_CLOSED_FORM 에서 None 이면 무한 기간
+    :param pv_method: str, optional, 잔여이익 현재가치 계산 방식. PV_TABLE(default) or PV_CLOSED_FORM
+    :return:
+        dict, 각 값은 (종목수, 계수 개수) 배열
+        {'pv_of_ri': 미래 잔여이익의 현재가치,
+         'equity_std': 주주가치(분석시점 기준),
+         'equity_current': 주주가치(현재 기준),
+         'price': RIM 적정주가(현재 기준),
+         'per': PER}
+    """
+    if coefficients is None:
+        coefficients = COEFFICIENTS
+
+    equities = numpy.asarray(equities, dtype=float)
+    excess_profit_rates = numpy.asarray(excess_profit_rates, dtype=float)
+    stock_counts = numpy.asarray(stock_counts, dtype=float)
+    factors = numpy.asarray([coefficient['coefficient'] for coefficient in coefficients], dtype=float)
+
+    count = len(equities)
+    req_profit_rates = numpy.broadcast_to(numpy.asarray(req_profit_rate, dtype=float), (count,))
+    if controlling_incomes is None:
+        controlling_incomes = numpy.full(count, numpy.nan)
+    else:
+        controlling_incomes = numpy.asarray(
+            [numpy.nan if income is None else income for income in controlling_incomes], dtype=float)
+
+    if pv_method == PV_CLOSED_FORM:
+        pv_of_ri = pv_of_ri_closed_form(equities[:, None], excess_profit_rates[:, None],
+                                        req_profit_rates[:, None], factors[None, :], years)
+    else:
+        _check_table_years(pv_method, years)
+
+        """ (종목, 계수, 년도) 초과이익 테이블 """
+        rate = numpy.asarray([round(float(each), 2) for each in req_profit_rates])[:, None]
+        excess_rate = numpy.repeat(excess_profit_rates[:, None], len(factors), axis=1)
+        equity = numpy.repeat(equities[:, None], len(factors), axis=1)
+        excess_profits = numpy.empty((count, len(factors), years))
+
+        for i in range(years):
+            excess_rate = excess_rate * factors
+            roe = round_decimals(rate + excess_rate)
+            controlling_income = round_decimals(equity * roe / 100)
+            excess_profits[:, :, i] = round_decimals(controlling_income - equity * rate / 100)
+            equity = round_decimals(equity + controlling_income)
+
+        """ 미래 잔여이익의 현재가치: 엑셀 NPV 방식 """
+        discounts = (1 + req_profit_rates[:, None, None] / 100) ** numpy.arange(1, years + 1)
+        pv_of_ri = (excess_profits / discounts).sum(axis=2)
+
+    """ 주주가치(분석시점 기준) """
+    equity_std = round_decimals(equities[:, None] + pv_of_ri)
+    current = discount_to_current(equity_std, stock_counts, req_profit_rates, days_elapsed)
+
+    """ PER """
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        per = round_decimals(current['equity_current'] / controlling_incomes[:, None])
+
+    return {'pv_of_ri': pv_of_ri,
+            'equity_std': equity_std,
+            'equity_current': current['equity_current'],
+            'price': current['price'],
+            'per': per}
+
+
+def discount_to_current(equity_std, stock_counts, req_profit_rates, days_elapsed) -> dict:
+    """
+    기준시점 주주가치를 경과일수만큼 할인해서 현재 기준 주주가치와 적정주가를 계산한다.
+    estimate_prices_many의 마지막 단계로, 재무정보가 바뀌지 않고 날짜만 바뀐 경우
+    저장된 기준시점 주주가치로 이 단계만 다시 계산하면 전체 계산 결과와 같다.
+    :param equity_std: array like, (종목수, 계수 개수) 주주가치(분석시점 기준)
+    :param stock_counts: array like, 발행주식수(보통주 + 우선주 - 자기주식)
+    :param req_profit_rates: array like, 종목별 요구 수익률 %
+    :param days_elapsed: array like, 기준시점 - 현재 경과일수
+    :return:
+        dict, 각 값은 (종목수, 계수 개수) 배열
+        {'equity_current': 주주가치(현재 기준), 'price': RIM 적정주가(현재 기준)}
+    """
+    equity_std = numpy.asarray(equity_std, dtype=float)
+    stock_counts = numpy.asarray(stock_counts, dtype=float)
+
+    """ 현재가치 환산 계수: (1 + 요구수익률) ^ (기준시점부터 경과일수 / 365) """
+    current_factors = numpy.asarray([(1 + (float(rate) / 100)) ** (days / 365)
+                                     for rate, days in zip(req_profit_rates, days_elapsed)])[:, None]
+
+    equity_current = round_decimals(equity_std / current_factors)
+
+    """ RIM 적정주가: 기준시점 지배주주지분 * 1억 / 발행주식수 """
+    price_std = numpy.trunc(equity_std * 100000000 / stock_counts[:, None])
+    price = numpy.trunc(price_std / current_factors)
+
+    return {'equity_current': equity_current, 'price': price}
+
+
+def to_price_table(prices: dict, index: int, per_available: bool = True, coefficients: List[dict] = None) -> DataFrame:
+    """
+    estimate_prices_many 계산 결과에서 해당 종목의 적정가격 테이블을 만들어 반환한다.
+    Pricer._estimate_prices 결과와 같은 형태.
+    :param prices: dict, estimate_prices_many 반환값
+    :param index: int, 종목 순번
+    :param per_available: bool, PER 계산 가능 여부. False이면 PER은 None
+    :param coefficients: List[dict], optional, 초과이익 계수. default: COEFFICIENTS
+    :return:
+        DataFrame
+    """
+    if coefficients is None:
+        coefficients = COEFFICIENTS
+
+    per = [float(value) for value in prices['per'][index]] if per_available else [None] * len(coefficients)
+    return DataFrame({"적정주주가치": [int(value) for value in prices['equity_current'][index]],
+                      "적정주가": [int(value) for value in prices['price'][index]],
+                      "PER": per,
+                      "판단": [coefficient['decision'] for coefficient in coefficients]},
+                     index=[coefficient['label'] for coefficient in coefficients])
+
+
+def estimate_price_grid(baselines: List['PriceBaseline'],
+                        req_profit_rates,
+                        roes=None,
+                        coefficients=None,
+                        years: int = ANALYSIS_YEARS,
+                        pv_method: str = PV_TABLE) -> PriceGrid:
+    """
+    종목별 기준 데이터에 요구수익률, 적용 ROE, 초과이익 계수 조합을 적용한 RIM 적정가격을 한번에 계산한다.
+    (종목, 요구수익률, ROE) 조합을 펼쳐서 estimate_prices_many로 계산하므로 각 조합의 결과는
+    해당 요구수익률, ROE로 만든 기준 데이터의 estimate_many 결과와 같다(초과이익률 반올림은 numpy.round).
+    기준시점 지배주주지분, 경과일수 등 ROE 외의 기준 데이터는 종목별로 고정이다.
+
+    :param baselines: List[PriceBaseline], 종목별 기준 데이터(resolve_baseline)
+    :param req_profit_rates: array like, 요구 수익률 % 목록
+    :param roes: array like, optional, 적용 ROE 목록. None 이면 종목별 적용 ROE
+    :param coefficients: array like, optional, 초과이익 계수 목록. default: COEFFICIENTS
+    :param years: int, optional, 분석 년수
+    :param pv_method: str, optional, 잔여이익 현재가치 계산 방식. PV_TABLE(default) or PV_CLOSED_FORM
+    :return:
+        PriceGrid, (종목, 요구수익률, ROE, 초과이익 계수) 배열
+    """
+    if coefficients is None:
+        coefficients = [coefficient['coefficient'] for coefficient in COEFFICIENTS]
+
+    req_grid = numpy.atleast_1d(numpy.asarray(req_profit_rates, dtype=float))
+    coefficients = numpy.atleast_1d(numpy.asarray(coefficients, dtype=float))
+    applied_roes = numpy.asarray([baseline.applied_roe for baseline in baselines], dtype=float)
+
+    if roes is None:
+        roe_grid = applied_roes[:, None, None]
+    else:
+        roes = numpy.atleast_1d(numpy.asarray(roes, dtype=float))
+        roe_grid = roes[None, None, :]
+
+    """ (종목, 요구수익률, ROE) 조합별 기준 데이터 """
+    shape = (len(baselines), len(req_grid), roe_grid.shape[2])
+
+    def spread(values):
+        return numpy.broadcast_to(numpy.asarray(values, dtype=float)[:, None, None], shape).ravel()
+
+    req_rates = numpy.broadcast_to(req_grid[None, :, None], shape).ravel()
+    excess_profit_rates = numpy.round(numpy.broadcast_to(roe_grid, shape).ravel() - req_rates, 2)
+
+    prices = estimate_prices_many(
+        equities=spread([baseline.equity_on_std_date for baseline in baselines]),
+        excess_profit_rates=excess_profit_rates,
+        days_elapsed=spread([baseline.days_elapsed for baseline in baselines]),
+        stock_counts=spread([baseline.stock_cnt for baseline in baselines]),
+        req_profit_rate=req_rates,
+        controlling_incomes=spread([numpy.nan if baseline.controlling_income is None else baseline.controlling_income
+                                    for baseline in baselines]),
+        coefficients=[{'coefficient': coefficient} for coefficient in coefficients],
+        years=years,
+        pv_method=pv_method)
+
+    values = {key: value.reshape(shape + (len(coefficients),)) for key, value in prices.items()}
+
+    return PriceGrid(stock_codes=[baseline.stock_code for baseline in baselines],
+                     req_profit_rates=req_grid,
+                     roes=roes,
+                     coefficients=coefficients,
+                     applied_roes=applied_roes,
+                     values=values)
+
+
+class PriceBaseline:
+    """
+    RIM 적정가격 계산을 위한 종목별 기준 데이터
+    """
+    def __init__(self,
+                 stock_code: str,
+                 applied_roe: float,
+                 roe_criteria: str,
+                 fiscal_quarter: str,
+                 req_profit_rate: float,
+                 equity_on_std_date: float,
+                 days_elapsed: int,
+                 stock_cnt: int,
+                 controlling_income: float = None,
+                 std_date: str = None):
+
+        self.stock_code = stock_code
+        self.applied_roe = applied_roe                  # 적용 ROE
+        self.roe_criteria = roe_criteria                # ROE 산출방법
+        self.fiscal_quarter = fiscal_quarter            # 최근분기
+        self.req_profit_rate = req_profit_rate          # 요구수익률
+        self.equity_on_std_date = equity_on_std_date    # 기준시점 주주지분
+        self.days_elapsed = days_elapsed                # 기준시점 - 현재
+        self.stock_cnt = stock_cnt                      # 보통주 + 우선주 - 자기주식
+        self.controlling_income = controlling_income    # PER 계산용 지배주주순이익
+        self.std_date = std_date                        # 분석기준 일자 YYYYMMDD
+
+    @property
+    def excess_profit_rate(self):
+        """ 초과이익률 = 적용 ROE - 요구수익률: Pricer.create_baseline """
+        return round(self.applied_roe - self.req_profit_rate, 2)
 
 
 class Pricer:
@@ -171,12 +541,25 @@ class Pricer:
         self.days_elapsed = None        # 기준시점 - 현재
         self.equity_on_std_date = None  # 기준시점 주주지분
 
-    def estimate(self, ticker: Ticker, req_profit_rate: float = REQ_PROFIT_RATE, crawl=False) -> PriceEstimate or None:
+    def estimate(self,
+                 ticker: Ticker,
+                 req_profit_rate: float = REQ_PROFIT_RATE,
+                 crawl=False,
+                 pv_method: str = PV_TABLE,
+                 years: int = ANALYSIS_YEARS,
+                 statement_dto: FinancialStatementDTO = None,
+                 use_cache: bool = True) -> PriceEstimate or None:
         """
         ROE, 요구수익률을 적용한 RIM 적정가격을 계산해서 반환한다.
+        같은 날 같은 조건으로 계산한 결과가 캐시(price_estimate_cache)에 있으면 재무정보를 읽지 않고 반환한다.
         :param ticker: Ticker, 종목 티커
         :param req_profit_rate: float, 요구 수익률 %
         :param crawl, Bool, 재무정보가 DB에 없을 경우 크롤링 여부
+        :param pv_method: str, 잔여이익 현재가치 계산 방식. PV_TABLE(default) or PV_CLOSED_FORM
+        :param years: int, 분석 년수. PV_CLOSED_FORM 에서 None 이면 무한 기간
+        :param statement_dto: FinancialStatementDTO, optional, 미리 읽은 재무정보. 전달되면 DB 조회 생략
+            캐시된 결과는 재무정보 내용(dto_digest)이 같은 경우만 사용
+        :param use_cache: bool, 캐시 사용 여부
         :return:
             DataFrame looks like:
             ---------------------------------------------------
@@ -186,7 +569,164 @@ class Pricer:
             10%씩 감소    3510497       51680    16.32    적정가격
             20%씩 감소    3264351       48056    15.18    매수가격
         """
+        cache_key = self._cache_key(ticker.code, req_profit_rate, pv_method, years)
+        dto_hash = dto_digest(statement_dto) if statement_dto is not None else None
+        if use_cache:
+            cached = price_estimate_cache.get(cache_key, dto_hash)
+            if cached is not None:
+                return cached
+
+        baseline = self.resolve_baseline(ticker, req_profit_rate, crawl, statement_dto)
+        if baseline is None:
+            return None
+
+        try:
+            df_result = self._estimate_prices(self.create_baseline(baseline.applied_roe), pv_method, years)
+        except PricerError as err:
+            logger.error(str(err))
+            return None
+
+        price_estimate = PriceEstimate(ticker.code,
+                                       df_result,
+                                       baseline.applied_roe,
+                                       baseline.roe_criteria,
+                                       baseline.fiscal_quarter,
+                                       req_profit_rate)
+
+        if use_cache:
+            price_estimate_cache.put(cache_key, price_estimate, dto_hash if dto_hash is not None else dto_digest(self.dto))
+
+        return price_estimate
+
+        # print(tabulate(df_result, headers="keys", tablefmt="psql", numalign="right"))
+
+    def find_cached_estimate(self,
+                             stock_code: str,
+                             req_profit_rate: float = REQ_PROFIT_RATE,
+                             pv_method: str = PV_TABLE,
+                             years: int = ANALYSIS_YEARS) -> PriceEstimate or None:
+        """
+        오늘 같은 조건으로 계산해서 캐시된 적정가격을 반환한다. 재무정보를 읽지 않는다.
+        :return:
+            PriceEstimate, 없으면 None
+        """
+        return price_estimate_cache.get(self._cache_key(stock_code, req_profit_rate, pv_method, years))
+
+    def _cache_key(self, stock_code: str, req_profit_rate: float, pv_method: str, years: int):
+        """ 캐시 키: 종목코드, 최근분기, 요구수익률, 계산조건(ROE 추정조건, 잔여이익 현재가치 계산 방식, 분석 년수), 오늘 """
+        return price_estimate_cache.make_key(stock_code,
+                                             f'{self.quarter_fiscal_year}/{self.quarter_fiscal_month:02d}',
+                                             req_profit_rate,
+                                             f'가중평균/{pv_method}/{years}')
+
+    def estimate_many(self,
+                      baselines: List[PriceBaseline],
+                      pv_method: str = PV_TABLE,
+                      years: int = ANALYSIS_YEARS) -> List[PriceEstimate]:
+        """
+        여러 종목의 RIM 적정가격을 한번에 계산해서 반환한다.
+        종목별 기준 데이터(resolve_baseline)를 배열로 모아 estimate_prices_many로 일괄 계산하며
+        결과는 종목별 estimate와 동일하다.
+        :param baselines: List[PriceBaseline], 동일한 요구수익률로 만든 종목별 기준 데이터
+        :param pv_method: str, 잔여이익 현재가치 계산 방식. PV_TABLE(default) or PV_CLOSED_FORM
+        :param years: int, 분석 년수. PV_CLOSED_FORM 에서 None 이면 무한 기간
+        :return:
+            List[PriceEstimate], baselines 순서와 동일
+        """
+        if len(baselines) == 0:
+            return []
+
+        req_profit_rate = baselines[0].req_profit_rate
+        if any(baseline.req_profit_rate != req_profit_rate for baseline in baselines):
+            raise ValueError('All baselines must share the same required profit rate.')
+
+        prices = estimate_prices_many(
+            equities=[baseline.equity_on_std_date for baseline in baselines],
+            excess_profit_rates=[baseline.excess_profit_rate for baseline in baselines],
+            days_elapsed=[baseline.days_elapsed for baseline in baselines],
+            stock_counts=[baseline.stock_cnt for baseline in baselines],
+            req_profit_rate=req_profit_rate,
+            controlling_incomes=[baseline.controlling_income for baseline in baselines],
+            years=years,
+            pv_method=pv_method)
+
+        estimates = []
+        for i, baseline in enumerate(baselines):
+            price_estimate = PriceEstimate(baseline.stock_code,
+                                           to_price_table(prices, i, per_available=baseline.controlling_income is not None),
+                                           baseline.applied_roe,
+                                           baseline.roe_criteria,
+                                           baseline.fiscal_quarter,
+                                           req_profit_rate)
+            price_estimate.set_discount_base(equity_std=[float(value) for value in prices['equity_std'][i]],
+                                             stock_cnt=baseline.stock_cnt,
+                                             std_date=baseline.std_date)
+            estimates.append(price_estimate)
+
+        return estimates
+
+    def estimate_grid(self,
+                      tickers: Ticker or List[Ticker],
+                      req_profit_rates=None,
+                      roes=None,
+                      coefficients=None,
+                      crawl=False,
+                      pv_method: str = PV_TABLE,
+                      years: int = ANALYSIS_YEARS) -> PriceGrid or None:
+        """
+        요구수익률, 적용 ROE, 초과이익 계수 범위에 대한 RIM 적정가격 배열을 계산한다.
+        재무정보는 종목별로 한번만 읽고 모든 조합은 estimate_price_grid에서 일괄 계산한다.
+
+            grid = pricer.estimate_grid(ticker, req_profit_rates=numpy.arange(7.0, 9.05, 0.1).round(2))
+            grid.sel(ticker.code)   # (요구수익률, 1, 초과이익 계수) 적정주가
+
+        :param tickers: Ticker or List[Ticker], 종목 티커
+        :param req_profit_rates: array like, 요구 수익률 % 목록. default: [REQ_PROFIT_RATE]
+        :param roes: array like, 적용 ROE 목록. None 이면 종목별 적용 ROE
+        :param coefficients: array like, 초과이익 계수 목록. default: COEFFICIENTS
+        :param crawl, Bool, 재무정보가 DB에 없을 경우 크롤링 여부
+        :param pv_method: str, 잔여이익 현재가치 계산 방식. PV_TABLE(default) or PV_CLOSED_FORM
+        :param years: int, 분석 년수. PV_CLOSED_FORM 에서 None 이면 무한 기간
+        :return:
+            PriceGrid, 기준 데이터를 만들지 못한 종목은 제외. 모두 실패하면 None
+        """
+        if isinstance(tickers, Ticker):
+            tickers = [tickers]
+
+        if req_profit_rates is None:
+            req_profit_rates = [REQ_PROFIT_RATE]
+
+        dto_dict = self.db_helper.get_fn_statement_dtos([ticker.code for ticker in tickers])
+
+        baselines = []
+        for ticker in tickers:
+            baseline = self.resolve_baseline(ticker, crawl=crawl, statement_dto=dto_dict.get(ticker.code))
+            if baseline is None:
+                logger.error(f'RIM 기준 데이터 생성 실패: {ticker.code}')
+                continue
+
+            baselines.append(baseline)
 
+        if len(baselines) == 0:
+            return None
+
+        return estimate_price_grid(baselines, req_profit_rates, roes, coefficients, years, pv_method)
+
+    def resolve_baseline(self,
+                         ticker: Ticker,
+                         req_profit_rate: float = REQ_PROFIT_RATE,
+                         crawl=False,
+                         statement_dto: FinancialStatementDTO = None) -> PriceBaseline or None:
+        """
+        재무정보를 읽어 적용 ROE, 분석기준 시점, 기준시점 지배주주지분 등 RIM 적정가격 계산에 필요한 기준 데이터를 만든다.
+        :param ticker: Ticker, 종목 티커
+        :param req_profit_rate: float, 요구 수익률 %
+        :param crawl, Bool, 재무정보가 DB에 없을 경우 크롤링 여부
+        :param statement_dto: FinancialStatementDTO, optional, 미리 읽은 재무정보(DBHelper.get_fn_statement_dtos).
+            전달되면 DB 조회 생략
+        :return:
+            PriceBaseline, 재무정보가 없거나 분석에 실패하면 None
+        """
         logger.info(f"S-RIM Pricer starts: {ticker.name}({ticker.code}), "
                     f"recent fiscal quarter: {self.quarter_fiscal_year}/{self.quarter_fiscal_month},"
                     f"required profit rate: {req_profit_rate}")
@@ -195,7 +735,7 @@ class Pricer:
         self.req_profit_rate = req_profit_rate
 
         try:
-            self.dto = self.db_helper.get_fn_statement_dto(ticker.code)
+            self.dto = statement_dto if statement_dto is not None else self.db_helper.get_fn_statement_dto(ticker.code)
         except NoDataFoundError as err:
             if not crawl:
                 logger.info(f"Financial data not found in DB, return None")
@@ -217,33 +757,35 @@ class Pricer:
                 logger.debug(tabulate(self.fact_table, headers="keys", tablefmt="psql", numalign="right"))
 
             self.resolve_time_factor(applied_roe)
-            baseline = self.create_baseline(applied_roe)
-
-            df_result = self._estimate_prices(baseline)
+            if not numpy.isscalar(self.equity_on_std_date):
+                raise PricerError('기준시점 지배주주지분 중복: ', stock_code=ticker.code)
         except PricerError as err:
             logger.error(str(err))
             return None
 
-        price_estimate = PriceEstimate(ticker.code,
-                                       df_result,
-                                       applied_roe,
-                                       roe_criteria,
-                                       quarter_roe_df.columns[0],
-                                       req_profit_rate)
-
-        return price_estimate
-
-        # print(tabulate(df_result, headers="keys", tablefmt="psql", numalign="right"))
+        summary = self.dto.stock_summary
+        baseline = PriceBaseline(stock_code=ticker.code,
+                                 applied_roe=applied_roe,
+                                 roe_criteria=roe_criteria,
+                                 fiscal_quarter=quarter_roe_df.columns[0],
+                                 req_profit_rate=req_profit_rate,
+                                 equity_on_std_date=self.equity_on_std_date,
+                                 days_elapsed=self.days_elapsed,
+                                 stock_cnt=summary.common_stock_cnt + summary.pref_stock_cnt - summary.treasury_stock_cnt,
+                                 controlling_income=self._find_controlling_income(),
+                                 std_date=self.std_date.strftime('%Y%m%d'))
+
+        return baseline
 
     def _prepare_fn_statement(self, stock_code):
         snapshot_file = FnGuideSnapshotScraper.scrape(stock_code)
         statement_file = FnGuideStatementScraper.scrape(stock_code)
         snapshot_parser = FnSnapshotParser()
         statement_parser = FnStatementParser()
-        dto = snapshot_parser.parse(stock_code)
+        dto = snapshot_parser.parse(stock_code, file=str(snapshot_file))
 
         try:
-            stmt = statement_parser.parse(stock_code)
+            stmt = statement_parser.parse(stock_code, file=str(statement_file))
             dto.annual_statements = stmt.annual_statements
             dto.quarter_statements = stmt.quarter_statements
 
@@ -258,38 +800,49 @@ class Pricer:
                 statement_dao.update(dto.annual_statements)
                 statement_dao.update(dto.quarter_statements)
 
+            """ 저장한 재무정보로 다시 계산하도록 캐시 삭제 """
+            price_estimate_cache.invalidate([stock_code])
+
         except StatementParseError as err:
             logger.error(err)
 
         return dto
 
-    def _estimate_prices(self, baseline: DataFrame) -> DataFrame:
+    def _estimate_prices(self, baseline: DataFrame, pv_method: str = PV_TABLE, years: int = ANALYSIS_YEARS) -> DataFrame:
         """
         초과이익 계수를 적용하여 매수, 매도, 적정주가를 계산한다.
+        초과이익 계수별 계산은 estimate_prices_many로 한번에 처리한다.
         :param baseline: 분석 시작년도 DataFrame(요구수익률, 초과이익률, ROE, 지배주주순익, 지배주주지분,..)
+        :param pv_method: str, 잔여이익 현재가치 계산 방식. PV_TABLE(default) or PV_CLOSED_FORM
+        :param years: int, 분석 년수. PV_CLOSED_FORM 에서 None 이면 무한 기간
         :return:
             DataFrame
         """
-        df_result = DataFrame()
-
-        for coefficient in COEFFICIENTS:
-            table = self.apply_coefficient(baseline, coefficient['coefficient'])
-            pv_of_ri = self.calc_pv_of_ri(table)
-            equity_current, equity_std = self.calc_equity(pv_of_ri, table)
-            affordable_price = self.calc_price(equity_std)
-            per = self.calc_per(equity_current)
+        if pv_method != PV_CLOSED_FORM:
+            _check_table_years(pv_method, years)
 
+        std_values = baseline.iloc[:, 0]
+        summary = self.dto.stock_summary
+        controlling_income = self._find_controlling_income()
+
+        prices = estimate_prices_many(
+            equities=[std_values["지배주주지분"]],
+            excess_profit_rates=[std_values["초과이익률"]],
+            days_elapsed=[self.days_elapsed],
+            stock_counts=[summary.common_stock_cnt + summary.pref_stock_cnt - summary.treasury_stock_cnt],
+            req_profit_rate=self.req_profit_rate,
+            controlling_incomes=[controlling_income],
+            years=years,
+            pv_method=pv_method)
+
+        for coefficient, pv_of_ri in zip(COEFFICIENTS, prices['pv_of_ri'][0]):
             logger.debug(f"초과이익 계수: {coefficient.get('coefficient')}, PV of RI: {pv_of_ri}")
 
-            if logger.isEnabledFor(logging.DEBUG):
-                print(tabulate(table, headers="keys", tablefmt="psql", floatfmt=".2f"))
-
-            df = DataFrame({"적정주주가치": [int(equity_current)], "적정주가": [affordable_price], "PER": [per]})
-            df.index = [coefficient['label']]
-            df['판단'] = coefficient['decision']
+            if not math.isfinite(pv_of_ri):
+                raise PricerError(f"잔여이익 현재가치 발산, 초과이익 계수: {coefficient['coefficient']}",
+                                  stock_code=self.ticker.code)
 
-            df_result = df_result.append(df)
-        return df_result
+        return to_price_table(prices, 0, per_available=controlling_income is not None)
 
     def _resolve_roe(self, quarter_roe_df: DataFrame) -> (float, str):
         """
@@ -348,38 +901,6 @@ class Pricer:
 
         return df
 
-    @staticmethod
-    def apply_coefficient(baseline: DataFrame, coefficient: float):
-        """
-        분석 년수만큼 초과이익 계수를 적용한 계산 결과를 반환한다.
-        :param baseline: DataFrame, 기준시점 자료
-        :param coefficient: 초과이익 계수
-        :return:
-            DataFrame
-        """
-        df = baseline.astype(float)
-
-        for i in range(0, ANALYSIS_YEARS):
-            year = df.columns[i] + 1
-
-            req_profit_rate = df.loc["요구수익률", df.columns[i]]
-            excess_profit_rate = df.loc["초과이익률", df.columns[i]] * coefficient
-            roe = round(req_profit_rate + excess_profit_rate, 2)
-
-            # 지배주주 순이익
-            controlling_income = round(df.loc["지배주주지분", df.columns[i]] * roe / 100, 2)
-
-            # 지배주주 지분
-            controlling_interest = round(df.loc["지배주주지분", df.columns[i]] + controlling_income, 2)
-
-            # 초과이익
-            excess_profit = round(controlling_income - df.loc["지배주주지분", df.columns[i]] * req_profit_rate / 100, 2)
-
-            df[year] = [req_profit_rate, excess_profit_rate, roe, controlling_income, controlling_interest,
-                        excess_profit]
-
-        return df
-
     def resolve_time_factor(self, roe: float):
         """
         분석기준 시점, 종료시점, 기준시점 지배주주지분을 결정한다.
@@ -441,84 +962,14 @@ class Pricer:
 
         return controlling_interest, column_date
 
-    def calc_equity(self, pv_of_ri, table):
-        """
-        현재, 분석시점 기준 주주가치(지배주주지분)를 계산해서 반환한다.
-        :param pv_of_ri: 미래 잔여이익의 현재가치
-        :param table: DataFrame, 분석기간(10년) 초과이익 계수가 적용된 DataFrame
-        :return:
-            현재기준 주주가치, 분석시점 기준 주주가치
-        """
-
-        # 주주가치(분석시점 기준)
-        equity_std = round(table.loc["지배주주지분", table.columns[0]] + pv_of_ri, 2)
-
-        # 주주가치(현재 기준)
-        equity_current = round(self.calc_current_value(equity_std), 2)
-        logger.debug(f"주주가치(분석시점기준): {format_with(equity_std)}, "
-                     f"주주가치(현재기준): {format_with(equity_current)}")
-
-        return equity_current, equity_std
-
-    def calc_current_value(self, price_std):
-        """
-        현재기준 가치 계산
-        기준값 / (1 + 요구수익률) ^ (기준시점부터 경과일수 / 365)
-        :param price_std: 분석 기준시점 RIM 적정 주가
-        :return:
-        """
-        current = price_std / (1 + (self.req_profit_rate / 100)) ** (self.days_elapsed / 365)
-        return current
-
-    def calc_pv_of_ri(self, table):
-        """
-        미래 잔여이익(future RI)의 현재가치(PV)
-        :param table:
-        :return:
-        """
-        excess_profit_list = list(table.loc["초과이익"].fillna(0))
-        pv_of_ri = self.npv_excel(self.req_profit_rate / 100, excess_profit_list[1:])
-        # logger.debug(f"PV of RI: {pv_of_ri}")
-        return pv_of_ri
-
-    @staticmethod
-    def npv_excel(rate, values):
-        """
-        순현재 가치(NPV)를 엑셀 방식으로 계산한다.
-        :param rate:
-        :param values:
-        :return:
-        """
-        values = numpy.asarray(values)
-        return (values / (1 + rate) ** numpy.arange(1, len(values) + 1)).sum(axis=0)
-
-    def calc_price(self, equity_std):
+    def _find_controlling_income(self):
         """
-        RIM 적정주가 계산
-        기준시점 적정주가 = 기준시점 지배주주지분 * 1억 / (보통주 + 우선주 - 자기주식)
-        :param equity_std: 분석시점 기준 주주가치(지배주주지분)
-        :return:
+        PER 계산에 사용할 지배주주순이익을 찾아서 반환한다. 값을 찾을 수 없으면 None
         """
-        # RIM 적정주가(분석시점 기준)
-        summary = self.dto.stock_summary
-        stock_cnt = summary.common_stock_cnt + summary.pref_stock_cnt - summary.treasury_stock_cnt
-        # logger.debug(f"발행주식수: {self.fact.dto.stock_summary.common_stock_cnt}, 자기주식: {}")
-        affordable_price_std = equity_std * 100000000 / stock_cnt
-        affordable_price_std = int(affordable_price_std)
-
-        # RIM 적정주가(현재 기준)
-        affordable_price_current = int(self.calc_current_value(affordable_price_std))
-        logger.debug(f"RIM 적정주가(분석시점기준): {format_with(affordable_price_std)}, "
-                     f"RIM 적정주가(현재기준): {format_with(affordable_price_current)}")
-
-        return affordable_price_current
-
-    def calc_per(self, equity):
-        per = None
         try:
             profit = self.fact_table.loc["지배주주순이익", self.fact_table.columns[4]]
-            per = round(equity / profit, 2)
+            return None if profit is None else float(profit)
         except (TypeError, KeyError, ValueError) as err:
             logger.warning(f"PER 계산 불가: {err}")
 
-        return per
+        return None
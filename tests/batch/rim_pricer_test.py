@@ -0,0 +1,65 @@
+import pytest
+
+from skogkatt.batch.queue_factory import queue_factory
+from skogkatt.batch.rim_pricer import RIMPriceEstimator
+from skogkatt.conf.app_conf import app_config, Config
+from skogkatt.core.ticker import Ticker
+from skogkatt.core.ticker.store import ticker_store
+from skogkatt.screeners.rim.pricer import PriceBaseline, REQ_PROFIT_RATE
+
+app_config.set_mode(Config.TEST)
+
+TICKERS = {code: Ticker(code, f'test-{code}', None, None, None, 'S', None) for code in ['000001', '000002', '000003']}
+
+
+def create_baseline(stock_code: str, equity: float) -> PriceBaseline:
+    return PriceBaseline(stock_code, 10.67, 'analyzed', '2021/03', REQ_PROFIT_RATE, equity, 18, 5969782550, 282941.0)
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    batch = RIMPriceEstimator(chunk_size=2)
+    monkeypatch.setattr(ticker_store, 'find_by_stock_code', lambda stock_code: TICKERS.get(stock_code))
+    monkeypatch.setattr(batch.db_helper, 'get_fn_statement_dtos', lambda stock_codes: {})
+    yield batch
+
+    for stock_code in TICKERS:
+        batch.dao.delete(stock_code)
+    queue_factory.remove_batch_queue(batch.name)
+
+
+def test_resolve_estimates_isolates_failed_ticker(batch, monkeypatch):
+    """ 계산할 수 없는 기준 데이터(NaN)가 있어도 나머지 종목은 계산하고 해당 종목만 실패 처리 """
+    baselines = {'000001': create_baseline('000001', 2657670.0),
+                 '000002': create_baseline('000002', float('nan')),
+                 '000003': create_baseline('000003', 3215190.55)}
+    monkeypatch.setattr(batch.pricer, 'resolve_baseline',
+                        lambda ticker, statement_dto=None: baselines[ticker.code])
+
+    estimates, unresolved = batch.resolve_estimates(list(TICKERS.values()))
+
+    assert [estimate.stock_code for estimate in estimates] == ['000001', '000003']
+    assert [each['code'] for each in unresolved] == ['000002']
+    assert estimates[0].to_dict() == batch.pricer.estimate_many([baselines['000001']])[0].to_dict()
+
+
+def test_estimate_queue_isolates_failed_chunk(batch, monkeypatch):
+    """ 묶음 전체가 실패하면 묶음의 종목을 실패 처리하고 다른 묶음은 저장 """
+    resolve_estimates = batch.resolve_estimates
+
+    def failing_resolve(tickers):
+        if any(ticker.code == '000001' for ticker in tickers):
+            raise RuntimeError('stub')
+        return resolve_estimates(tickers)
+
+    monkeypatch.setattr(batch.pricer, 'resolve_baseline',
+                        lambda ticker, statement_dto=None: create_baseline(ticker.code, 2657670.0))
+    monkeypatch.setattr(batch, 'resolve_estimates', failing_resolve)
+
+    unresolved = batch._estimate_queue(queue_factory.assign_queue(batch.name, list(TICKERS)))
+
+    assert [each['code'] for each in unresolved] == ['000001', '000002']
+    assert [record['stock_code'] for record in batch.dao.find(list(TICKERS))] == ['000003']
+
+    queue = queue_factory.get_queue(batch.name)
+    assert [queue.get().get('stock_code') for count in range(queue.qsize())] == ['000001', '000002']
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+from pandas import DataFrame
+
+from skogkatt.conf.app_conf import app_config, Config
+from skogkatt.core.dao.npy.chart import NumpyDailyChartDAO
+
+app_config.set_mode(Config.TEST)
+
+stock_code = "005930"
+
+
+def create_chart(dates, close=100):
+    return DataFrame({'date': dates, 'ticker': stock_code, 'name': '삼성전자',
+                      'open': close, 'high': close, 'low': close, 'close': close, 'volume': 10})
+
+
+@pytest.fixture
+def dao(tmp_path):
+    return NumpyDailyChartDAO(db_name='daily_chart', path=str(tmp_path))
+
+
+@pytest.fixture
+def mongo_dao(request):
+    from skogkatt.core.dao.mongo.chart import MongoDailyChartDAO
+    chart_dao = MongoDailyChartDAO(db_name='daily_chart_test')
+    stock_codes = [stock_code, '000660']
+
+    def teardown():
+        for code in stock_codes:
+            chart_dao.drop_table(code)
+
+    teardown()
+    request.addfinalizer(teardown)
+    return chart_dao
+
+
+def test_insert_and_find(dao):
+    assert not dao.exists_table(stock_code)
+    assert dao.min_max_dates(stock_code) == (None, None)
+
+    dao.insert(stock_code, create_chart(['20210603', '20210601', '20210602']))
+    assert dao.exists_table(stock_code)
+    assert dao.min_max_dates(stock_code) == ('20210601', '20210603')
+
+    """ 최종일자 이후 자료는 추가, 과거 자료는 합쳐서 다시 저장 """
+    dao.insert(stock_code, create_chart(['20210604', '20210607']))
+    dao.insert(stock_code, create_chart(['20210531', '20210601'], close=200))
+    assert dao.min_max_dates(stock_code) == ('20210531', '20210607')
+    assert dao.count(stock_code) == 6
+
+    records = dao.find(stock_code, '20210601', '20210604')
+    assert [record['date'] for record in records] == ['20210601', '20210602', '20210603', '20210604']
+    assert records[0] == {'date': '20210601', 'ticker': stock_code, 'name': '삼성전자',
+                          'open': 200, 'high': 200, 'low': 200, 'close': 200, 'volume': 10}
+    assert dao.find_one(stock_code, '20210602')['close'] == 100
+    assert dao.find_one(stock_code, '20210605') is None
+
+    arrays = dao.find_arrays(stock_code)
+    assert isinstance(arrays['close'], np.memmap)
+    assert arrays['date'].tolist() == [20210531, 20210601, 20210602, 20210603, 20210604, 20210607]
+
+    """ 다른 DAO(프로세스)에서 저장한 색인 반영 """
+    other = NumpyDailyChartDAO(db_name='daily_chart', path=str(dao._root.parent))
+    assert other.min_max_dates(stock_code) == ('20210531', '20210607')
+
+    dao.drop_table(stock_code)
+    assert not dao.exists_table(stock_code)
+    assert dao.find(stock_code) == []
+
+
+def test_interrupted_append(dao):
+    """ 색인 건수 이후의 자료(추가 도중 중단)는 무시하고 다음 추가시 덮어쓴다 """
+    dao.insert(stock_code, create_chart(['20210601', '20210602']))
+    with open(dao._root.joinpath(stock_code, 'date.bin'), 'ab') as file:
+        file.write(np.array([20210603], dtype=np.int32).tobytes())
+
+    assert dao.count(stock_code) == 2
+    dao.insert(stock_code, create_chart(['20210604']))
+    assert dao.find_arrays(stock_code)['date'].tolist() == [20210601, 20210602, 20210604]
+
+
+def test_min_max_dates_many(dao):
+    dao.insert(stock_code, create_chart(['20210601', '20210602']))
+    dao.insert('000660', create_chart(['20210603']))
+
+    assert dao.min_max_dates_many([stock_code, '000660', '999999']) == {stock_code: ('20210601', '20210602'),
+                                                                         '000660': ('20210603', '20210603')}
+
+
+def test_mongo_min_max_dates_many(mongo_dao):
+    mongo_dao.insert(stock_code, create_chart(['20210601', '20210602']))
+    mongo_dao.insert('000660', create_chart(['20210603']))
+
+    """ insert, drop_table 하면 컬렉션 목록 캐시에 반영 """
+    assert mongo_dao.exists_table(stock_code)
+    assert mongo_dao.min_max_dates_many([stock_code, '000660', '999999']) == {stock_code: ('20210601', '20210602'),
+                                                                               '000660': ('20210603', '20210603')}
+    assert mongo_dao.min_max_dates('000660') == ('20210603', '20210603')
+
+    mongo_dao.drop_table('000660')
+    assert not mongo_dao.exists_table('000660')
+    assert mongo_dao.min_max_dates_many([stock_code, '000660']) == {stock_code: ('20210601', '20210602')}
+
+
+@pytest.mark.parametrize('backend', ['npy', 'mongo'])
+def test_find_many(backend, request):
+    chart_dao = request.getfixturevalue('dao' if backend == 'npy' else 'mongo_dao')
+    chart_dao.insert(stock_code, create_chart(['20210601', '20210602', '20210603']))
+    chart_dao.insert('000660', create_chart(['20210602'], close=200))
+
+    result = chart_dao.find_many(['000660', stock_code, '999999'], '20210602', '20210603', columns=['close'])
+    assert list(result) == ['ticker', 'date', 'close']
+    assert result['ticker'].tolist() == ['000660', stock_code, stock_code]
+    assert result['date'].tolist() == ['20210602', '20210602', '20210603']
+    assert result['close'].tolist() == [200, 100, 100]
+
+    """ 입력 순서와 관계없이 종목코드, 일자순. 중복 종목은 한번만 """
+    result = chart_dao.find_many([stock_code, '999999', '000660', stock_code], columns=['close'])
+    assert result['ticker'].tolist() == ['000660', stock_code, stock_code, stock_code]
+    assert result['date'].tolist() == ['20210602', '20210601', '20210602', '20210603']
+
+    df = chart_dao.find_many([stock_code], as_dataframe=True)
+    assert df.columns.tolist() == ['ticker', 'date'] + chart_dao.CHART_COLUMNS
+    assert df.shape == (3, 7)
+
+    assert len(chart_dao.find_many(['999999'])['date']) == 0
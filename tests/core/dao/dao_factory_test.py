@@ -1,3 +1,5 @@
+import pytest
+
 from skogkatt.core.dao import dao_factory
 from skogkatt.core.dao.idao import TickerDAO
 from skogkatt.core.dao.maria.ticker import MariaTickerDAO
@@ -12,6 +14,51 @@ def test_get_dao():
 
 
 def test_register_dao():
+    ticker_dao = dao_factory.get('TickerDAO')
     dao_factory.register_dao('TickerDAO', MariaTickerDAO())
-    dao = dao_factory.get('TickerDAO')
-    assert (isinstance(dao, MariaTickerDAO))
+    try:
+        dao = dao_factory.get('TickerDAO')
+        assert (isinstance(dao, MariaTickerDAO))
+    finally:
+        dao_factory.register_dao('TickerDAO', ticker_dao)
+
+
+class CountingDAO:
+    created = 0
+
+    def __init__(self, table: str):
+        CountingDAO.created += 1
+        self.table = table
+        self.indexed = False
+
+    def ensure_indexes(self):
+        self.indexed = True
+        return []
+
+
+def test_lazy_get():
+    created = CountingDAO.created
+    dao_factory.configure({'ensure_indexes': True,
+                           'dao_list': {'CountingDAO': {'class': f'{__name__}.CountingDAO', 'table': 'counting'}}})
+
+    """ 설정만 등록하고 get 할 때 만든다 """
+    assert CountingDAO.created == created
+
+    dao = dao_factory.get('CountingDAO')
+    assert dao.table == 'counting'
+    assert dao.indexed is True
+    assert dao_factory.get('CountingDAO') is dao
+    assert CountingDAO.created == created + 1
+
+    with pytest.raises(KeyError):
+        dao_factory.get('UnknownDAO')
+
+
+def test_reset():
+    dao_factory.configure({'dao_list': {'CountingDAO': {'class': f'{__name__}.CountingDAO', 'table': 'counting'}}})
+    dao = dao_factory.get('CountingDAO')
+
+    """ 만든 DAO는 삭제하고 설정은 유지 """
+    dao_factory.reset()
+    assert dao_factory.get('CountingDAO') is not dao
+    assert dao_factory.get('CountingDAO').table == 'counting'
@@ -0,0 +1,109 @@
+import multiprocessing
+import os
+
+import pytest
+
+from skogkatt.conf.app_conf import app_config, Config
+from skogkatt.core.dao import engine, dao_factory
+from skogkatt.core.dao.engine import MongoEngine, mongo_client_registry
+
+app_config.set_mode(Config.TEST)
+
+
+class FakeClient:
+    """ 서버에 연결하지 않는 MongoClient """
+    created = []
+
+    def __init__(self, url, **options):
+        self.url = url
+        self.options = options
+        FakeClient.created.append(self)
+
+    def server_info(self):
+        return {}
+
+    def close(self):
+        pass
+
+    def __getitem__(self, name):
+        return FakeDatabase(self, name)
+
+
+class FakeDatabase(str):
+    """ DB명. 컬렉션은 (클라이언트, DB명, 컬렉션명)으로 반환 """
+
+    def __new__(cls, client, name):
+        database = super().__new__(cls, name)
+        database.client = client
+        return database
+
+    def __getitem__(self, name):
+        return self.client, str(self), name
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(engine.pymongo, 'MongoClient', FakeClient)
+    monkeypatch.setenv('MONGO_URL', 'mongodb://registry-test')
+    FakeClient.created = []
+
+    clients = mongo_client_registry._clients
+    mongo_client_registry._clients = {}
+
+    yield mongo_client_registry
+
+    mongo_client_registry._clients = clients
+
+
+def test_shared_client(registry, monkeypatch):
+    monkeypatch.setenv('MONGO_MAX_POOL_SIZE', '7')
+
+    engines = [MongoEngine('db1'), MongoEngine('db2'), MongoEngine()]
+    assert len(FakeClient.created) == 0
+
+    """ 모든 Engine이 같은 클라이언트 사용, DB는 Engine 별 """
+    assert len({id(each.get_connection()) for each in engines}) == 1
+    assert len(FakeClient.created) == 1
+    assert FakeClient.created[0].options['maxPoolSize'] == 7
+    assert engines[0].get_db() == app_config.get('UNIT_TEST_DB')
+
+    """ URL이 다르면 다른 클라이언트 """
+    assert registry.get_client('mongodb://other') is not engines[0].get_connection()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork is not available')
+def test_client_after_fork(registry):
+    parent = registry.get_client('mongodb://registry-test')
+    context = multiprocessing.get_context('fork')
+    result = context.SimpleQueue()
+
+    def child():
+        client = registry.get_client('mongodb://registry-test')
+        result.put((client is not parent, client is registry.get_client('mongodb://registry-test')))
+
+    process = context.Process(target=child)
+    process.start()
+    process.join()
+
+    assert result.get() == (True, True)
+    assert registry.get_client('mongodb://registry-test') is parent
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork is not available')
+def test_dao_after_fork(registry):
+    """ dao_factory가 캐시한 DAO도 fork된 자식 프로세스에서는 자식의 클라이언트 사용 """
+    dao = dao_factory.get('TickerDAO', ensure_indexes=False)
+    parent = dao._table[0]
+    context = multiprocessing.get_context('fork')
+    result = context.SimpleQueue()
+
+    def child():
+        client, db_name, table_name = dao._table
+        result.put((client is not parent, client is registry.get_client('mongodb://registry-test'), table_name))
+
+    process = context.Process(target=child)
+    process.start()
+    process.join()
+
+    assert result.get() == (True, True, 'ticker')
+    assert dao._table[0] is parent
@@ -0,0 +1,66 @@
+import pymongo
+import pytest
+
+from skogkatt.conf.app_conf import app_config, Config
+
+app_config.set_mode(Config.TEST)
+
+# DAO 키, 조회 조건, 정렬 조건
+HOT_QUERIES = [
+    ('FnStatementDAO', {'$and': [{'stock_code': {'$in': ['005930', '051910']}}, {'report_code': 1},
+                                 {'consensus': 0}, {'fiscal_date': {'$gte': '2018/12'}}]}, None),
+    ('FnStatementDAO', {'stock_code': '005930', 'fiscal_date': '2020/12', 'report_code': 1, 'fs_div': 'CFS'}, None),
+    ('FnStatementAbbrDAO', {'$and': [{'stock_code': {'$in': ['005930']}}, {'report_code': 3},
+                                     {'consensus': 1}]}, None),
+    ('StatementDigestDAO', {'stock_code': '005930', 'source': 'statement'}, None),
+    ('StatementDigestDAO', {'changed': True}, None),
+    ('BatchQueueDAO', {'batch_name': 'rim-price-estimate', 'stock_code': {'$in': ['005930', '051910']}}, None),
+    ('BatchStatusDAO', {}, [('start', pymongo.DESCENDING)]),
+    ('BatchStatusDAO', {'name': 'rim-price-estimate'}, [('start', pymongo.DESCENDING)]),
+    ('FailedTickerDAO', {'job_name': 'fn-statement-convert'}, None),
+    ('RIMPriceEstimateDAO', {'stock_code': {'$in': ['005930', '051910']}}, None),
+    ('FormulaScreenerDAO', {'$and': [{'formula': 'magic'}, {'date': {'$gte': '20210601'}}]}, None),
+]
+
+
+@pytest.fixture(scope="module")
+def factory():
+    from skogkatt.core.dao import dao_factory
+    dao_factory.ensure_indexes()
+    return dao_factory
+
+
+def plan_stages(plan: dict) -> list:
+    """ 실행 계획의 stage 목록 """
+    stages = [plan.get('stage')]
+    for child in [plan.get('inputStage')] + plan.get('inputStages', []):
+        if child is not None:
+            stages.extend(plan_stages(child))
+    return stages
+
+
+def test_ensure_indexes(factory):
+    result = factory.ensure_indexes()
+
+    for key in {each[0] for each in HOT_QUERIES}:
+        dao = factory.get(key)
+        assert len(result[key]) == len(dao.INDEXES)
+
+        index_keys = [list(index['key']) for index in dao._table.index_information().values()]
+        for spec in dao.INDEXES:
+            assert list(spec['keys']) in index_keys
+
+
+@pytest.mark.parametrize('key, query, sort', HOT_QUERIES)
+def test_hot_queries_use_index(factory, key, query, sort):
+    cursor = factory.get(key)._table.find(query)
+    if sort is not None:
+        cursor = cursor.sort(sort)
+
+    if not hasattr(cursor, 'explain'):
+        pytest.skip('explain() is not supported by this MongoDB client')
+
+    stages = plan_stages(cursor.explain()['queryPlanner']['winningPlan'])
+    assert 'IXSCAN' in stages
+    assert 'COLLSCAN' not in stages
+    assert 'SORT' not in stages
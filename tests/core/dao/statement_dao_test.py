@@ -1,8 +1,10 @@
 import pytest
+from pandas import DataFrame
 from tabulate import tabulate
 
 from skogkatt.commons.util.date import get_annual_periods
 from skogkatt.conf.app_conf import app_config, Config
+from skogkatt.core.financial import Statement
 from skogkatt.core.financial.constants import ReportCode
 from skogkatt.crawler.fnguide.index import FN_HIGHLIGHT_ROW_INDEX
 
@@ -93,6 +95,77 @@ def test_find_statement(setup, dao):
         print(tabulate(stmt.to_dataframe(), headers="keys", tablefmt="psql"))
 
 
+def test_find_many_statements(setup, dao):
+    """ 여러 종목 일괄 조회 결과가 종목별 조회 결과와 같은지 확인 """
+    dto, stock_code = setup
+    dao.update(dto.annual_statements)
+
+    statements = dao.find_many([stock_code, '000000'], report_code=ReportCode.annual)
+    assert len(statements['000000']) == 0
+
+    expected = dao.find(stock_code=stock_code, report_code=ReportCode.annual)
+    assert len(expected) == len(statements[stock_code])
+    for stmt, each in zip(expected, statements[stock_code]):
+        assert stmt.to_dataframe().equals(each.to_dataframe())
+
+
+def test_statement_records(setup):
+    """ DB 저장 자료가 DataFrame 변환 결과와 같은지 확인 """
+    dto, stock_code = setup
+    for stmt in dto.annual_statements + dto.quarter_abbreviations:
+        expected = stmt.to_dataframe()
+        assert DataFrame(stmt.to_records(), columns=expected.columns).equals(expected)
+
+
+def test_update_many_statements(setup, dao):
+    """ 여러 종목 일괄 저장 결과가 종목별 저장 결과와 같은지 확인 """
+    dto, stock_code = setup
+    other = [Statement.create(stock_code='000000',
+                              fiscal_date=stmt.fiscal_date,
+                              consensus=stmt.consensus,
+                              report_code=stmt.report_code,
+                              fs_div=stmt.fs_div) for stmt in dto.annual_statements]
+    for stmt, source in zip(other, dto.annual_statements):
+        stmt.facts = source.facts
+
+    dao.update(dto.annual_statements)
+    expected = dao.find(stock_code=stock_code, report_code=ReportCode.annual)
+    row_cnt = dao.count(stock_code=stock_code)
+
+    """ 같은 자료를 다시 저장하면 기존 자료는 삭제 """
+    outcomes = dao.update_many(dto.annual_statements + other, chunk_size=1)
+    assert outcomes[stock_code] == {'inserted': row_cnt, 'errors': []}
+    assert outcomes['000000'] == {'inserted': row_cnt, 'errors': []}
+    assert dao.count(stock_code=stock_code) == row_cnt
+
+    statements = dao.find_many([stock_code, '000000'], report_code=ReportCode.annual)
+    for stmt, each, copied in zip(expected, statements[stock_code], statements['000000']):
+        assert stmt.to_dataframe().equals(each.to_dataframe())
+        assert stmt.to_dataframe().drop(columns='stock_code').equals(copied.to_dataframe().drop(columns='stock_code'))
+
+
+def test_update_many_write_error(setup, dao, monkeypatch):
+    """ 쓰기 오류가 난 자료만 종목별 결과에 기록하고, 같은 묶음의 다른 자료는 저장 """
+    dto, stock_code = setup
+    failing = Statement.create(stock_code='000000',
+                               fiscal_date=dto.annual_statements[0].fiscal_date,
+                               consensus=dto.annual_statements[0].consensus,
+                               report_code=dto.annual_statements[0].report_code,
+                               fs_div=dto.annual_statements[0].fs_div)
+    failing.facts = dto.annual_statements[0].facts
+    records = [dict(record, _id='duplicated') for record in failing.to_records()[:2]]
+    monkeypatch.setattr(failing, 'to_records', lambda: records)
+
+    row_cnt = sum(len(stmt.facts) for stmt in dto.annual_statements)
+    outcomes = dao.update_many(dto.annual_statements + [failing])
+
+    assert outcomes[stock_code] == {'inserted': row_cnt, 'errors': []}
+    assert outcomes['000000']['inserted'] == 1
+    assert len(outcomes['000000']['errors']) == 1
+    assert dao.count(stock_code=stock_code) == row_cnt
+    assert dao.count(stock_code='000000') == 1
+
+
 def test_insert_abbreviations(setup, abbr_dao):
     dto, stock_code = setup
     row_cnt = len(FN_HIGHLIGHT_ROW_INDEX)
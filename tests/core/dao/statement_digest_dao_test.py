@@ -0,0 +1,41 @@
+import pytest
+
+from skogkatt.conf.app_conf import app_config, Config
+from skogkatt.core.financial.digest import statement_digests
+
+app_config.set_mode(Config.TEST)
+
+stock_code = "051910"
+
+
+@pytest.fixture
+def dao(request):
+    from skogkatt.core.dao import dao_factory
+    digest_dao = dao_factory.get('StatementDigestDAO')
+    digest_dao.delete(stock_code)
+
+    def teardown():
+        digest_dao.delete(stock_code)
+
+    request.addfinalizer(teardown)
+    return digest_dao
+
+
+def test_update_and_changed(fn_dto, dao):
+    """ 처음 저장하거나 내용이 바뀐 종목만 변경 표시 """
+    digests = statement_digests(fn_dto.annual_statements + fn_dto.quarter_statements)
+
+    assert dao.update(stock_code, 'statement', digests)
+    assert stock_code in dao.find_changed()
+
+    dao.clear_changed([stock_code])
+    assert stock_code not in dao.find_changed()
+
+    assert not dao.update(stock_code, 'statement', digests)
+    assert stock_code not in dao.find_changed()
+
+    key = next(iter(digests))
+    digests[key] = 'changed'
+    assert dao.update(stock_code, 'statement', digests)
+    assert stock_code in dao.find_changed()
+    assert len(dao.find(stock_code, 'statement')) == len(digests)
@@ -1,6 +1,7 @@
 import pytest
 
 from skogkatt.conf.app_conf import app_config, Config
+from skogkatt.core.financial import StockSummary
 from skogkatt.tests.fnguide.sample_html_generator import load_html
 
 app_config.set_mode(Config.TEST)
@@ -43,6 +44,24 @@ def test_update(setup, dao):
     assert (1, len(summary))
     assert (stock_code, summary[0].stock_code)
 
+
+def test_update_many(setup, dao):
+    """ 여러 종목을 한번에 저장. 이미 있는 종목은 갱신 """
+    dto = setup
+    other = StockSummary('000000')
+    other.common_stock_cnt = 100
+    dao.delete('000000')
+
+    try:
+        dao.update(dto.stock_summary)
+        assert dao.update_many([dto.stock_summary, other]) == 1
+        other.common_stock_cnt = 200
+        assert dao.update_many([dto.stock_summary, other]) == 0
+        assert dao.find_one('000000').common_stock_cnt == 200
+        assert dao.update_many([]) == 0
+    finally:
+        dao.delete('000000')
+
     # def test_update(self):
     #     self.dao.update_summary(self.dto.stock_summary)
     #     self.dao.update_summary(self.dto.stock_summary)
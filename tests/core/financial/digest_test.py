@@ -0,0 +1,62 @@
+import pytest
+
+from skogkatt.conf.app_conf import app_config, Config, get_project_path
+from skogkatt.core.financial import StockSummary
+from skogkatt.core.financial.digest import dto_digest, statement_digests, summary_digest
+
+app_config.set_mode(Config.TEST)
+stock_code = "005930"
+
+
+@pytest.fixture(scope="module")
+def fn_dto():
+    from skogkatt.crawler.fnguide.parser import FnStatementParser
+
+    statement_html = get_project_path().joinpath(f'tests/fnguide/fixture/fn_statement_{stock_code}.html')
+    yield FnStatementParser().parse(stock_code, statement_html)
+
+
+def test_dto_digest(fn_dto):
+    digest = dto_digest(fn_dto)
+    assert digest == dto_digest(fn_dto)
+
+    fact = fn_dto.quarter_statements[-1].facts[0]
+    value = fact.value
+    try:
+        fact.value = 12345.0
+        assert digest != dto_digest(fn_dto)
+    finally:
+        fact.value = value
+
+
+def test_statement_digests(fn_dto):
+    statements = fn_dto.annual_statements + fn_dto.quarter_statements
+    digests = statement_digests(statements)
+    assert len(digests) == len({(stmt.fiscal_date, stmt.report_code) for stmt in statements})
+    assert digests == statement_digests(list(reversed(statements)))
+
+    """ 값이 바뀐 재무제표의 해시만 바뀐다 """
+    stmt = fn_dto.quarter_statements[-1]
+    fact = stmt.facts[0]
+    value = fact.value
+    try:
+        fact.value = 12345.0
+        changed = statement_digests(statements)
+    finally:
+        fact.value = value
+
+    assert [key for key in digests if digests[key] != changed[key]] == [(stmt.fiscal_date, stmt.report_code)]
+
+
+def test_summary_digest():
+    summary = StockSummary(stock_code)
+    summary.reference_date = '2021/06/18'
+    summary.common_stock_cnt = 5969782550
+    digest = summary_digest(summary)
+
+    """ 기준일자만 바뀌면 같은 해시 """
+    summary.reference_date = '2021/06/19'
+    assert digest == summary_digest(summary)
+
+    summary.treasury_stock_cnt = 100
+    assert digest != summary_digest(summary)
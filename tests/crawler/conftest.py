@@ -0,0 +1,9 @@
+import pytest
+
+from skogkatt.tests.fnguide.stub_server import FnGuideStubServer
+
+
+@pytest.fixture
+def stub_server():
+    with FnGuideStubServer() as server:
+        yield server
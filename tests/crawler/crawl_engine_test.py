@@ -0,0 +1,178 @@
+import threading
+import time
+
+import pytest
+from requests import HTTPError
+
+from skogkatt.batch import batch_lookup
+from skogkatt.batch.queue_factory import queue_factory
+from skogkatt.commons.http.throttle import Throttle, TokenBucket
+from skogkatt.conf.app_conf import app_config, Config
+from skogkatt.conf.crawl_conf import FNGUIDE_SNAPSHOT_FILE_PREFIX
+from skogkatt.core.dao import dao_factory
+from skogkatt.crawler.engine import CrawlEngine
+from skogkatt.crawler.fnguide.converter import resolve_convert_queue
+from skogkatt.crawler.fnguide.scraper import batch_crawl
+from skogkatt.crawler.fnguide.url_builder import FnSnapshotUrlBuilder
+
+app_config.set_mode(Config.TEST)
+
+TEST_STOCK_CODES = ['005930', '051910', '000060', '003540', '153360', '194700']
+SNAPSHOT_BATCH = batch_lookup.FN_GUIDE_SNAPSHOT['name']
+
+
+@pytest.fixture
+def fetch_meta_dao():
+    dao = dao_factory.get('FetchMetaDAO')
+    dao.delete(SNAPSHOT_BATCH)
+    queue_factory.remove_batch_queue(batch_lookup.FN_SNAPSHOT_CONVERT['name'])
+    yield dao
+    dao.delete(SNAPSHOT_BATCH)
+    queue_factory.remove_batch_queue(batch_lookup.FN_SNAPSHOT_CONVERT['name'])
+
+
+def crawl_snapshot(stub_server, file_path):
+    url_builder = FnSnapshotUrlBuilder()
+    url_builder._url = f'{stub_server.url}/SVO2/ASP/SVD_Main.asp'
+
+    return batch_crawl(batch_name=SNAPSHOT_BATCH,
+                       file_path=str(file_path),
+                       file_name_prefix=FNGUIDE_SNAPSHOT_FILE_PREFIX,
+                       url_builder=url_builder,
+                       queue=queue_factory.assign_queue(SNAPSHOT_BATCH, TEST_STOCK_CODES),
+                       workers=4,
+                       throttle=Throttle(rate=50, burst=4),
+                       proxies=None)
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    waits = [bucket.acquire() for count in range(6)]
+
+    """ 2건은 바로, 나머지 4건은 0.05초 간격 """
+    assert waits[:2] == [0, 0]
+    assert time.monotonic() - start >= 0.19
+
+
+def test_throttle_host_concurrency(stub_server):
+    stub_server.latency = 0.1
+    throttle = Throttle(host_policies={'127.0.0.1': {'concurrency': 2}})
+    engine = CrawlEngine(workers=6, throttle=throttle)
+
+    url = f'{stub_server.url}/SVO2/ASP/SVD_Main.asp'
+    done = engine.run(TEST_STOCK_CODES, lambda stock_code: engine.get(url, {'gicode': f'A{stock_code}'}))
+
+    assert done == len(TEST_STOCK_CODES)
+    assert stub_server.max_in_flight == 2
+
+
+def test_ip_renew_waits_for_in_flight(stub_server):
+    stub_server.latency = 0.05
+    renewed = []
+
+    def renew():
+        renewed.append(stub_server.in_flight)
+
+    engine = CrawlEngine(workers=4, ip_renew_interval=0.1, renew=renew)
+    url = f'{stub_server.url}/SVO2/ASP/SVD_Main.asp'
+    engine.run(TEST_STOCK_CODES * 4, lambda stock_code: engine.get(url, {'gicode': f'A{stock_code}'}))
+
+    """ 진행 중인 요청이 없을 때만 IP 갱신 """
+    assert len(renewed) > 0
+    assert set(renewed) == {0}
+
+
+def test_fatal_error_stops_crawl():
+    started = []
+    lock = threading.Lock()
+
+    def task(item):
+        with lock:
+            started.append(item)
+        if item == 0:
+            raise ConnectionError('stub')
+        time.sleep(0.01)
+
+    engine = CrawlEngine(workers=2, fatal_errors=(ConnectionError,))
+    with pytest.raises(ConnectionError):
+        engine.run(range(100), task)
+
+    assert len(started) < 100
+
+
+def test_batch_crawl(stub_server, tmp_path, fetch_meta_dao):
+    remained = crawl_snapshot(stub_server, tmp_path)
+
+    """ 응답을 저장한 종목은 DB 큐에서 삭제 """
+    assert remained == 0
+    for stock_code in TEST_STOCK_CODES:
+        assert tmp_path.joinpath(f'{FNGUIDE_SNAPSHOT_FILE_PREFIX}{stock_code}.html').exists()
+    assert queue_factory.get_queue(SNAPSHOT_BATCH).empty()
+    assert len(stub_server.requests) == len(TEST_STOCK_CODES)
+
+    """ 처음 수집한 종목은 모두 변환 대상 """
+    assert fetch_meta_dao.find_changed(SNAPSHOT_BATCH) == sorted(TEST_STOCK_CODES)
+
+
+def test_batch_crawl_skips_unchanged(stub_server, tmp_path, fetch_meta_dao):
+    crawl_snapshot(stub_server, tmp_path)
+    fetch_meta_dao.clear_changed(SNAPSHOT_BATCH, TEST_STOCK_CODES)
+
+    saved_file = tmp_path.joinpath(f'{FNGUIDE_SNAPSHOT_FILE_PREFIX}051910.html')
+    saved_file.write_text('saved')
+
+    """ 표 밖의 내용만 바뀐 종목은 저장하지 않고, 표 내용이 바뀐 종목만 저장 후 변환 대상으로 표시 """
+    respond = stub_server.respond
+
+    def changed_respond(handler):
+        status, body = respond(handler)
+        if 'A005930' in handler.path:
+            body = body.replace(b'</table>', b'<tr><td>1</td></tr></table>', 1)
+        return status, body.replace(b'</body>', b'<script>var t = 1;</script></body>')
+
+    stub_server.respond = changed_respond
+    assert crawl_snapshot(stub_server, tmp_path) == 0
+
+    assert saved_file.read_text() == 'saved'
+    assert fetch_meta_dao.find_changed(SNAPSHOT_BATCH) == ['005930']
+
+    queue = resolve_convert_queue(batch_lookup.FN_SNAPSHOT_CONVERT['name'], SNAPSHOT_BATCH)
+    assert [queue.get().get('stock_code') for count in range(queue.qsize())] == ['005930']
+
+
+def test_batch_crawl_error_status(stub_server, tmp_path, fetch_meta_dao):
+    """ 오류 응답은 페이지로 저장하지 않고 수집을 중단한다. 해당 종목은 큐에 남는다 """
+    respond = stub_server.respond
+
+    def error_respond(handler):
+        if 'A005930' in handler.path:
+            return 503, b'<html><body><table><tr><td>busy</td></tr></table></body></html>'
+        return respond(handler)
+
+    stub_server.respond = error_respond
+    with pytest.raises(HTTPError):
+        crawl_snapshot(stub_server, tmp_path)
+
+    assert not tmp_path.joinpath(f'{FNGUIDE_SNAPSHOT_FILE_PREFIX}005930.html').exists()
+    assert '005930' not in fetch_meta_dao.find(SNAPSHOT_BATCH)
+    queue = queue_factory.get_queue(SNAPSHOT_BATCH)
+    assert '005930' in [queue.get().get('stock_code') for count in range(queue.qsize())]
+
+
+def test_batch_crawl_not_modified(stub_server, tmp_path, fetch_meta_dao):
+    stub_server.etag = True
+    crawl_snapshot(stub_server, tmp_path)
+    fetch_meta_dao.clear_changed(SNAPSHOT_BATCH, TEST_STOCK_CODES)
+
+    """ ETag가 같으면 304 응답, 파일이 없는 종목은 조건부 요청 없이 다시 받아서 저장 """
+    missing_file = tmp_path.joinpath(f'{FNGUIDE_SNAPSHOT_FILE_PREFIX}000060.html')
+    missing_file.unlink()
+
+    assert crawl_snapshot(stub_server, tmp_path) == 0
+    assert missing_file.exists()
+    assert fetch_meta_dao.find_changed(SNAPSHOT_BATCH) == []
+    assert all(meta['etag'] is not None for meta in fetch_meta_dao.find(SNAPSHOT_BATCH).values())
+
+    queue = resolve_convert_queue(batch_lookup.FN_SNAPSHOT_CONVERT['name'], SNAPSHOT_BATCH)
+    assert queue.empty()
@@ -0,0 +1,93 @@
+import gzip
+
+import pytest
+
+from skogkatt.batch import batch_lookup
+from skogkatt.batch.queue_factory import queue_factory
+from skogkatt.commons.http.throttle import Throttle
+from skogkatt.conf.app_conf import app_config, Config
+from skogkatt.conf.crawl_conf import FNGUIDE_SNAPSHOT_FILE_PREFIX
+from skogkatt.core.dao import dao_factory
+from skogkatt.crawler.archive import HtmlArchive, quarter_of
+from skogkatt.crawler.fnguide.parser import FnSnapshotParser
+from skogkatt.crawler.fnguide.scraper import batch_crawl
+from skogkatt.crawler.fnguide.url_builder import FnSnapshotUrlBuilder
+from skogkatt.tests.fnguide.sample_html_generator import load_html
+
+app_config.set_mode(Config.TEST)
+
+TEST_STOCK_CODES = ['005930', '051910']
+SNAPSHOT_BATCH = batch_lookup.FN_GUIDE_SNAPSHOT['name']
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return HtmlArchive(str(tmp_path.joinpath('archive')), codec='gzip')
+
+
+def test_put_and_get(archive):
+    assert archive.get('005930') is None
+    assert archive.quarters() == []
+
+    digest = archive.put('005930', b'<html>2021Q1</html>', quarter='2021Q1')
+    archive.put('005930', b'<html>2021Q2</html>', quarter='2021Q2')
+    archive.put('051910', b'<html>2021Q1</html>', quarter='2021Q2')
+
+    """ 같은 내용은 한번만 저장 """
+    assert len(list(archive.root.joinpath('objects').rglob('*.gz'))) == 2
+    assert gzip.decompress(archive.root.joinpath('objects', digest[:2], f'{digest}.html.gz').read_bytes()) \
+        == b'<html>2021Q1</html>'
+
+    assert archive.quarters() == ['2021Q1', '2021Q2']
+    assert archive.get('005930') == b'<html>2021Q2</html>'
+    assert archive.get('005930', quarter='2021Q1') == b'<html>2021Q1</html>'
+    assert archive.get('051910', quarter='2021Q1') is None
+
+    """ 다른 저장소(프로세스)에서 추가한 색인 반영 """
+    other = HtmlArchive(str(archive.root), codec='gzip')
+    assert other.find('051910')['digest'] == digest
+
+
+def test_retain(archive):
+    archive.put('005930', b'<html>2021Q1</html>', quarter='2021Q1')
+
+    """ 바뀌지 않은 종목은 가장 최근 자료를 분기 색인에 추가 """
+    assert archive.retain('005930', quarter='2021Q2')
+    assert not archive.retain('005930', quarter='2021Q2')
+    assert not archive.retain('051910', quarter='2021Q2')
+    assert archive.index('2021Q2')['005930']['digest'] == archive.index('2021Q1')['005930']['digest']
+
+
+def test_batch_crawl_to_archive(stub_server, tmp_path, archive):
+    fetch_meta_dao = dao_factory.get('FetchMetaDAO')
+    fetch_meta_dao.delete(SNAPSHOT_BATCH)
+
+    url_builder = FnSnapshotUrlBuilder()
+    url_builder._url = f'{stub_server.url}/SVO2/ASP/SVD_Main.asp'
+
+    remained = batch_crawl(batch_name=SNAPSHOT_BATCH,
+                           file_path=str(tmp_path),
+                           file_name_prefix=FNGUIDE_SNAPSHOT_FILE_PREFIX,
+                           url_builder=url_builder,
+                           queue=queue_factory.assign_queue(SNAPSHOT_BATCH, TEST_STOCK_CODES),
+                           throttle=Throttle(rate=50, burst=4),
+                           proxies=None,
+                           archive=archive)
+    fetch_meta_dao.delete(SNAPSHOT_BATCH)
+
+    """ 응답 원본을 이번 분기 색인에 저장하고 html 파일은 만들지 않는다 """
+    assert remained == 0
+    assert list(tmp_path.glob('*.html')) == []
+    assert sorted(archive.index(quarter_of())) == sorted(TEST_STOCK_CODES)
+    with open(load_html('005930', file_type='snapshot'), 'rb') as file:
+        assert archive.get('005930') == file.read()
+
+    """ 파서는 저장소에서 바로 읽는다 """
+    parser = FnSnapshotParser(archive)
+    archived = parser.parse('005930')
+    parsed = FnSnapshotParser(archive).parse('005930', file=load_html('005930', file_type='snapshot'))
+    assert archived.stock_summary.to_dict() == parsed.stock_summary.to_dict()
+    assert len(archived.annual_abbreviations) == len(parsed.annual_abbreviations)
+
+    with pytest.raises(FileNotFoundError):
+        parser.parse('005930', quarter='2000Q1')
@@ -0,0 +1,94 @@
+import pytest
+
+from skogkatt.batch import batch_lookup
+from skogkatt.batch.queue_factory import queue_factory
+from skogkatt.commons.http.throttle import Throttle
+from skogkatt.conf.app_conf import app_config, Config
+from skogkatt.core.dao import dao_factory
+from skogkatt.crawler.archive import HtmlArchive
+from skogkatt.crawler.fnguide import pipeline
+from skogkatt.crawler.fnguide.converter import SnapshotWriter
+from skogkatt.crawler.fnguide.lxml_parser import LxmlSnapshotParser
+from skogkatt.crawler.fnguide.pipeline import stream_convert
+from skogkatt.crawler.fnguide.url_builder import FnSnapshotUrlBuilder
+
+app_config.set_mode(Config.TEST)
+
+TEST_STOCK_CODES = ['005930', '051910', '000060', '003540']
+SNAPSHOT_BATCH = batch_lookup.FN_GUIDE_SNAPSHOT['name']
+JOB_NAME = batch_lookup.FN_SNAPSHOT_CONVERT['name']
+
+
+@pytest.fixture
+def fetch_meta_dao():
+    dao = dao_factory.get('FetchMetaDAO')
+    dao.delete(SNAPSHOT_BATCH)
+    yield dao
+    dao.delete(SNAPSHOT_BATCH)
+    dao_factory.get('FailedTickerDAO').delete(job_name=JOB_NAME)
+    queue_factory.remove_batch_queue(SNAPSHOT_BATCH)
+    queue_factory.remove_batch_queue(JOB_NAME)
+
+
+def stream_snapshot(stub_server, archive: HtmlArchive, parse_workers: int):
+    url_builder = FnSnapshotUrlBuilder()
+    url_builder._url = f'{stub_server.url}/SVO2/ASP/SVD_Main.asp'
+
+    return stream_convert(SNAPSHOT_BATCH, url_builder, LxmlSnapshotParser,
+                          SnapshotWriter(JOB_NAME, SNAPSHOT_BATCH, chunk_size=2),
+                          queue=queue_factory.assign_queue(SNAPSHOT_BATCH, TEST_STOCK_CODES),
+                          workers=2,
+                          parse_workers=parse_workers,
+                          throttle=Throttle(rate=50, burst=4),
+                          proxies=None,
+                          archive=archive,
+                          flush_interval=0.2)
+
+
+@pytest.mark.parametrize('parse_workers', [1, 2])
+def test_stream_convert(stub_server, tmp_path, fetch_meta_dao, parse_workers):
+    respond = stub_server.respond
+
+    def broken_respond(handler):
+        status, body = respond(handler)
+        if 'A003540' in handler.path:
+            body = body.replace('발행주식수'.encode('utf-8'), '상장주식수'.encode('utf-8'))
+        return status, body
+
+    stub_server.respond = broken_respond
+    archive = HtmlArchive(str(tmp_path.joinpath('snapshot')))
+    processed = stream_snapshot(stub_server, archive, parse_workers)
+
+    """ 수집한 종목은 수집 큐에서 삭제, 파싱에 실패한 종목은 FailedTickerDAO에 저장하고 변경 표시를 남긴다 """
+    assert sorted(processed) == ['000060', '005930', '051910']
+    assert queue_factory.get_queue(SNAPSHOT_BATCH).empty()
+    assert [each['stock_code'] for each in dao_factory.get('FailedTickerDAO').find(job_name=JOB_NAME)] == ['003540']
+    assert fetch_meta_dao.find_changed(SNAPSHOT_BATCH) == ['003540']
+    assert all(archive.contains(stock_code) for stock_code in TEST_STOCK_CODES)
+
+    """ 내용이 바뀌지 않은 종목은 다시 파싱하지 않는다 """
+    stub_server.respond = respond
+    assert stream_snapshot(stub_server, archive, parse_workers) == ['003540']
+    assert fetch_meta_dao.find_changed(SNAPSHOT_BATCH) == []
+
+
+def test_stream_convert_parse_error(stub_server, tmp_path, fetch_meta_dao, monkeypatch):
+    """
+    파싱 단계에서 예외가 발생하면 수집했지만 변환하지 못한 종목은 FailedTickerDAO에 저장하고 변경 표시를 남긴다.
+    중단 후 수집하지 않은 종목은 수집 큐에 남는다
+    """
+    def failing_parse(parser, stock_code, contents=None):
+        raise RuntimeError(f'stub - {stock_code}')
+
+    monkeypatch.setattr(pipeline, '_parse_with', failing_parse)
+    with pytest.raises(RuntimeError, match='stub'):
+        stream_snapshot(stub_server, HtmlArchive(str(tmp_path.joinpath('snapshot'))), parse_workers=1)
+
+    failed = sorted(each['stock_code'] for each in dao_factory.get('FailedTickerDAO').find(job_name=JOB_NAME))
+    queue = queue_factory.get_queue(SNAPSHOT_BATCH)
+    remained = [queue.get().get('stock_code') for count in range(queue.qsize())]
+
+    assert len(failed) > 0
+    assert sorted(failed + remained) == sorted(TEST_STOCK_CODES)
+    assert {each['cause'] for each in dao_factory.get('FailedTickerDAO').find(job_name=JOB_NAME)} == {'Dropped'}
+    assert fetch_meta_dao.find_changed(SNAPSHOT_BATCH) == failed
@@ -0,0 +1,34 @@
+from io import StringIO
+
+import lxml.html
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from skogkatt.crawler.util import read_table
+
+TABLE = """
+<div><table>
+    <thead>
+        <tr><th rowspan="2">IFRS(연결)</th><th colspan="2">Annual</th></tr>
+        <tr><th>2020/12</th><th>2021/12</th></tr>
+    </thead>
+    <tbody>
+        <tr><th>매출액</th><td>2,368,070</td><td>2,796,048</td></tr>
+        <tr><th>영업이익<span style="display: none">(발표기준)</span></th><td rowspan="2">359,939</td><td>516,339</td></tr>
+        <tr style="display:none"><th>숨긴 행</th><td>1</td></tr>
+        <tr><th>당기순이익</th><td>399,075</td></tr>
+    </tbody>
+</table>꼬리 텍스트</div>
+"""
+
+
+def test_read_table():
+    """ colspan/rowspan 복사, display:none 제외, 천단위 구분자 숫자 변환은 pd.read_html과 같다 """
+    table = lxml.html.fragment_fromstring(TABLE).xpath('//table')[0]
+    df = read_table(table, header=1)
+
+    expected = pd.read_html(StringIO(TABLE), header=1)[0]
+    assert_frame_equal(df, expected)
+    assert df.columns.tolist() == ['IFRS(연결)', '2020/12', '2021/12']
+    assert df.iloc[:, 0].tolist() == ['매출액', '영업이익', '당기순이익']
+    assert df['2020/12'].tolist() == [2368070, 359939, 359939]
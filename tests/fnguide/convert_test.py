@@ -0,0 +1,71 @@
+import pytest
+
+from skogkatt.batch import batch_lookup
+from skogkatt.batch.queue_factory import queue_factory
+from skogkatt.conf.app_conf import app_config, Config
+from skogkatt.core.dao import dao_factory
+from skogkatt.core.financial.digest import statement_digests
+from skogkatt.crawler.archive import HtmlArchive
+from skogkatt.crawler.fnguide import converter, parser
+from skogkatt.crawler.fnguide.parser import FnSnapshotParser
+from skogkatt.screeners.rim import cache
+from skogkatt.screeners.rim.cache import price_estimate_cache
+from skogkatt.tests.fnguide.sample_html_generator import load_html
+
+app_config.set_mode(Config.TEST)
+
+TEST_STOCK_CODES = ['005930', '051910', '000060', '003540']
+JOB_NAME = batch_lookup.FN_SNAPSHOT_CONVERT['name']
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    archive_path = str(tmp_path.joinpath('snapshot'))
+    archive = HtmlArchive(archive_path)
+    for stock_code in TEST_STOCK_CODES:
+        with open(load_html(stock_code, file_type='snapshot'), 'rb') as file:
+            archive.put(stock_code, file.read())
+
+    monkeypatch.setattr(parser, 'FNGUIDE_SNAPSHOT_ARCHIVE_PATH', archive_path)
+    yield archive
+
+    dao_factory.get('FailedTickerDAO').delete(job_name=JOB_NAME)
+    queue_factory.remove_batch_queue(JOB_NAME)
+
+
+def test_parse_files(archive):
+    """ 프로세스 풀에서 파싱해도 순서와 결과는 같다 """
+    stock_codes = TEST_STOCK_CODES + ['999999']
+    sequential = list(converter.parse_files(FnSnapshotParser, stock_codes, workers=1))
+    parallel = list(converter.parse_files(FnSnapshotParser, stock_codes, workers=2))
+
+    assert [each[0] for each in parallel] == stock_codes
+    for (stock_code, dto, error), expected in zip(parallel, sequential):
+        if stock_code == '999999':
+            assert dto is None and error[0] == 'FileNotFound'
+            continue
+
+        assert error is None
+        assert dto.stock_summary.to_dict() == expected[1].stock_summary.to_dict()
+        assert statement_digests(dto.annual_abbreviations + dto.quarter_abbreviations) == \
+               statement_digests(expected[1].annual_abbreviations + expected[1].quarter_abbreviations)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_convert_snapshot(archive, workers, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'get_cache_folder', lambda: str(tmp_path))
+    cache_key = price_estimate_cache.make_key('005930', '2021/03', 7.89, 'table')
+    price_estimate_cache.put(cache_key, None, 'hash')
+
+    queue = queue_factory.assign_queue(JOB_NAME, TEST_STOCK_CODES + ['999999'])
+    processed = converter.convert_snapshot(queue, chunk_size=2, workers=workers)
+
+    """ 저장한 종목의 적정가격 캐시는 삭제 """
+    assert cache_key not in price_estimate_cache._lru
+    assert price_estimate_cache._read_disk(cache_key) is None
+
+    """ 파싱에 실패한 종목은 FailedTickerDAO에 저장하고 다시 변환하도록 DB 큐에 남긴다 """
+    assert processed == TEST_STOCK_CODES
+    assert [each['stock_code'] for each in dao_factory.get('FailedTickerDAO').find(job_name=JOB_NAME)] == ['999999']
+    queue = queue_factory.get_queue(JOB_NAME)
+    assert [queue.get().get('stock_code') for count in range(queue.qsize())] == ['999999']
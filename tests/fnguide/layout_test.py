@@ -0,0 +1,170 @@
+import copy
+
+import lxml.html
+import pytest
+
+from skogkatt.conf.app_conf import app_config, Config
+from skogkatt.core.dao import dao_factory
+from skogkatt.core.financial.constants import StatementType
+from skogkatt.core.financial.digest import statement_digests
+from skogkatt.crawler.archive import HtmlArchive
+from skogkatt.crawler.fnguide.layout import (
+    preflight_statements, remap_sectors, LAYOUT_OK, LAYOUT_REMAPPED, LAYOUT_UNSUPPORTED
+)
+from skogkatt.crawler.fnguide.index import SectorIndexer
+from skogkatt.crawler.fnguide.lxml_parser import LxmlStatementParser
+from skogkatt.errors import LayoutDriftError, StatementParseError
+from skogkatt.tests.fnguide.sample_html_generator import load_html
+
+app_config.set_mode(Config.TEST)
+
+SOURCE = 'layout_test'
+STOCK_CODE = '005930'
+UNLISTED_CODES = ['900001', '900002']     # ticker_store에 없는 종목은 같은 업종('')으로 묶인다
+
+
+@pytest.fixture
+def layout_dao():
+    dao = dao_factory.get('FnLayoutDAO')
+    dao.delete(SOURCE)
+    yield dao
+    dao.delete(SOURCE)
+
+
+@pytest.fixture
+def statement_dao():
+    dao = dao_factory.get('FnStatementDAO')
+    yield dao
+    for stock_code in UNLISTED_CODES:
+        dao.delete(stock_code)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return HtmlArchive(str(tmp_path.joinpath('statement')))
+
+
+def sample_page() -> bytes:
+    with open(load_html(STOCK_CODE, file_type='statement'), 'rb') as file:
+        return file.read()
+
+
+def insert_row(contents: bytes, before: str, label: str) -> bytes:
+    """ 재무상태표(연간, 분기)의 before 계정 앞에 label 계정 행을 추가한다 """
+    doc = lxml.html.document_fromstring(contents)
+    for table in doc.xpath('//table')[2:4]:
+        tr = next(th.getparent() for th in table.xpath('.//tbody//th') if th.text_content().strip() == before)
+        added = copy.deepcopy(tr)
+        added.xpath('./th')[0].text = label
+        tr.addprevious(added)
+
+    return lxml.html.tostring(doc, encoding='utf-8')
+
+
+def statements_of(dto):
+    return statement_digests(dto.annual_statements + dto.quarter_statements)
+
+
+def test_remap_sectors():
+    """ 같은 이름의 계정은 기존 행번호 순서대로 배정 """
+    sectors = SectorIndexer().get_sector_indexes(StatementType.BS)
+    labels = LxmlStatementParser().read_reports(STOCK_CODE, file=load_html(STOCK_CODE, 'statement'))
+    labels = labels[StatementType.BS][0]['account_id'].tolist()
+
+    remapped, missing = remap_sectors(sectors, labels[:5] + ['추가계정'] + labels[5:])
+    assert missing == []
+    assert remapped['financing']['신용조달']['계약부채'] == 39
+    assert remapped['financing']['신용조달']['비유동부채.계약부채'] == 53
+    assert remapped['investment']['여유자금']['유동금융자산'] == 4
+
+    remapped, missing = remap_sectors(sectors, [label for label in labels if label != '단기차입금'])
+    assert remapped is None
+    assert missing == ['단기차입금']
+
+
+def layout_statuses(layout_dao):
+    return sorted((each['fs_type'], each['status']) for each in layout_dao.find(SOURCE))
+
+
+def test_preflight_remaps_changed_layout(archive, layout_dao):
+    contents = sample_page()
+    archive.put(STOCK_CODE, contents)
+    expected = statements_of(LxmlStatementParser(archive).parse(STOCK_CODE))
+
+    assert preflight_statements([STOCK_CODE], LxmlStatementParser(archive), SOURCE) == {}
+    assert [each['status'] for each in layout_dao.find(SOURCE)] == [LAYOUT_OK] * 3
+
+    """ 재무상태표에 행이 추가되면 기본 색인으로는 실패하고, 계정과목 이름으로 다시 찾은 색인으로 같은 결과 """
+    archive.put(STOCK_CODE, insert_row(contents, '단기차입금', '단기차입금(신규)'))
+    with pytest.raises(StatementParseError):
+        LxmlStatementParser(archive).parse(STOCK_CODE)
+
+    layouts = preflight_statements([STOCK_CODE], LxmlStatementParser(archive), SOURCE)
+    assert list(layouts.keys()) == [StatementType.BS]
+    assert statements_of(LxmlStatementParser(archive, layouts=layouts).parse(STOCK_CODE)) == expected
+
+    """ 지문별로 저장하므로 기존 구조로 돌아와도 다시 찾은 색인은 그대로 둔다 """
+    archive.put(STOCK_CODE, contents)
+    assert preflight_statements([STOCK_CODE], LxmlStatementParser(archive), SOURCE) == layouts
+    assert layout_statuses(layout_dao) == sorted([(StatementType.BS, LAYOUT_OK), (StatementType.BS, LAYOUT_REMAPPED),
+                                                  (StatementType.IS, LAYOUT_OK), (StatementType.CF, LAYOUT_OK)])
+
+
+def test_preflight_samples_industry_layouts(archive, layout_dao):
+    """ 업종의 표본 페이지마다 지문을 확인해서, 한 업종의 여러 구조를 모두 저장한다. 읽을 수 없는 페이지는 건너뛴다 """
+    contents = sample_page()
+    archive.put(UNLISTED_CODES[0], contents)
+    archive.put(UNLISTED_CODES[1], insert_row(contents, '단기차입금', '단기차입금(신규)'))
+
+    layouts = preflight_statements(['999999'] + UNLISTED_CODES, LxmlStatementParser(archive), SOURCE)
+    assert list(layouts.keys()) == [StatementType.BS]
+    assert {(each['stock_code'], each['fs_type']): each['status'] for each in layout_dao.find(SOURCE)} == \
+           {(UNLISTED_CODES[0], StatementType.BS): LAYOUT_OK, (UNLISTED_CODES[0], StatementType.IS): LAYOUT_OK,
+            (UNLISTED_CODES[0], StatementType.CF): LAYOUT_OK, (UNLISTED_CODES[1], StatementType.BS): LAYOUT_REMAPPED}
+
+    """ 저장된 구조는 표본 순서가 바뀌어도 다시 저장하지 않는다 """
+    updated = [each['updated'] for each in layout_dao.find(SOURCE)]
+    assert preflight_statements(UNLISTED_CODES[::-1], LxmlStatementParser(archive), SOURCE) == layouts
+    assert [each['updated'] for each in layout_dao.find(SOURCE)] == updated
+
+
+def test_preflight_aborts_on_drift(archive, layout_dao, statement_dao):
+    contents = sample_page()
+    drifted = contents.replace('단기차입금'.encode('utf-8'), '단기부채'.encode('utf-8'))
+    converted, unconverted = UNLISTED_CODES
+    archive.put(converted, contents)
+    preflight_statements([converted], LxmlStatementParser(archive), SOURCE)
+    dto = LxmlStatementParser(archive).parse(converted)
+    statement_dao.update(dto.annual_statements + dto.quarter_statements)
+    stored = layout_statuses(layout_dao)
+
+    """ 전에 변환된 종목의 새 구조에서 계정과목을 찾을 수 없으면 중단하고 저장된 지문은 그대로 둔다 """
+    archive.put(converted, drifted)
+    with pytest.raises(LayoutDriftError, match=rf'{converted}\) BS - missing: 단기차입금'):
+        preflight_statements([converted], LxmlStatementParser(archive), SOURCE)
+
+    assert layout_statuses(layout_dao) == stored
+
+    preflight_statements([converted], LxmlStatementParser(archive), SOURCE, abort=False)
+    assert layout_statuses(layout_dao) == stored
+
+    """ 변환된 적 없는 종목은 중단하지 않고 변환할 수 없는 구조로 저장 """
+    archive.put(unconverted, drifted)
+    preflight_statements([unconverted], LxmlStatementParser(archive), SOURCE)
+    assert layout_statuses(layout_dao) == sorted(stored + [(StatementType.BS, LAYOUT_UNSUPPORTED)])
+
+
+def test_preflight_financial_industry(archive, layout_dao):
+    """ 처음 확인한 업종은 변환할 수 없는 구조여도 중단하지 않고 업종별로 저장 """
+    stock_codes = ['000060', '005930']
+    for stock_code in stock_codes:
+        with open(load_html(stock_code, file_type='statement'), 'rb') as file:
+            archive.put(stock_code, file.read())
+
+    layouts = preflight_statements(stock_codes, LxmlStatementParser(archive), SOURCE)
+
+    statuses = {(each['stock_code'], each['fs_type']): each['status'] for each in layout_dao.find(SOURCE)}
+    assert statuses[('000060', StatementType.BS)] == LAYOUT_UNSUPPORTED
+    assert statuses[('000060', StatementType.IS)] == LAYOUT_REMAPPED
+    assert statuses[('005930', StatementType.BS)] == LAYOUT_OK
+    assert sorted(layouts.keys()) == [StatementType.CF, StatementType.IS]
@@ -0,0 +1,54 @@
+import math
+
+import pytest
+
+from skogkatt.conf.app_conf import app_config, Config, get_project_path
+from skogkatt.crawler.fnguide.lxml_parser import LxmlSnapshotParser, LxmlStatementParser
+from skogkatt.crawler.fnguide.parser import FnSnapshotParser, FnStatementParser
+from skogkatt.errors import StatementParseError
+
+app_config.set_mode(Config.TEST)
+
+SAMPLE_PATH = get_project_path().joinpath('tests/fnguide')
+
+
+def sample_files(file_type: str):
+    return sorted(str(path) for path in SAMPLE_PATH.glob(f'fn_{file_type}_sample_*.html'))
+
+
+def fact_value(value):
+    """ 값과 타입까지 비교. NaN은 같은 값으로 처리 """
+    if isinstance(value, float) and math.isnan(value):
+        return 'NaN'
+    return type(value).__name__, value
+
+
+def dump_statements(statements):
+    return [(stmt.stock_code, stmt.fiscal_date, stmt.report_code, stmt.consensus, stmt.fs_div,
+             [(fact.account_name, fact_value(fact.value), fact.group, fact.sector, fact.sj_div)
+              for fact in stmt.facts])
+            for stmt in statements or []]
+
+
+def dump(parser, stock_code: str, file: str):
+    try:
+        dto = parser.parse(stock_code, file=file)
+    except StatementParseError as err:
+        return str(err)
+
+    return (dto.stock_summary.to_dict() if dto.stock_summary is not None else None,
+            dump_statements(dto.annual_statements), dump_statements(dto.quarter_statements),
+            dump_statements(dto.annual_abbreviations), dump_statements(dto.quarter_abbreviations))
+
+
+@pytest.mark.parametrize('file', sample_files('snapshot'))
+def test_snapshot_golden(file):
+    stock_code = file.split('_')[-1][:-5]
+    assert dump(LxmlSnapshotParser(), stock_code, file) == dump(FnSnapshotParser(), stock_code, file)
+
+
+@pytest.mark.parametrize('file', sample_files('statement'))
+def test_statement_golden(file):
+    """ 계정 불일치 종목은 같은 오류 """
+    stock_code = file.split('_')[-1][:-5]
+    assert dump(LxmlStatementParser(), stock_code, file) == dump(FnStatementParser(), stock_code, file)
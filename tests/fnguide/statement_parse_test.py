@@ -18,8 +18,9 @@ from tabulate import tabulate
 #         self.parser = FnStatementParser()
 #         self.stock_code = '005930'
 from skogkatt.core.financial.constants import StatementType, ReportCode
-from skogkatt.crawler.fnguide.index import STATEMENT_SECTORS
+from skogkatt.crawler.fnguide.index import STATEMENT_SECTORS, SectorIndexer
 from skogkatt.crawler.fnguide.parser import prepare_statements
+from skogkatt.errors import StatementParseError
 from skogkatt.tests.fnguide.constants import FNG_STATEMENT_COL_CNT
 from skogkatt.tests.fnguide.sample_html_generator import load_html
 
@@ -81,6 +82,25 @@ def test_parse_fn_statement(parser):
     assert (FNG_STATEMENT_COL_CNT, df.shape[1])
 
 
+@pytest.mark.parametrize('parser', ['005930'], indirect=['parser'])
+def test_validate_index(parser):
+    """ 행번호 색인 계정과 다른 계정, 표에 없는 행번호 확인 """
+    parser, stock_code = parser
+    parser = init_parser(parser, stock_code)
+    parser.sector_indexer = SectorIndexer()
+    bs_df = parser.annual_reports.get(StatementType.BS)
+
+    assert parser.validate_index(bs_df, StatementType.BS) == []
+
+    accounts = bs_df['account_id'].tolist()
+    accounts[31] = '단기부채'
+    mismatched = parser.sector_indexer.get_plan(StatementType.BS).validate(accounts)
+    assert mismatched == ["Mismatched - group: 외부차입, row_index: [31], legacy: ['단기차입금'], parsed: ['단기부채']"]
+
+    with pytest.raises(StatementParseError, match='Mismatched row index - group: 신용조달, 34'):
+        parser.sector_indexer.get_plan(StatementType.BS).validate(accounts[:14])
+
+
 def init_parser(parser, stock_code):
     html = load_html(stock_code, file_type='statement')
     tables = parser._prepare_statement_tables(stock_code, file=html)
@@ -0,0 +1,96 @@
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from skogkatt.conf.app_conf import get_project_path
+
+"""
+FnGuide 대신 tests/fnguide 샘플 html을 응답하는 로컬 HTTP 서버
+ - /SVO2/ASP/SVD_Main.asp?gicode=A005930 -> fn_snapshot_sample_005930.html
+ - /SVO2/ASP/SVD_Finance.asp?gicode=A005930 -> fn_statement_sample_005930.html
+"""
+
+FILE_TYPES = {'/SVO2/ASP/SVD_Main.asp': 'snapshot', '/SVO2/ASP/SVD_Finance.asp': 'statement'}
+
+
+class FnGuideStubServer:
+
+    def __init__(self, latency: float = 0, etag: bool = False):
+        """
+        :param latency: float, optional, 응답 지연 시간(초)
+        :param etag: bool, optional, ETag 응답 및 If-None-Match 조건부 요청(304) 지원 여부
+        """
+        self.latency = latency
+        self.etag = etag
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    stub.requests.append((time.monotonic(), self.path))
+                try:
+                    time.sleep(stub.latency)
+                    status, body = stub.respond(self)
+                    etag = f'"{hashlib.md5(body).hexdigest()}"' if stub.etag and status == 200 else None
+                    if etag is not None and self.headers.get('If-None-Match') == etag:
+                        status, body = 304, b''
+
+                    self.send_response(status)
+                    if etag is not None:
+                        self.send_header('ETag', etag)
+                    self.send_header('Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def respond(self, handler: BaseHTTPRequestHandler):
+        """ :return: (HTTP status, body bytes) """
+        parts = urlsplit(handler.path)
+        file_type = FILE_TYPES.get(parts.path)
+        stock_code = parse_qs(parts.query).get('gicode', ['A'])[0][1:]
+        html_file = get_project_path().joinpath(f'tests/fnguide/fn_{file_type}_sample_{stock_code}.html')
+
+        if file_type is None or not html_file.exists():
+            return 404, b'<html><body>Not Found</body></html>'
+
+        return 200, html_file.read_bytes()
@@ -0,0 +1,71 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+from pandas import DataFrame
+
+from skogkatt.conf.app_conf import app_config, Config
+from skogkatt.screeners.rim import PriceEstimate
+from skogkatt.screeners.rim import cache
+from skogkatt.screeners.rim.cache import PriceEstimateCache
+
+app_config.set_mode(Config.TEST)
+
+
+@pytest.fixture
+def estimate_cache(tmp_path, monkeypatch):
+    """ 임시 폴더를 디스크 캐시로 사용하는 빈 캐시 """
+    monkeypatch.setattr(cache, 'get_cache_folder', lambda: str(tmp_path))
+    estimate_cache = PriceEstimateCache()
+    estimate_cache._disk_ready = set()
+    estimate_cache.invalidate()
+
+    yield estimate_cache
+
+    estimate_cache._lru.clear()
+    estimate_cache._synced_at = None
+    estimate_cache._disk_ready = set()
+
+
+def create_estimate(stock_code, price):
+    table = DataFrame({"적정주주가치": [3, 2, 1], "적정주가": [price + 10, price, price - 10], "PER": [None] * 3})
+    return PriceEstimate(stock_code, table, 10.67, 'analyzed', '2021/03', 7.89)
+
+
+def test_cache_lru_and_disk(estimate_cache):
+    key = estimate_cache.make_key('005930', '2021/03', 7.89, 'table', '20210620')
+    assert estimate_cache.get(key) is None
+
+    estimate_cache.put(key, create_estimate('005930', 100), 'hash-1')
+    assert estimate_cache.get(key).affordable_price == 100
+    assert estimate_cache.get(key, 'hash-1') is not None
+    assert estimate_cache.get(key, 'hash-2') is None
+
+    """ 메모리 캐시가 없으면 디스크 캐시에서 찾는다 """
+    estimate_cache._lru.clear()
+    assert estimate_cache.get(key).to_dict() == create_estimate('005930', 100).to_dict()
+
+    """ 다른 요구수익률, 기준일자는 다른 키 """
+    assert estimate_cache.get(estimate_cache.make_key('005930', '2021/03', 8.0, 'table', '20210620')) is None
+    assert estimate_cache.get(estimate_cache.make_key('005930', '2021/03', 7.89, 'table', '20210621')) is None
+
+
+def test_cache_invalidate(estimate_cache, tmp_path):
+    keys = [estimate_cache.make_key(stock_code, '2021/03', 7.89, 'table') for stock_code in ['005930', '000660']]
+    for key in keys:
+        estimate_cache.put(key, create_estimate(key[0], 100), 'hash')
+
+    estimate_cache.invalidate(['005930'])
+    assert estimate_cache.get(keys[0]) is None
+    assert estimate_cache.get(keys[1]) is not None
+
+    """ 다른 프로세스에서 invalidate 하면 메모리 캐시도 무효 """
+    path = tmp_path.joinpath(cache.CACHE_FILE.format(mode=app_config.current_mode))
+    with closing(sqlite3.connect(str(path))) as conn, conn:
+        conn.execute('DELETE FROM price_estimate')
+        conn.execute('UPDATE generation SET value = value + 1 WHERE id = 0')
+
+    """ generation 값은 GENERATION_SYNC_INTERVAL 초에 한번만 확인 """
+    assert estimate_cache.get(keys[1]) is not None
+    estimate_cache._synced_at -= cache.GENERATION_SYNC_INTERVAL
+    assert estimate_cache.get(keys[1]) is None
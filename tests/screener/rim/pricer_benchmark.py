@@ -0,0 +1,60 @@
+"""
+RIM 적정가격 계산 시간 측정. 테스트 모음에 포함하지 않고 직접 실행한다.
+    python -m skogkatt.tests.screener.rim.pricer_benchmark [종목수] [반복횟수]
+
+샘플 html(tests/fnguide)을 파싱한 재무정보로 기준 데이터 생성(resolve_baseline)부터
+초과이익 계수별 적정가격 일괄 계산(estimate_many)까지 측정한다. DB는 사용하지 않는다.
+"""
+import statistics
+import sys
+import time
+
+from skogkatt.conf.app_conf import app_config, Config, get_project_path
+from skogkatt.core.ticker import Ticker
+from skogkatt.crawler.fnguide.parser import FnSnapshotParser, FnStatementParser
+from skogkatt.screeners.rim.pricer import Pricer
+
+app_config.set_mode(Config.TEST)
+
+SAMPLE_PATH = get_project_path().joinpath('tests/fnguide')
+STOCK_CODE = '005930'
+
+
+def load_statement_dto(stock_code: str):
+    """ 샘플 html을 Pricer._prepare_fn_statement와 같은 방식으로 합쳐서 DTO로 만든다. """
+    dto = FnSnapshotParser().parse(stock_code, file=str(SAMPLE_PATH.joinpath(f'fn_snapshot_sample_{stock_code}.html')))
+    stmt = FnStatementParser().parse(stock_code, file=str(SAMPLE_PATH.joinpath(f'fn_statement_sample_{stock_code}.html')))
+    dto.annual_statements = stmt.annual_statements
+    dto.quarter_statements = stmt.quarter_statements
+    return dto
+
+
+def benchmark(count: int, repeat: int):
+    ticker = Ticker(STOCK_CODE, '삼성전자', None, None, None, 'S', None)
+    dto = load_statement_dto(STOCK_CODE)
+    pricer = Pricer()
+
+    def run():
+        baselines = [pricer.resolve_baseline(ticker, statement_dto=dto) for _ in range(count)]
+        start = time.perf_counter()
+        pricer.estimate_many(baselines)
+        return start
+
+    run()
+    totals, estimates = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        estimate_start = run()
+        end = time.perf_counter()
+        totals.append(end - start)
+        estimates.append(end - estimate_start)
+
+    total, estimate = statistics.median(totals), statistics.median(estimates)
+    print(f'{count}종목, {repeat}회 중앙값')
+    print(f'resolve_baseline + estimate_many: {total * 1000:.3f}ms ({total / count * 1000:.3f}ms/종목)')
+    print(f'estimate_many: {estimate * 1000:.3f}ms ({estimate / count * 1000:.3f}ms/종목)')
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+              int(sys.argv[2]) if len(sys.argv) > 2 else 5)
@@ -1,8 +1,24 @@
+from datetime import datetime
+
+import numpy
+import pytest
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
 from tabulate import tabulate
 
 from skogkatt.conf.app_conf import app_config, Config
+from skogkatt.core.financial import StockSummary
+from skogkatt.core.financial.dto import FinancialStatementDTO
 from skogkatt.core.ticker.store import ticker_store
-from skogkatt.screeners.rim.pricer import Pricer
+from skogkatt.crawler.archive import HtmlArchive
+from skogkatt.crawler.fnguide import parser
+from skogkatt.crawler.fnguide.parser import FnSnapshotParser
+from skogkatt.crawler.fnguide.scraper import FnGuideSnapshotScraper, FnGuideStatementScraper
+from skogkatt.screeners.rim import cache
+from skogkatt.screeners.rim.pricer import Pricer, PriceBaseline, REQ_PROFIT_RATE, PV_CLOSED_FORM, COEFFICIENTS, \
+    ANALYSIS_YEARS, estimate_prices_many, to_price_table, pv_of_ri_closed_form, estimate_price_grid, \
+    discount_to_current, _sum_log_series
+from skogkatt.tests.fnguide.sample_html_generator import load_html
 
 app_config.set_mode(Config.TEST)
 
@@ -17,3 +33,203 @@ def test_estimate_price():
     print(f"매수: {estimate.buy_price}, 매도: {estimate.sell_price}, 적정: {estimate.affordable_price}")
     print(estimate.to_dict())
 
+
+
+def test_prepare_fn_statement_parses_scraped_files(tmp_path, monkeypatch):
+    """ 저장소에 이전 페이지가 있어도 새로 수집한 파일을 파싱한다 """
+    stock_code = '005930'
+    monkeypatch.setattr(FnGuideSnapshotScraper, 'scrape', staticmethod(lambda code: load_html(code, 'snapshot')))
+    monkeypatch.setattr(FnGuideStatementScraper, 'scrape', staticmethod(lambda code: load_html(code, 'statement')))
+    monkeypatch.setattr(cache, 'get_cache_folder', lambda: str(tmp_path))
+
+    archive_path = str(tmp_path.joinpath('snapshot'))
+    with open(load_html('051910', 'snapshot'), 'rb') as file:
+        HtmlArchive(archive_path).put(stock_code, file.read())
+    monkeypatch.setattr(parser, 'FNGUIDE_SNAPSHOT_ARCHIVE_PATH', archive_path)
+
+    dto = Pricer()._prepare_fn_statement(stock_code)
+
+    expected = FnSnapshotParser().parse(stock_code, file=str(load_html(stock_code, 'snapshot')))
+    assert dto.stock_summary.to_dict() == expected.stock_summary.to_dict()
+    assert FnSnapshotParser().parse(stock_code).stock_summary.to_dict() != expected.stock_summary.to_dict()
+    assert len(dto.annual_statements) > 0
+
+
+def create_pricer(equity, days_elapsed, stock_cnt, controlling_income, req_profit_rate=REQ_PROFIT_RATE):
+    """ DB 조회 없이 계산에 필요한 기준 데이터만 지정한 Pricer """
+    summary = StockSummary('000000')
+    summary.common_stock_cnt = stock_cnt
+
+    pricer = Pricer()
+    pricer.dto = FinancialStatementDTO('000000')
+    pricer.dto.stock_summary = summary
+    pricer.fact_table = DataFrame({i: [controlling_income] for i in range(5)}, index=['지배주주순이익'])
+    pricer.req_profit_rate = req_profit_rate
+    pricer.std_date = datetime(2021, 3, 31)
+    pricer.days_elapsed = days_elapsed
+    pricer.equity_on_std_date = equity
+    return pricer
+
+
+def test_estimate_prices_many():
+    """ 일괄 계산 결과가 종목별 계산 결과(_estimate_prices)와 같은지 확인 """
+    samples = [
+        # 지배주주지분, 적용 ROE, 경과일수, 발행주식수, 지배주주순이익
+        (2657670.0, 10.67, 18, 5969782550, 282941.0),
+        (3215190.55, 14.52, 200, 705960000, 0.125),
+        (1234.565, 2.675, 365, 12000000, -310.0),
+        (99.5, -12.3, 0, 100000, 12.5),
+    ]
+
+    prices = estimate_prices_many(equities=[each[0] for each in samples],
+                                  excess_profit_rates=[round(each[1] - REQ_PROFIT_RATE, 2) for each in samples],
+                                  days_elapsed=[each[2] for each in samples],
+                                  stock_counts=[each[3] for each in samples],
+                                  req_profit_rate=REQ_PROFIT_RATE,
+                                  controlling_incomes=[each[4] for each in samples])
+
+    for i, (equity, roe, days_elapsed, stock_cnt, controlling_income) in enumerate(samples):
+        pricer = create_pricer(equity, days_elapsed, stock_cnt, controlling_income)
+        expected = estimate_prices_stepwise(pricer, pricer.create_baseline(roe))
+
+        assert_frame_equal(expected, pricer._estimate_prices(pricer.create_baseline(roe)))
+        assert_frame_equal(expected, to_price_table(prices, i))
+
+
+def test_discount_to_current():
+    """ 저장된 기준시점 주주가치를 다른 경과일수로 할인한 결과가 전체 계산 결과와 같은지 확인 """
+    samples = [
+        # 지배주주지분, 초과이익률, 발행주식수
+        (2657670.0, 2.78, 5969782550),
+        (3215190.55, 6.63, 705960000),
+        (1234.565, -5.22, 12000000),
+    ]
+    kwargs = dict(equities=[each[0] for each in samples],
+                  excess_profit_rates=[each[1] for each in samples],
+                  stock_counts=[each[2] for each in samples])
+
+    stored = estimate_prices_many(days_elapsed=[-80, -81, 10], **kwargs)
+
+    for days_elapsed in ([-81, -82, 11], [-87, -175, 300]):
+        expected = estimate_prices_many(days_elapsed=days_elapsed, **kwargs)
+        current = discount_to_current(stored['equity_std'], kwargs['stock_counts'],
+                                      [REQ_PROFIT_RATE] * len(samples), days_elapsed)
+
+        numpy.testing.assert_array_equal(expected['equity_current'], current['equity_current'])
+        numpy.testing.assert_array_equal(expected['price'], current['price'])
+
+
+def apply_coefficient(baseline: DataFrame, coefficient: float, years: int = ANALYSIS_YEARS):
+    """
+    종목별 초과이익 계산(초과이익 테이블). 매년 ROE, 지배주주순이익, 초과이익, 지배주주지분을 반올림한다.
+    일괄 계산(estimate_prices_many) 결과를 확인하는 기준
+    :return: 년도별 초과이익 배열
+    """
+    values = baseline.astype(float).iloc[:, 0].to_numpy()
+    req_profit_rate = values[baseline.index.get_loc("요구수익률")]
+    excess_profit_rate = values[baseline.index.get_loc("초과이익률")]
+    equity = values[baseline.index.get_loc("지배주주지분")]
+
+    excess_profits = numpy.empty(years)
+    for i in range(years):
+        excess_profit_rate = excess_profit_rate * coefficient
+        roe = round(req_profit_rate + excess_profit_rate, 2)
+        controlling_income = round(equity * roe / 100, 2)
+        excess_profits[i] = round(controlling_income - equity * req_profit_rate / 100, 2)
+        equity = round(equity + controlling_income, 2)
+
+    return excess_profits
+
+
+def npv_excel(rate, values):
+    """ 순현재 가치(NPV)를 엑셀 방식으로 계산한다. """
+    return (values / (1 + rate) ** numpy.arange(1, len(values) + 1)).sum(axis=0)
+
+
+def estimate_prices_stepwise(pricer, baseline):
+    """ 초과이익 계수별로 초과이익 테이블, 잔여이익 현재가치, 주주가치, 적정주가, PER 순서로 계산 """
+    summary = pricer.dto.stock_summary
+    stock_cnt = summary.common_stock_cnt + summary.pref_stock_cnt - summary.treasury_stock_cnt
+    discount = (1 + (pricer.req_profit_rate / 100)) ** (pricer.days_elapsed / 365)
+    controlling_income = pricer.fact_table.loc["지배주주순이익", pricer.fact_table.columns[4]]
+
+    rows = []
+    for coefficient in COEFFICIENTS:
+        pv_of_ri = npv_excel(pricer.req_profit_rate / 100, apply_coefficient(baseline, coefficient['coefficient']))
+        equity_std = round(baseline.astype(float).loc["지배주주지분"].iloc[0] + pv_of_ri, 2)
+        equity_current = round(equity_std / discount, 2)
+        rows.append({"적정주주가치": int(equity_current),
+                     "적정주가": int(int(equity_std * 100000000 / stock_cnt) / discount),
+                     "PER": None if controlling_income is None else round(equity_current / controlling_income, 2),
+                     "판단": coefficient['decision']})
+
+    return DataFrame(rows, index=[coefficient['label'] for coefficient in COEFFICIENTS])
+
+
+@pytest.mark.parametrize('years', [10, 20, 30])
+@pytest.mark.parametrize('coefficient', [1.0, 0.9, 0.8])
+def test_pv_of_ri_closed_form(years, coefficient):
+    """
+    공식 계산 결과가 초과이익 테이블(apply_coefficient) 계산 결과와 반올림 오차 범위에서 같은지 확인
+    테이블은 매년 ROE를 소수점 2자리로 반올림하므로 오차는 기준시점 지배주주지분 대비로 비교한다.
+    """
+    for equity, roe in [(2657670.0, 10.67), (3215190.55, 14.52), (99.5, -12.3)]:
+        pricer = create_pricer(equity, 0, 1000000, None)
+        excess_profits = apply_coefficient(pricer.create_baseline(roe), coefficient, years)
+        expected = npv_excel(pricer.req_profit_rate / 100, excess_profits)
+
+        pv_of_ri = pv_of_ri_closed_form(equity, round(roe - REQ_PROFIT_RATE, 2), REQ_PROFIT_RATE, coefficient, years)
+        assert float(pv_of_ri) == pytest.approx(expected, abs=equity * 1e-3)
+
+
+def test_pv_of_ri_closed_form_infinite():
+    """ 무한 기간은 분석 년수를 늘린 결과로 수렴 """
+    pv_of_ri = pv_of_ri_closed_form(3215190.55, 6.63, REQ_PROFIT_RATE, 0.9, None)
+    assert float(pv_of_ri) == pytest.approx(float(pv_of_ri_closed_form(3215190.55, 6.63, REQ_PROFIT_RATE, 0.9, 1000)))
+
+    """ 초과이익 지속(c = 1)은 무한 기간 합이 발산하므로 분석 년수 적용 """
+    prices = estimate_prices_many(equities=[3215190.55], excess_profit_rates=[6.63], days_elapsed=[200],
+                                  stock_counts=[705960000], years=None, pv_method=PV_CLOSED_FORM)
+    expected = estimate_prices_many(equities=[3215190.55], excess_profit_rates=[6.63], days_elapsed=[200],
+                                    stock_counts=[705960000], years=ANALYSIS_YEARS, pv_method=PV_CLOSED_FORM)
+    assert numpy.all(numpy.isfinite(prices['price']))
+    assert prices['pv_of_ri'][0, 0] == expected['pv_of_ri'][0, 0]
+
+    """ |a * c|가 커서 급수가 느리게 수렴하는 경우는 직접 곱한 결과 """
+    pv_of_ri = pv_of_ri_closed_form(1000.0, 150.0, REQ_PROFIT_RATE, 0.99, None)
+    assert float(pv_of_ri) == pytest.approx(float(pv_of_ri_closed_form(1000.0, 150.0, REQ_PROFIT_RATE, 0.99, 3000)))
+
+    with pytest.raises(ValueError, match='series requires'):
+        _sum_log_series(numpy.array([1.2]), numpy.array([0.9]))
+
+    with pytest.raises(ValueError):
+        estimate_prices_many(equities=[3215190.55], excess_profit_rates=[6.63], days_elapsed=[200],
+                             stock_counts=[705960000], years=None)
+
+
+def test_estimate_price_grid():
+    """ 조합별 계산 결과가 해당 요구수익률, ROE로 만든 기준 데이터의 estimate_many 결과와 같은지 확인 """
+    baselines = [PriceBaseline('000001', 10.67, 'analyzed', '2021/03', REQ_PROFIT_RATE, 2657670.0, 18, 5969782550, 282941.0),
+                 PriceBaseline('000002', 14.52, 'consensus', '2021/03', REQ_PROFIT_RATE, 3215190.55, 200, 705960000)]
+    req_profit_rates = numpy.arange(7.0, 9.05, 0.5).round(2)
+    roes = [5.0, 12.34, 20.0]
+
+    grid = estimate_price_grid(baselines, req_profit_rates, roes, coefficients=[1.0, 0.9, 0.8, 0.5])
+    assert grid.shape == (2, 5, 3, 4)
+    assert grid.to_dataframe().shape == (2 * 5 * 3 * 4, len(grid.FIELDS))
+
+    pricer = Pricer()
+    for i, req_profit_rate in enumerate(req_profit_rates):
+        for j, roe in enumerate(roes):
+            expected = pricer.estimate_many([PriceBaseline(each.stock_code, roe, each.roe_criteria, each.fiscal_quarter,
+                                                           float(req_profit_rate), each.equity_on_std_date,
+                                                           each.days_elapsed, each.stock_cnt, each.controlling_income)
+                                             for each in baselines])
+            for estimate in expected:
+                assert list(grid.sel(estimate.stock_code)[i, j, :3]) == list(estimate.as_dataframe()['적정주가'])
+
+    """ ROE 축을 지정하지 않으면 종목별 적용 ROE """
+    grid = estimate_price_grid(baselines, [REQ_PROFIT_RATE])
+    expected = pricer.estimate_many(baselines)
+    for k, estimate in enumerate(expected):
+        assert list(grid.price[k, 0, 0]) == list(estimate.as_dataframe()['적정주가'])
@@ -14,3 +14,13 @@ def test_rim_price_estimate():
     queue = queue_factory.assign_queue(batch.name, stock_codes)
     batch.start(queue)
 
+
+
+def test_rim_price_estimate_parallel():
+    stock_codes = ['005930', '051910', '000660', '035420']
+    batch = RIMPriceEstimator(chunk_size=2, workers=2)
+
+    queue = queue_factory.assign_queue(batch.name, stock_codes)
+    batch.start(queue)
+
+    assert queue_factory.get_queue(batch.name).qsize() == 0
@@ -1,9 +1,13 @@
+import copy
+
 import pytest
+from pandas.testing import assert_frame_equal
 from tabulate import tabulate
 
 from skogkatt.conf.app_conf import get_project_path, app_config, Config
 from skogkatt.crawler.fnguide.parser import FnStatementParser
-from skogkatt.screeners.rim import ROEEstimator
+from skogkatt.screeners.rim import Criteria
+from skogkatt.screeners.rim.estimator import ROEEstimator, aggregate_statements, aggregate_statements_many
 from skogkatt.tests.fnguide.sample_html_generator import load_html
 
 app_config.set_mode(Config.TEST)
@@ -13,7 +17,7 @@ file_type = "statement"
 
 @pytest.fixture
 def setup_db(request):
-    from skogkatt.crawler.fnguide.parser import FnSnapshotParser, FnStatementParser
+    from skogkatt.crawler.fnguide.parser import FnSnapshotParser
 
     """ FnGuide 스냅샷, 제무재표 html 파일 로딩, 없으면 comp.fnguide.com 에서 크롤 """
     snapshot_html = load_html(stock_code, file_type='snapshot')
@@ -58,3 +62,60 @@ def test_estimate_roe_with_database(setup_db):
     roe_estimator = ROEEstimator()
     df = roe_estimator.estimate(stock_code)
     print(tabulate(df, headers="keys", tablefmt="psql"))
+
+
+def test_aggregate_statements_many(fn_dto):
+    """ 여러 종목 집계표의 종목별 컬럼이 종목별 집계표와 같은지 확인 """
+    other_statements = copy.deepcopy(fn_dto.annual_statements)
+    for stmt in other_statements:
+        stmt.stock_code = '000000'
+
+    df = aggregate_statements_many(fn_dto.annual_statements + other_statements)
+    assert len(df.columns) == len(fn_dto.annual_statements) * 2
+
+    expected = aggregate_statements(fn_dto.annual_statements)
+    for code in [stock_code, '000000']:
+        result = df[code]
+        result.columns.name = None
+        assert_frame_equal(expected, result)
+
+
+def test_aggregate_statements_duplicated_date(fn_dto):
+    """ 같은 회계일자 재무제표는 마지막 재무제표 값을 기존 컬럼 위치에 사용 """
+    statements = fn_dto.annual_statements + [fn_dto.quarter_statements[-1]]
+    statements[-1] = copy.deepcopy(statements[-1])
+    statements[-1].fiscal_date = statements[0].fiscal_date
+
+    df = aggregate_statements(statements)
+    assert list(df.columns) == [stmt.fiscal_date for stmt in fn_dto.annual_statements]
+    assert_frame_equal(aggregate_statements([statements[-1]]).iloc[:, 0:1], df.iloc[:, 0:1])
+
+
+@pytest.mark.parametrize("option", ['가중평균', '최근'])
+def test_estimate_roe_many(fn_dto, option):
+    """ 여러 종목 ROE 추정 결과가 종목별 추정 결과와 같은지 확인 """
+    other_dto = copy.deepcopy(fn_dto)
+    other_dto._stock_code = '000660'
+    for i, stmt in enumerate(other_dto.annual_statements + other_dto.quarter_statements):
+        stmt.stock_code = other_dto.stock_code
+        for fact in stmt.facts:
+            if isinstance(fact.value, float):
+                fact.value = fact.value * (1 + (i % 3) * 0.15)
+
+    criteria = Criteria(default_option=option)
+    df = ROEEstimator().estimate_many([fn_dto, other_dto], criteria=criteria)
+    print(tabulate(df, headers="keys", tablefmt="psql"))
+    assert list(df.index) == [stock_code, '000660']
+
+    for dto in [fn_dto, other_dto]:
+        roe_estimator = ROEEstimator()
+        expected = roe_estimator.estimate(dto.stock_code, criteria=criteria, statement_dto=dto)
+        result = df.loc[dto.stock_code]
+
+        assert roe_estimator.estimated_roe == result[('지배주주 ROE', 'applied_value')]
+        for name, value in roe_estimator.applied_values['적용값'].items():
+            assert value == result[('적용값', name)]
+
+        for factor in ['영업자산이익률', '비영업자산이익률', '차입이자율', '지배주주 ROE']:
+            for column, period in zip(expected.columns[:4], ['전년도', '당해년도', '최근4분기', '가중평균']):
+                assert expected.loc[factor, column] == result[(factor, period)]